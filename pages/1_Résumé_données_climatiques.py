@@ -1,12 +1,15 @@
 import streamlit as st
-import geopandas as gpd
 import pandas as pd
-from shapely import wkt
-from st_files_connection import FilesConnection  # Import nécessaire pour la connexion GCS
 import matplotlib.pyplot as plt
-import numpy as np
+from functools import partial
 from io import StringIO
 import seaborn as sns # Ajouté pour l'harmonisation de l'analyse des Maisons
+from sykinet.data import load_dataset, load_dataset_version, load_map_dataset, map_lod
+from sykinet.departements import DEPARTEMENTS
+from sykinet.exposure import COMMUNE_DATASETS, compute_niveau
+from sykinet.figures import STYLE_VERSION
+from sykinet.render_cache import get_render_cache
+from sykinet.spans import begin, finish, set_department, span
 
 # IMPORTANT:
 # Cette version utilise la connexion GCS (st_files_connection) pour charger les données réelles.
@@ -14,95 +17,156 @@ import seaborn as sns # Ajouté pour l'harmonisation de l'analyse des Maisons
 
 # --- Fonction de chargement des données réelles (activée) ---
 
-@st.cache_data
-def load_real_data(file_path, column_calc_type):
+# Taille des cartes nationales : niveau de détail lu et clé du cache de rendu
+MAP_FIGSIZE = (8, 6)
+
+def load_real_data(dataset_name, column_calc_type):
     """
-    Charge les données depuis Google Cloud Storage (GCS) via FilesConnection, 
-    convertit la géométrie WKT et calcule la colonne 'NIVEAU'.
+    Charge les données depuis Google Cloud Storage (GCS) via la couche d'accès
+    partagée (lecture mise en cache, colonnes typées) et calcule la colonne 'NIVEAU'.
+    La géométrie est lue au niveau de détail adapté à la carte (figure 8x6).
     """
-    conn = st.connection("gcs", type=FilesConnection) 
-    df = conn.read(file_path, input_format="csv")
-    
-    # Conversion de la géométrie WKT
-    df['geometry'] = df['geometry'].apply(wkt.loads)
-    gdf = gpd.GeoDataFrame(df, geometry='geometry', crs="EPSG:2154")
+    gdf = load_map_dataset(dataset_name, figsize=MAP_FIGSIZE)
     
-    if column_calc_type == "secheresse":
-        # Votre formule originale pour la sécheresse : (Moyen + Fort) / Total
-        total_pct = gdf["pct_nulle"] + gdf["pct_faible"] + gdf["pct_moyen"] + gdf["pct_fort"]
-        # Éviter la division par zéro
-        gdf["NIVEAU"] = np.where(total_pct > 0, (gdf["pct_moyen"] + gdf["pct_fort"]) / total_pct, 0)
-        
-    elif column_calc_type == "innondation":
-        # Votre formule originale pour l'inondation : (Caves + Nappes) / Total
-        total_pct = gdf["pct_innond_caves"] + gdf["pct_debord_nappes"] + gdf["pct_sans_risque"]
-        # Éviter la division par zéro
-        gdf["NIVEAU"] = np.where(total_pct > 0, (gdf["pct_innond_caves"] + gdf["pct_debord_nappes"]) / total_pct, 0)
+    # Sécheresse : (Moyen + Fort) / Total ; inondation : (Caves + Nappes) / Total.
+    # Même formule que les tables communales (sykinet.exposure)
+    layer = "inondation" if column_calc_type == "innondation" else column_calc_type
+    with span("niveau"):
+        gdf["NIVEAU"] = compute_niveau(gdf, layer)
 
     return gdf
 
+# Données chargées pendant l'exécution courante, seulement si une image manque
+# au cache de rendu (comme `get_layer` en page 2) : une vue répétée ne lit
+# que les images
+_datasets = {}
+
+def lazy_data(dataset_name, column_calc_type):
+    def get():
+        if dataset_name not in _datasets:
+            _datasets[dataset_name] = load_real_data(dataset_name, column_calc_type)
+        return _datasets[dataset_name]
+    return get
+
 # --- Fonction de Création de Carte Modulaire ---
 
-def create_risk_map(gdf_data, title, cmap_color='viridis'):
+def create_risk_map(get_data, title, cmap_color='viridis', version=None):
     """
-    Crée et affiche une carte choroplèthe Matplotlib à partir d'un GeoDataFrame.
+    Crée et affiche une carte choroplèthe Matplotlib à partir du GeoDataFrame
+    renvoyé par `get_data`, appelé seulement si l'image n'est pas en cache.
+    L'image est relue depuis le cache de rendu tant que la version des données
+    (niveau de détail compris) et le style sont inchangés.
     """
-    # 1. Créer la figure et l'axe Matplotlib
-    fig, ax = plt.subplots(1, 1, figsize=(8, 6)) 
-
-    # 2. Tracer le GeoDataFrame
-    gdf_data.plot(
-        column='NIVEAU', 
-        ax=ax, 
-        legend=True, 
-        cmap=cmap_color, 
-        edgecolor='gray', # Bordure plus douce
-        linewidth=0.3,
-        legend_kwds={
-            'label': "Proportion de Zone à Risque (0.0 à 1.0)",
-            'orientation': "horizontal",
-            'shrink': 0.7, # Légende plus compacte
-            'pad': 0.05,
-            'aspect': 30 # Pour une barre plus fine
-        },
-        missing_kwds={
-            "color": "lightgrey",
-            "edgecolor": "black",
-            "hatch": "///",
-            "label": "Donnée Manquante",
-        }
-    )
+    def draw():
+        gdf_data = get_data()
+        # 1. Créer la figure et l'axe Matplotlib
+        fig, ax = plt.subplots(1, 1, figsize=MAP_FIGSIZE) 
+
+        # 2. Tracer le GeoDataFrame
+        gdf_data.plot(
+            column='NIVEAU', 
+            ax=ax, 
+            legend=True, 
+            cmap=cmap_color, 
+            edgecolor='gray', # Bordure plus douce
+            linewidth=0.3,
+            legend_kwds={
+                'label': "Proportion de Zone à Risque (0.0 à 1.0)",
+                'orientation': "horizontal",
+                'shrink': 0.7, # Légende plus compacte
+                'pad': 0.05,
+                'aspect': 30 # Pour une barre plus fine
+            },
+            missing_kwds={
+                "color": "lightgrey",
+                "edgecolor": "black",
+                "hatch": "///",
+                "label": "Donnée Manquante",
+            }
+        )
 
-    # 3. Personnaliser la carte
-    ax.set_title(title, fontsize=16, pad=20)
-    ax.set_axis_off() 
+        # 3. Personnaliser la carte
+        ax.set_title(title, fontsize=16, pad=20)
+        ax.set_axis_off() 
+        return fig
     
-    # 4. Afficher la carte
-    st.pyplot(fig)
+    # 4. Afficher la carte (rendu uniquement si absente du cache)
+    png = get_render_cache().get_or_render(
+        ("page1", version, None, title, "carte", cmap_color, STYLE_VERSION), draw
+    )
+    with span("affichage"):
+        st.image(png, use_container_width=True)
 
 # --- Fonction de Création d'Histogramme Modulaire ---
 
-def create_risk_histogram(gdf_data, title, color='skyblue'):
+def create_risk_histogram(get_data, title, color='skyblue', version=None):
     """
-    Crée et affiche un histogramme de la distribution de la variable 'NIVEAU'.
+    Crée et affiche un histogramme de la distribution de la variable 'NIVEAU'
+    (données de `get_data`, lues seulement si l'image n'est pas en cache).
     """
-    # Créer la figure et l'axe Matplotlib
-    fig, ax = plt.subplots(1, 1, figsize=(8, 5)) 
+    def draw():
+        gdf_data = get_data()
+        # Créer la figure et l'axe Matplotlib
+        fig, ax = plt.subplots(1, 1, figsize=(8, 5)) 
+
+        # Tracer l'histogramme
+        ax.hist(gdf_data['NIVEAU'].dropna(), bins=15, range=(0, 1), edgecolor='black', color=color, alpha=0.7)
+
+        # Personnaliser le graphique
+        ax.set_title(title, fontsize=16)
+        ax.set_xlabel("Niveau de Risque (Proportion de la zone affectée, de 0.0 à 1.0)")
+        ax.set_ylabel("Nombre de Zones (Départements)")
+        ax.grid(axis='y', linestyle='--', alpha=0.6)
+        
+        # Limiter l'axe des x de 0 à 1 (puisque NIVEAU est une proportion)
+        ax.set_xlim(0, 1)
+        return fig
 
-    # Tracer l'histogramme
-    ax.hist(gdf_data['NIVEAU'].dropna(), bins=15, range=(0, 1), edgecolor='black', color=color, alpha=0.7)
+    # Afficher le graphique dans Streamlit (rendu uniquement si absent du cache)
+    png = get_render_cache().get_or_render(
+        ("page1", version, None, title, "histogramme", color, STYLE_VERSION), draw
+    )
+    with span("affichage"):
+        st.image(png, use_container_width=True)
 
-    # Personnaliser le graphique
-    ax.set_title(title, fontsize=16)
-    ax.set_xlabel("Niveau de Risque (Proportion de la zone affectée, de 0.0 à 1.0)")
-    ax.set_ylabel("Nombre de Zones (Départements)")
-    ax.grid(axis='y', linestyle='--', alpha=0.6)
-    
-    # Limiter l'axe des x de 0 à 1 (puisque NIVEAU est une proportion)
-    ax.set_xlim(0, 1)
 
-    # Afficher le graphique dans Streamlit
-    st.pyplot(fig)
+# --- Zoom communal (tables d'exposition par commune) ---
+
+@st.cache_data(show_spinner=False)
+def top_communes(name, dept_code, version, n=10):
+    # Petite table mise en cache par version : la base communale n'est pas
+    # reconstruite à chaque exécution
+    return load_dataset(name, dept_code).drop(columns="geometry").nlargest(n, "NIVEAU")
+
+def create_commune_zoom(layer, label, cmap_color='viridis'):
+    """
+    Zoom sur un département : carte du NIVEAU par commune et communes les plus
+    exposées, à partir des tables produites par `python -m sykinet.exposure`.
+    """
+    name = COMMUNE_DATASETS[layer]
+    dept_code = st.selectbox("Département", DEPARTEMENTS, key=f"zoom_{layer}")
+    set_department(dept_code)
+    try:
+        version = load_dataset_version(name, dept_code)
+    except FileNotFoundError:
+        st.info(f"Exposition communale non calculée pour le département {dept_code}.")
+        set_department(None)
+        return
+
+    col_map, col_table = st.columns(2)
+    with col_map:
+        create_risk_map(
+            partial(load_dataset, name, dept_code),
+            f"Niveau de risque {label} par commune - Département {dept_code}",
+            cmap_color=cmap_color,
+            version=version
+        )
+    with col_table:
+        st.markdown("##### Communes les plus exposées")
+        with span("communes exposées"):
+            top = top_communes(name, dept_code, version)
+        st.dataframe(top, hide_index=True, use_container_width=True)
+    set_department(None)
 
 
 # ***************************************************************
@@ -114,6 +178,7 @@ st.set_page_config(
     layout="wide", 
     initial_sidebar_state="expanded"
 )
+begin("page1")
 
 st.title("🗺️ Analyse Géospatiale des Risques Climatiques")
 st.markdown("""
@@ -126,13 +191,15 @@ st.divider()
 
 # --- Chargement des données ---
 
-# Configuration pour les données réelles (Chemins d'accès GCS)
-RGA_FILE_PATH = "streamlit-sykinet/base sykinet/df_secheresse_complet.csv"
-INNONDATION_FILE_PATH = "streamlit-sykinet/base sykinet/df_innond_complet.csv"
+# Chargement différé (bases déclarées dans sykinet.schemas) : les données ne
+# sont lues que pour tracer une image absente du cache de rendu
+gdf_rga = lazy_data("secheresse_complet", "secheresse")
+gdf_innondation = lazy_data("innond_complet", "innondation")
 
-# Appel des fonctions de chargement réel
-gdf_rga = load_real_data(RGA_FILE_PATH, "secheresse")
-gdf_innondation = load_real_data(INNONDATION_FILE_PATH, "innondation")
+# Versions des données et niveau de détail lu (clés du cache de rendu des
+# cartes et histogrammes)
+version_rga = (load_dataset_version("secheresse_complet"), map_lod("secheresse_complet", figsize=MAP_FIGSIZE))
+version_innondation = (load_dataset_version("innond_complet"), map_lod("innond_complet", figsize=MAP_FIGSIZE))
 
 
 # ***************************************************************
@@ -155,7 +222,8 @@ with tab1:
         create_risk_map(
             gdf_rga, 
             "Carte des départements les plus touchés par le risque RGA",
-            cmap_color='YlOrRd'
+            cmap_color='YlOrRd',
+            version=version_rga
         )
 
     with col_hist:
@@ -163,9 +231,13 @@ with tab1:
         create_risk_histogram(
             gdf_rga, 
             "Distribution des Niveaux de Risque RGA par Département",
-            color='orange'
+            color='orange',
+            version=version_rga
         )
         
+    st.markdown("#### 🔎 Zoom communal")
+    create_commune_zoom("secheresse", "RGA", cmap_color='YlOrRd')
+
     st.markdown("#### 🔍 Synthèse des Observations (RGA)")
     st.info("""
     **Cohérence Géologique :** La carte choroplèthe montre une forte adéquation avec les réalités géologiques, mettant en lumière l'hétérogénéité territoriale du risque RGA.
@@ -194,7 +266,8 @@ with tab2:
         create_risk_map(
             gdf_innondation, 
             "Carte des départements les plus touchés par le risque inondation",
-            cmap_color='Blues'
+            cmap_color='Blues',
+            version=version_innondation
         )
 
     with col_hist:
@@ -202,9 +275,13 @@ with tab2:
         create_risk_histogram(
             gdf_innondation, 
             "Distribution des Niveaux de Risque Inondation par Département",
-            color='blue'
+            color='blue',
+            version=version_innondation
         )
         
+    st.markdown("#### 🔎 Zoom communal")
+    create_commune_zoom("inondation", "inondation", cmap_color='Blues')
+
     st.markdown("#### 🔍 Synthèse des Observations (Inondation)")
     st.info("""
     **Hétérogénéité Spatiale :** La carte met en évidence une forte hétérogénéité spatiale du risque d’inondation en France.
@@ -218,4 +295,6 @@ with tab2:
     * Quelques départements dépassent **50 %**, constituant des zones extrêmes essentielles pour la gestion du risque maximal.
 
     **Conclusion Actuarielle :** Ces résultats permettent d'identifier précisément les localisations les plus vulnérables pour l'ajustement des primes d'assurance, la tarification et le renforcement des modèles de risque.
-    """)
\ No newline at end of file
+    """)
+
+finish()
@@ -1,11 +1,17 @@
 import streamlit as st
-import geopandas as gpd
-import pandas as pd
-from shapely import wkt
-from st_files_connection import FilesConnection 
-import matplotlib.pyplot as plt
-from matplotlib.patches import Patch 
-import numpy as np 
+from functools import partial
+from sykinet.aggregates import AGGREGATES_DATASET, areas_for
+from sykinet.data import load_dataset, load_dataset_version, load_lod_manifest, load_map_dataset
+from sykinet.dataset_cache import get_dataset_cache
+from sykinet.departements import DEPARTEMENTS
+from sykinet.figures import (
+    MAP_FIGSIZE, MAP_RASTER_PX, STYLE_VERSION, area_pie_figure, hazard_map_figure, raster_map_figure
+)
+from sykinet.mapped import mapped_layer
+from sykinet.prefetch import neighbours, prefetch, warm_department
+from sykinet.render_cache import get_render_cache
+from sykinet.spans import begin, finish, set_department, span
+from sykinet.tiles import tile_deck
 
 ## 🌊 Application Cartographique d'Aléa d'Inondation et Sécheresse 🏠
 
@@ -18,6 +24,7 @@ st.set_page_config(
     layout="wide", 
     initial_sidebar_state="expanded"
 )
+begin("page2")
 
 st.title("🗺️ Cartes d'Aléa du Département")
 st.markdown("Visualisation des zones potentiellement sujettes aux débordements de nappe, inondations de cave, et risque sécheresse.")
@@ -29,62 +36,52 @@ st.markdown("Visualisation des zones potentiellement sujettes aux débordements
 with st.sidebar:
     st.header("Paramètres de la Carte")
     
-    # Création de la liste des départements
-    dep = [f"{i:02d}" for i in range(1, 96) if i != 20]
-    dep.insert(19, "2A") 
-    dep.insert(20, "2B") 
-    
-    @st.cache_data
-    def get_department_list():
-        return dep
-        
     departement = st.selectbox(
         "Sélectionnez le Département",
-        get_department_list(),
+        DEPARTEMENTS,
         index=30, # Index par défaut pour l'exemple
         help="Le code départemental (ex: 75 pour Paris)."
     )
     
     st.info(f"Département sélectionné : **{departement}**")
+    set_department(departement)
+    
+    # Mode interactif : pyramide de tuiles pré-calculée (python -m sykinet.tiles)
+    map_mode = st.radio(
+        "Mode d'affichage des cartes",
+        ["Statique (image)", "Interactif (tuiles)"],
+        help="Le mode interactif ne charge que les tuiles visibles à l'écran."
+    )
+    interactive_mode = map_mode == "Interactif (tuiles)"
 
 # ***************************************************************
 # 3. Fonctions de Chargement des Données SÉPARÉES 
 # ***************************************************************
 
+# Colonnes lues par couche ; `layer_load` prépare l'appel de chargement, exécuté
+# tel quel par le script ou lancé en arrière-plan (sykinet.prefetch). Les couches
+# sont les exemplaires partagés entre sessions (sykinet.dataset_cache), lus sans copie
+LAYER_COLUMNS = {"inondation": ("gridcode",), "secheresse": ("ALEA",)}
+
+def layer_load(layer, dept_code):
+    return partial(load_map_dataset, layer, dept_code, columns=LAYER_COLUMNS[layer], figsize=MAP_FIGSIZE, shared=True)
+
 # --- Fonction de chargement des données d'INONDATION ---
-# Utilisation de st.secrets ou st.connection pour la connexion sécurisée
-@st.cache_data(ttl=600)
+# La mise en cache est assurée par la couche d'accès partagée (sykinet.data)
 def load_inondation_data(dept_code):
     try:
-        # Assurez-vous que cette connexion est configurée dans votre environnement Streamlit Cloud
-        conn = st.connection("gcs", type=FilesConnection) 
-        file_path = f"streamlit-sykinet/base sykinet/base_innondation{dept_code}.csv"
-        
-        df = conn.read(file_path, input_format="csv")
-        df['geometry'] = df['geometry'].apply(wkt.loads)
-        gdf = gpd.GeoDataFrame(df, geometry='geometry', crs="EPSG:2154")
-        
-        # S'assurer que la colonne 'gridcode' est numérique
-        if gdf['gridcode'].dtype != 'int64':
-            gdf['gridcode'] = pd.to_numeric(gdf['gridcode'], errors='coerce').fillna(0).astype(int)
-        
-        return gdf
+        # Seule la colonne 'gridcode' est lue, déjà convertie en entier (int8),
+        # avec la géométrie simplifiée adaptée à la carte 12x12 (sykinet.simplify)
+        return layer_load("inondation", dept_code)()
         
     except Exception as e:
         st.error(f"⚠️ Erreur lors du chargement des données d'inondation pour le département {dept_code}. Veuillez vérifier la configuration de la connexion GCS ou l'existence du fichier : {e}")
         return None 
 
 # --- Fonction de chargement des données de SÉCHERESSE ---
-@st.cache_data(ttl=600)
 def load_secheresse_data(dept_code):
     try:
-        # Assurez-vous que cette connexion est configurée dans votre environnement Streamlit Cloud
-        conn = st.connection("gcs", type=FilesConnection) 
-        file_path = f"streamlit-sykinet/base sykinet/df_secheresse{dept_code}.csv"
-        
-        df = conn.read(file_path, input_format="csv")
-        df['geometry'] = df['geometry'].apply(wkt.loads)
-        gdf = gpd.GeoDataFrame(df, geometry='geometry', crs="EPSG:2154")
+        gdf = layer_load("secheresse", dept_code)()
         
         # S'assurer que la colonne 'ALEA' est présente et de type string pour la légende
         if 'ALEA' not in gdf.columns:
@@ -98,37 +95,59 @@ def load_secheresse_data(dept_code):
         return None
 
 # ***************************************************************
-# 4. Appel des Fonctions de Chargement
+# 4. Chargement à la Demande et Cache de Rendu
 # ***************************************************************
 
-# Conteneur pour afficher un message de chargement pendant l'appel
-loading_placeholder = st.empty()
-loading_placeholder.info(f"Chargement des données de cartographie pour le département {departement}...")
-
-gdf_inondation = load_inondation_data(departement)
-gdf_secheresse = load_secheresse_data(departement)
-
-loading_placeholder.empty() # Effacer le message de chargement une fois terminé
-
-# Arrêter l'exécution si l'une des cartes manque
-if gdf_inondation is None or gdf_secheresse is None:
-    st.error("Impossible de poursuivre : au moins une source de données est manquante ou a échoué au chargement.")
-    st.stop()
-
-# Définitions de légendes
-legend_mapping_inondation = {
-    0: ['#4CAF50', "Pas de risque (Nappe/Cave)"], # Vert
-    1: ['#FFC107', "Aléa Débordement de Nappe"], # Jaune/Orange
-    2: ['#2196F3', "Aléa Inondation de Cave"] # Bleu
-}
-
-# --- LÉGENDE DE SÉCHERESSE MODIFIÉE POUR RESPECTER L'ÉCHELLE D'IMPORTANCE ---
-legend_mapping_secheresse = {
-    "Nul": ["#E8F5E9",'Pas de risque (Nul)'], # Vert très clair, proche du blanc
-    "Faible": ['#4CAF50', "Risque faible"],    # Vert
-    "Moyen": ['#FFC107', "Risque moyen"],    # Jaune/Orange
-    "Fort": ['#F44336', "Risque fort"]      # Rouge
-}
+# Les images déjà rendues pour ce département et cette version des données sont
+# relues depuis le cache disque : les couches ne sont chargées qu'en cas d'absence.
+render_cache = get_render_cache()
+_layers = {}
+
+def map_cached(layer, dept_code):
+    return render_cache.make_key(*render_key("carte", layer, dept_code=dept_code)) in render_cache
+
+def needs_layer(layer, dept_code):
+    # La couche n'est chargée que pour rendre une carte absente du cache sans fichier projeté
+    return not map_cached(layer, dept_code) and mapped_layer(layer, dept_code) is None
+
+def map_figure(layer):
+    # Fichier projeté en mémoire (python -m sykinet.mapped) : rastérisation directe,
+    # sans lecture ni décodage de la couche
+    mapped = mapped_layer(layer, departement)
+    if mapped is not None:
+        with span("rasterisation_projetee"):
+            raster = mapped.rasterize(MAP_RASTER_PX)
+        return raster_map_figure(raster, layer, departement)
+    return hazard_map_figure(get_layer(layer), layer, departement)
+
+def get_layer(layer):
+    if layer not in _layers:
+        # L'autre couche, si sa carte reste à rendre, se charge en parallèle de celle-ci
+        if not interactive_mode:
+            prefetch(*[layer_load(other, departement) for other in LAYER_COLUMNS
+                       if other != layer and needs_layer(other, departement)])
+        loading_placeholder = st.empty()
+        loading_placeholder.info(f"Chargement des données de cartographie pour le département {departement}...")
+        gdf = load_inondation_data(departement) if layer == "inondation" else load_secheresse_data(departement)
+        loading_placeholder.empty() # Effacer le message de chargement une fois terminé
+        
+        # Arrêter l'exécution si la couche manque
+        if gdf is None:
+            st.error("Impossible de poursuivre : au moins une source de données est manquante ou a échoué au chargement.")
+            finish()
+            st.stop()
+        _layers[layer] = gdf
+    return _layers[layer]
+
+def render_key(kind, layer, dataset=None, dept_code=None):
+    # (page, version des données, département, couche, paramètres de style)
+    dept_code = dept_code or departement
+    try:
+        version = load_dataset_version(dataset or layer, None if dataset else dept_code)
+    except FileNotFoundError:
+        # Données absentes : le chargement signalera l'erreur à l'utilisateur
+        version = None
+    return ("page2", version, dept_code, layer, kind, STYLE_VERSION, MAP_FIGSIZE)
 
 # ***************************************************************
 # 5. Affichage de la Carte d'Inondation
@@ -137,59 +156,22 @@ legend_mapping_secheresse = {
 st.header("🌊 Carte d'Aléa Inondation")
 
 with st.container(border=True):
+    deck_inondation = tile_deck("inondation", departement) if interactive_mode else None
+    if interactive_mode and deck_inondation is None:
+        st.warning(f"Tuiles non générées pour le département {departement} (python -m sykinet.tiles --dept {departement}) : affichage de la carte statique.")
     
-    # --- Configuration Matplotlib ---
-    fig_inondation, ax_inondation = plt.subplots(figsize=(12, 12)) 
-
-    # Calcul des bornes
-    minx, miny, maxx, maxy = gdf_inondation.total_bounds
-    x_buffer = (maxx - minx) * 0.02
-    y_buffer = (maxy - miny) * 0.02
-    
-    ax_inondation.set_xlim(minx - x_buffer, maxx + x_buffer)
-    ax_inondation.set_ylim(miny - y_buffer, maxy + y_buffer)
-    ax_inondation.set_aspect('equal')
-    ax_inondation.set_axis_off() 
-    ax_inondation.set_title(f"Carte d'Aléa Basée sur le Gridcode - Département {departement}", fontsize=18)
-    
-    legend_handles = []
-    
-    with st.spinner("Génération de la carte d'inondation..."):
-        # Dessiner le fond (par exemple, les zones sans risque ou l'ensemble du département)
-        gdf_inondation.plot(
-            ax=ax_inondation,
-            color='lightgrey', # Couleur de fond par défaut
-            edgecolor='white',
-            linewidth=0.01,
-            alpha=0.5
-        )
-
-        for code, (color, label) in legend_mapping_inondation.items():
-            subset = gdf_inondation[gdf_inondation['gridcode'] == code]
-            
-            if not subset.empty:
-                subset.plot(
-                    ax=ax_inondation,
-                    color=color,
-                    edgecolor='lightgray',
-                    linewidth=0.05,
-                    alpha=0.9
-                )
-                legend_handles.append(Patch(facecolor=color, edgecolor='black', label=label))
-
-    # Créer la légende discrète
-    if legend_handles: 
-        ax_inondation.legend(
-            handles=legend_handles, 
-            title="Grille de Code d'Aléa",
-            loc='lower right', 
-            fancybox=True, 
-            framealpha=0.85, 
-            borderpad=1,
-            fontsize=10
-        )
-    
-    st.pyplot(fig_inondation, use_container_width=True)
+    if deck_inondation is not None:
+        # Carte interactive : seules les tuiles visibles sont téléchargées
+        with span("affichage"):
+            st.pydeck_chart(deck_inondation, use_container_width=True)
+    else:
+        with st.spinner("Génération de la carte d'inondation..."):
+            png_inondation = render_cache.get_or_render(
+                render_key("carte", "inondation"),
+                lambda: map_figure("inondation")
+            )
+        with span("affichage"):
+            st.image(png_inondation, use_container_width=True)
 
 
 # ***************************************************************
@@ -199,70 +181,34 @@ with st.container(border=True):
 st.header("☀️ Carte de Risque Sécheresse")
 
 with st.container(border=True):
+    deck_secheresse = tile_deck("secheresse", departement) if interactive_mode else None
+    if interactive_mode and deck_secheresse is None:
+        st.warning(f"Tuiles non générées pour le département {departement} (python -m sykinet.tiles --dept {departement}) : affichage de la carte statique.")
     
-    # --- Configuration Matplotlib ---
-    fig_secheresse, ax_secheresse = plt.subplots(figsize=(12, 12)) 
-
-    # Calcul des bornes (utilisez les bornes de gdf_secheresse)
-    minx2, miny2, maxx2, maxy2 = gdf_secheresse.total_bounds
-    x_buffer2 = (maxx2 - minx2) * 0.02
-    y_buffer2 = (maxy2 - miny2) * 0.02
-    
-    ax_secheresse.set_xlim(minx2 - x_buffer2, maxx2 + x_buffer2)
-    ax_secheresse.set_ylim(miny2 - y_buffer2, maxy2 + y_buffer2)
-    ax_secheresse.set_aspect('equal')
-    ax_secheresse.set_axis_off() 
-    ax_secheresse.set_title(f"Carte de risque sécheresse - Département {departement}", fontsize=18)
-    
-    legend_handles2 = []
-    
-    # Dessiner le fond de la carte de sécheresse
-    gdf_secheresse.plot(
-        ax=ax_secheresse,
-        color='lightgrey', 
-        edgecolor='white',
-        linewidth=0.01,
-        alpha=0.5
-    )
-
-    # Itération sur les classes de texte ("Nul", "Faible", "Moyen", "Fort")
-    with st.spinner("Génération de la carte sécheresse..."):
-        for code, (color, label) in legend_mapping_secheresse.items():
-            
-            # Utilisation de la colonne 'ALEA' comme spécifié dans votre code
-            subset2 = gdf_secheresse[gdf_secheresse['ALEA'] == code]
-            
-            if not subset2.empty:
-                subset2.plot(
-                    ax=ax_secheresse,
-                    color=color,
-                    edgecolor='lightgray',
-                    linewidth=0.05,
-                    alpha=0.9
-                )
-                legend_handles2.append(Patch(facecolor=color, edgecolor='black', label=label))
-
-    # Créer la légende discrète
-    if legend_handles2: 
-        ax_secheresse.legend(
-            handles=legend_handles2, 
-            title="Grille des risques",
-            loc='lower right', 
-            fancybox=True, 
-            framealpha=0.85, 
-            borderpad=1,
-            fontsize=10
-        )
-    
-    st.pyplot(fig_secheresse, use_container_width=True)
+    if deck_secheresse is not None:
+        # Carte interactive : seules les tuiles visibles sont téléchargées
+        with span("affichage"):
+            st.pydeck_chart(deck_secheresse, use_container_width=True)
+    else:
+        # Itération sur les classes de texte ("Nul", "Faible", "Moyen", "Fort")
+        with st.spinner("Génération de la carte sécheresse..."):
+            png_secheresse = render_cache.get_or_render(
+                render_key("carte", "secheresse"),
+                lambda: map_figure("secheresse")
+            )
+        with span("affichage"):
+            st.image(png_secheresse, use_container_width=True)
 
 # ***************************************************************
 # 7. Fin et Bouton d'Action
 # ***************************************************************
 st.sidebar.markdown("---")
-if st.sidebar.button("🔄 Actualiser les Cartes (Vider le cache)"):
-    # Vider le cache de toutes les fonctions @st.cache_data
-    st.cache_data.clear()
+if st.sidebar.button("🔄 Actualiser les Cartes du département"):
+    # Revalide les versions et ne retire que les couches de ce département :
+    # les autres départements et les autres pages gardent leur cache
+    load_dataset_version.clear()
+    load_lod_manifest.clear()
+    get_dataset_cache().invalidate(dept=departement)
     st.rerun()
 
 st.sidebar.success("Prêt à visualiser !")
@@ -274,68 +220,57 @@ st.sidebar.success("Prêt à visualiser !")
 st.header("📈 Répartition des Surfaces d'Aléa par Risque")
 col_inondation, col_secheresse = st.columns(2)
 
+# Surfaces par classe pré-calculées pour tous les départements (python -m sykinet.aggregates) :
+# aucune géométrie n'est chargée ni mesurée pour les camemberts
+def show_area_pie(layer):
+    try:
+        aggregates = load_dataset(AGGREGATES_DATASET)
+        with span("surfaces"):
+            areas = areas_for(aggregates, layer, departement)
+    except FileNotFoundError:
+        areas = None
+    if areas is None or areas.empty:
+        st.info(f"Surfaces non calculées pour le département {departement} (python -m sykinet.aggregates --dept {departement}).")
+        return
+    png = render_cache.get_or_render(
+        render_key("camembert", layer, dataset=AGGREGATES_DATASET),
+        lambda: area_pie_figure(areas, layer, departement)
+    )
+    with span("affichage"):
+        st.image(png, use_container_width=True)
+
 # --- A. Camembert Inondation ---
 with col_inondation:
     st.subheader("Surface couverte par l'Aléa Inondation")
-    
-    # 1. Calcul des surfaces
-    # S'assurer que les polygones sont valides (parfois nécessaire avant le calcul de surface)
-    gdf_inondation['area'] = gdf_inondation.geometry.area 
-    
-    # Grouper par 'gridcode' et sommer les surfaces
-    area_by_inondation = gdf_inondation.groupby('gridcode')['area'].sum()
-    
-    # 2. Création des données pour le graphique
-    labels_inondation = [legend_mapping_inondation[code][1] for code in area_by_inondation.index]
-    colors_inondation = [legend_mapping_inondation[code][0] for code in area_by_inondation.index]
-    
-    fig_inondation_pie, ax_inondation_pie = plt.subplots(figsize=(8, 8))
-    
-    ax_inondation_pie.pie(
-        area_by_inondation,
-        labels=labels_inondation,
-        colors=colors_inondation,
-        autopct='%1.1f%%', # Afficher les pourcentages avec une décimale
-        startangle=90,
-        textprops={'fontsize': 12, 'fontweight': 'bold'}
-    )
-    ax_inondation_pie.set_title(f"Répartition de la Surface d'Aléa Inondation ({departement})", fontsize=14)
-    
-    st.pyplot(fig_inondation_pie, use_container_width=True)
+    # Surfaces sommées par 'gridcode'
+    show_area_pie("inondation")
 
 # --- B. Camembert Sécheresse ---
 with col_secheresse:
     st.subheader("Surface couverte par le Risque Sécheresse")
+    # Surfaces sommées par 'ALEA', dans l'ordre logique (Nul, Faible, Moyen, Fort)
+    show_area_pie("secheresse")
+
+# Préchargement en arrière-plan des départements voisins dans le sélecteur :
+# un changement de département trouve le plus souvent ses données déjà chargées
+# Seules les couches dont la carte n'est pas en cache sont préchargées
+if not interactive_mode:
+    warmups = {voisin: tuple((layer, columns) for layer, columns in LAYER_COLUMNS.items() if needs_layer(layer, voisin))
+               for voisin in neighbours(departement)}
+    prefetch(*[partial(warm_department, load_map_dataset, voisin, layers, figsize=MAP_FIGSIZE, shared=True)
+               for voisin, layers in warmups.items() if layers])
+
+# Compteurs des caches de rendu et des couches (partagés par toutes les sessions)
+cache_stats = render_cache.stats()
+st.sidebar.caption(
+    f"Cache de rendu : {cache_stats['hits']} succès / {cache_stats['misses']} échecs, "
+    f"{cache_stats['bytes'] / 1e6:.1f} Mo sur {cache_stats['max_bytes'] / 1e6:.0f} Mo"
+)
+layer_stats = get_dataset_cache().stats()
+st.sidebar.caption(
+    f"Cache des couches : {layer_stats['hits']} succès / {layer_stats['misses']} échecs / "
+    f"{layer_stats['evictions']} évictions, {layer_stats['entries']} couches, "
+    f"{layer_stats['bytes'] / 1e6:.1f} Mo sur {layer_stats['max_bytes'] / 1e6:.0f} Mo"
+)
 
-    # 1. Calcul des surfaces
-    gdf_secheresse['area'] = gdf_secheresse.geometry.area 
-    
-    # Grouper par 'ALEA' et sommer les surfaces
-    area_by_secheresse = gdf_secheresse.groupby('ALEA')['area'].sum()
-    
-    # 2. Création des données pour le graphique
-    
-    # On trie les catégories pour que le graphique suive l'ordre logique (Nul, Faible, Moyen, Fort)
-    risk_order = ["Nul", "Faible", "Moyen", "Fort"]
-    area_by_secheresse = area_by_secheresse.reindex(risk_order, fill_value=0)
-    
-    # On filtre pour ne garder que les catégories qui existent (surface > 0)
-    area_by_secheresse = area_by_secheresse[area_by_secheresse > 0] 
-    
-    # Extraction des labels et couleurs selon l'ordre trié
-    labels_secheresse = [legend_mapping_secheresse[code][1] for code in area_by_secheresse.index]
-    colors_secheresse = [legend_mapping_secheresse[code][0] for code in area_by_secheresse.index]
-    
-    fig_secheresse_pie, ax_secheresse_pie = plt.subplots(figsize=(8, 8))
-    
-    ax_secheresse_pie.pie(
-        area_by_secheresse,
-        labels=labels_secheresse,
-        colors=colors_secheresse,
-        autopct='%1.1f%%',
-        startangle=90,
-        textprops={'fontsize': 12, 'fontweight': 'bold'}
-    )
-    ax_secheresse_pie.set_title(f"Répartition de la Surface de Risque Sécheresse ({departement})", fontsize=14)
-    
-    st.pyplot(fig_secheresse_pie, use_container_width=True)
\ No newline at end of file
+finish()
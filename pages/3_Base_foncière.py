@@ -1,10 +1,11 @@
 import streamlit as st
 import pandas as pd
-from st_files_connection import FilesConnection 
 import matplotlib.pyplot as plt
 import numpy as np
 import seaborn as sns
 import plotly.express as px
+from sykinet.data import load_dataset
+from sykinet.spans import begin, finish, span
 
 # --- 1. CONFIGURATION DE PAGE ---
 st.set_page_config(
@@ -12,6 +13,7 @@ st.set_page_config(
     layout="wide", 
     initial_sidebar_state="expanded"
 )
+begin("page3")
 
 # --- 2. TITRE ET INTRODUCTION ---
 st.title("Présentation du jeu de données des valeurs foncières 🏠📊")
@@ -20,13 +22,10 @@ st.markdown("""
 Voici une première visualisation du contenu du jeu de données des valeurs foncières.
 """)
 
-path = "streamlit-sykinet/base sykinet/"
-conn = st.connection("gcs", type=FilesConnection)
-
-# --- 3. CHARGEMENT DES DONNÉES ---
-df_doublons_raw = conn.read(path + "df_doublons.csv", input_format="csv")
-diff_locaux = conn.read(path + "differents_locaux.csv", input_format="csv")
-nature_mutations = conn.read(path + "nature_mutation.csv", input_format="csv")
+# --- 3. CHARGEMENT DES DONNÉES (mis en cache par sykinet.data) ---
+df_doublons_raw = load_dataset("df_doublons")
+diff_locaux = load_dataset("differents_locaux")
+nature_mutations = load_dataset("nature_mutation")
 
 
 # --- 4. PRÉPARATION ET TRANSFORMATION DES DONNÉES ---
@@ -66,7 +65,8 @@ with col_d:
             title='Statut des Observations'
         )
         fig_doublons.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig_doublons, use_container_width=True)
+        with span("affichage"):
+            st.plotly_chart(fig_doublons, use_container_width=True)
     except Exception as e:
         st.error(f"Erreur lors de la création du graphique Doublons. Erreur: {e}")
 
@@ -82,7 +82,8 @@ with col_l:
             title='Distribution des Types de Locaux'
         )
         fig_locaux.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig_locaux, use_container_width=True)
+        with span("affichage"):
+            st.plotly_chart(fig_locaux, use_container_width=True)
     except Exception as e:
         st.error(f"Erreur lors de la création du graphique Locaux. Erreur: {e}")
 
@@ -98,7 +99,8 @@ with col_m:
             title='Nature des Transactions'
         )
         fig_mutations.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig_mutations, use_container_width=True)
+        with span("affichage"):
+            st.plotly_chart(fig_mutations, use_container_width=True)
     except Exception as e:
         st.error(f"Erreur lors de la création du graphique Mutations. Erreur: {e}")
 
@@ -125,4 +127,6 @@ with st.container(border=True):
     * **Pistes Futures :** Un travail ultérieur pourrait être mené pour explorer l'impact sur d'autres types de biens comme les locaux industriels, les dépendances ou les terrains à bâtir.
     
     Ces choix méthodologiques nous permettent de travailler sur une base plus pertinente pour répondre à notre question principale.
-    """)
\ No newline at end of file
+    """)
+
+finish()
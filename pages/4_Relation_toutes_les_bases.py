@@ -1,10 +1,17 @@
 import streamlit as st
 import pandas as pd
-from st_files_connection import FilesConnection 
 import matplotlib.pyplot as plt
 import numpy as np
-import seaborn as sns
-import plotly.express as px
+from functools import partial
+from sykinet.departements import REGIONS
+from sykinet.features import FEATURE_SPECS, MAPPING_LABELS_INOND, load_features
+from sykinet.figures import box_plot
+from sykinet.filters import load_index, take
+from sykinet.hedonic import FIXED_EFFECTS, load_fit
+from sykinet.prefetch import prefetch
+from sykinet.quantiles import box_stats, compute_sketches, load_sketches
+from sykinet.scatter import MAX_POINTS, scatter_figure
+from sykinet.spans import begin, finish, span
 
 # --- 1. CONFIGURATION DE PAGE ---
 st.set_page_config(
@@ -12,6 +19,7 @@ st.set_page_config(
     layout="wide", 
     initial_sidebar_state="expanded"
 )
+begin("page4")
 
 # --- 2. TITRE ET INTRODUCTION ---
 st.title("Mise en relation des risques climatiques et des valeurs foncières 🏠📊")
@@ -30,8 +38,146 @@ with st.expander("Détails de la méthodologie"):
     La base des maisons est plus complexe car le prix total inclut le bâtiment et la surface du terrain. Pour pouvoir faire des comparaisons significatives, nous avons sélectionné des maisons aux caractéristiques similaires (surface du terrain entre 300 et 400 $m^2$ et surface du bâtiment entre 80 et 105 $m^2$). L'unité de mesure choisie est le **prix par mètre carré de surface de terrain**.
     """)
 
-path = "streamlit-sykinet/base sykinet/"
-conn = st.connection("gcs", type=FilesConnection)
+# Les quatre bases (avec leurs colonnes dérivées pré-calculées, sykinet.features) sont
+# téléchargées et décodées en parallèle dès maintenant ; chaque chargement
+# ci-dessous attend simplement le résultat déjà en cours
+prefetch(*[partial(load, name) for name in FEATURE_SPECS for load in (load_index, load_sketches)])
+
+# Box plots tracés à partir des esquisses de quantiles pré-calculées (sykinet.quantiles),
+# sur les transactions hors outliers
+CLASSES_INOND = sorted(MAPPING_LABELS_INOND.values())
+NIVEAUX_SECH = [0.0, 1.0, 2.0, 3.0]
+
+TOUTES_REGIONS = "Toutes les régions"
+
+# Filtres de la barre latérale : chaque changement se résout sur les colonnes indexées
+# des bases (sykinet.filters), sans reparcourir toutes les transactions
+indexes = {name: load_index(name) for name in FEATURE_SPECS}
+
+
+def slider_bounds(names, column):
+    lows, highs = zip(*(indexes[name].ranges[column].bounds for name in names))
+    low, high = float(np.floor(np.nanmin(lows))), float(np.ceil(np.nanmax(highs)))
+    return low, max(high, low + 1)
+
+
+BORNES_BATI = slider_bounds(["base_innond_final", "base_sech_final"], "surface_reelle_bati")
+BORNES_TERRAIN = slider_bounds(["base_innond_final_maison", "base_sech_final_maison"], "surface_terrain")
+BORNES_VALEUR = slider_bounds(FEATURE_SPECS, "valeur_fonciere")
+
+with st.sidebar:
+    st.header("Filtres")
+    region = st.selectbox("Région", [TOUTES_REGIONS] + list(REGIONS))
+    depts_disponibles = sorted({
+        dept for index in indexes.values() for dept in index.categories["code_departement"].categories
+        if region == TOUTES_REGIONS or dept in REGIONS[region]
+    })
+    depts_choisis = st.multiselect("Départements", depts_disponibles, placeholder="Tous")
+    classes_inond = st.multiselect("Risque d'inondation", CLASSES_INOND, default=CLASSES_INOND)
+    niveaux_sech = st.multiselect("Niveau de sécheresse", NIVEAUX_SECH, default=NIVEAUX_SECH)
+    surface_bati = st.slider("Surface bâtie (m², appartements)", *BORNES_BATI, value=BORNES_BATI)
+    surface_terrain = st.slider("Surface du terrain (m², maisons)", *BORNES_TERRAIN, value=BORNES_TERRAIN)
+    valeur = st.slider("Valeur foncière (€)", *BORNES_VALEUR, value=BORNES_VALEUR, step=1000.0)
+
+    # Au-delà de MAX_POINTS points, les nuages sont agrégés côté serveur (sykinet.scatter)
+    st.header("Nuages de points")
+    surface_max_nuage = st.number_input("Surface bâtie maximale (m²)", min_value=0, value=400, step=50)
+    valeur_max_nuage = st.number_input("Valeur foncière maximale (€)", min_value=0, value=1_000_000, step=50_000)
+    scatter_aggregation = st.radio(
+        f"Au-delà de {MAX_POINTS:,} transactions".replace(",", " "),
+        ["echantillon", "densite"],
+        format_func={"echantillon": "Échantillon stratifié", "densite": "Densité par classe"}.get,
+        help="Le nombre de points envoyés au navigateur reste borné quelle que soit la taille des données."
+    )
+
+    # Régressions à effets fixes de localisation (sykinet.hedonic), mises en cache par version
+    st.header("Régression hédonique")
+    effets_fixes = st.radio(
+        "Effets fixes de localisation",
+        list(FIXED_EFFECTS),
+        format_func={"departement": "Département", "commune": "Commune"}.get,
+    )
+
+if depts_choisis:
+    depts = depts_choisis
+elif region != TOUTES_REGIONS:
+    depts = REGIONS[region]
+else:
+    depts = None
+
+
+def criteres(name, surface, classes):
+    """
+    Critères des filtres pour une base : intervalles (surface, valeur foncière)
+    et modalités retenues (classe d'aléa, départements).
+    """
+    spec = FEATURE_SPECS[name]
+    categories = {spec.box_column: classes}
+    if depts is not None:
+        categories["code_departement"] = depts
+    return {spec.surface: surface, "valeur_fonciere": valeur}, categories
+
+
+def filtrer(name, df, surface, classes):
+    ranges, categories = criteres(name, surface, classes)
+    with span(f"filtres {name}"):
+        return take(df, indexes[name].select(ranges, categories))
+
+
+def filtrer_nuage(name, df, surface, classes):
+    """
+    Lignes du nuage de points : filtres de la barre latérale et bornes
+    (strictes) du nuage sur la surface bâtie et la valeur foncière.
+    """
+    _, categories = criteres(name, surface, classes)
+    ranges = {
+        "surface_reelle_bati": (surface[0], min(surface[1], np.nextafter(surface_max_nuage, -np.inf))),
+        "valeur_fonciere": (valeur[0], min(valeur[1], np.nextafter(valeur_max_nuage, -np.inf))),
+    }
+    with span(f"filtres nuage {name}"):
+        df_plot = take(df, indexes[name].select(ranges, categories))
+        return df_plot[df_plot["masque_nuage"]]
+
+
+def afficher_regression(name):
+    """
+    Effet des classes d'aléa sur le prix au m² à localisation égale, sous le box plot d'une base.
+    """
+    with st.expander("Effet du risque à localisation égale (régression à effets fixes)"):
+        try:
+            resultat = load_fit(name, effets_fixes)
+        except Exception as e:
+            st.warning(f"⚠️ Régression non estimée pour {name} : {e}")
+            return
+        st.dataframe(
+            resultat.table.style.format({
+                "Coefficient": "{:.4f}", "Écart-type": "{:.4f}", "t": "{:.2f}",
+                "p-valeur": "{:.3f}", "Effet sur le prix (%)": "{:+.1f}",
+            }),
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.caption(
+            f"log(prix au m²) expliqué par la classe d'aléa (référence : {resultat.reference}) et "
+            f"log(surface), avec un effet fixe par {resultat.fixed_effect} ; écarts-types robustes "
+            f"par {resultat.fixed_effect}. {resultat.n_obs} ventes, {resultat.n_groups} groupes, "
+            f"R² within {resultat.r2_within:.3f}. Estimation sur toute la base, hors filtres."
+        )
+
+
+def box_stats_filtres(name, df_filtre, surface, classes, order):
+    """
+    Statistiques des box plots d'une base filtrée : fusion des esquisses
+    pré-calculées tant que seuls départements et classes filtrent, esquisses
+    des seules transactions retenues sinon.
+    """
+    ranges, _ = criteres(name, surface, classes)
+    if all(indexes[name].ranges[column].covers(*bounds) for column, bounds in ranges.items()):
+        sketches = load_sketches(name)
+        with span("quantiles"):
+            return box_stats(sketches, order, depts=depts, classes=classes)
+    with span("quantiles filtres"):
+        return box_stats(compute_sketches(df_filtre, FEATURE_SPECS[name]), order)
 
 # ==============================================================================
 # SECTION 1 : APPARTEMENTS
@@ -39,17 +185,9 @@ conn = st.connection("gcs", type=FilesConnection)
 st.header("1. Analyse pour les Appartements 🏢")
 st.markdown("---")
 
-# Chargement des données d'inondation
-df_resultat_innond_final = conn.read(path + "base_innond_final.csv", input_format="csv")
-
-# --- CORRECTION DES DONNÉES EN AMONT ---
-MAPPING_LABELS_INOND = {
-    "Pas de débordement de nappe ni d'inondation de cave": 'Pas de Risque',
-    "Zones potentiellement sujettes aux inondations de cave": 'Risque Caves',
-    "Zones potentiellement sujettes aux débordements de nappe": 'Risque Nappes'
-}
-
-df_resultat_innond_final['Risque_innond_court'] = df_resultat_innond_final['Risque_innond'].map(MAPPING_LABELS_INOND)
+# Chargement des données d'inondation : libellés courts (MAPPING_LABELS_INOND), prix au m²
+# et filtres d'outliers sont pré-calculés une fois par version des données
+df_resultat_innond_final = filtrer("base_innond_final", load_features("base_innond_final"), surface_bati, classes_inond)
 
 # --- Risque Inondation (Appartements) ---
 st.subheader("Risque d'Inondation : Distribution et Impact sur le Prix/m² Bâti")
@@ -65,54 +203,54 @@ with col1_inond:
     plt.ylabel("Nombre de transactions")
     plt.xticks(rotation=45, ha='right') 
     plt.tight_layout()
-    st.pyplot(fig)
+    with span("affichage"):
+        st.pyplot(fig)
 
 with col2_inond:
     st.markdown("##### Valeur Foncière vs. Surface (Filtrée)")
-    df_plot_inond = df_resultat_innond_final.copy()
-    df_plot_inond = df_plot_inond[(df_plot_inond["surface_reelle_bati"] < 400) & (df_plot_inond["valeur_fonciere"] < 1e6)]
+    df_plot_inond = filtrer_nuage("base_innond_final", load_features("base_innond_final"), surface_bati, classes_inond)
     
-    fig2_plotly = px.scatter(
-        df_plot_inond,
-        x="surface_reelle_bati",
-        y="valeur_fonciere",
-        color="Risque_innond_court", 
-        hover_name="Risque_innond_court", 
-        title="Valeur Foncière par Surface selon le Risque",
-        color_discrete_map={
-            'Pas de Risque': '#4CAF50', 
-            'Risque Caves': '#2196F3', 
-            'Risque Nappes': '#FFC107' 
-        }
-    )
+    with span("nuage"):
+        fig2_plotly, note_inond = scatter_figure(
+            df_plot_inond,
+            x="surface_reelle_bati",
+            y="valeur_fonciere",
+            color="Risque_innond_court", 
+            aggregation=scatter_aggregation,
+            hover_name="Risque_innond_court", 
+            title="Valeur Foncière par Surface selon le Risque",
+            color_discrete_map={
+                'Pas de Risque': '#4CAF50', 
+                'Risque Caves': '#2196F3', 
+                'Risque Nappes': '#FFC107' 
+            }
+        )
     fig2_plotly.update_layout(height=400)
-    st.plotly_chart(fig2_plotly, use_container_width=True)
+    with span("affichage"):
+        st.plotly_chart(fig2_plotly, use_container_width=True)
+    if note_inond:
+        st.caption(note_inond)
 
 
 st.markdown("##### Box Plot : Prix au $m^2$ Bâti en fonction du Risque d'Inondation")
-df_resultat_innond_final["valeur_fonciere_par_surface"] = df_resultat_innond_final['valeur_fonciere']/df_resultat_innond_final['surface_reelle_bati']
-df_innond_filtered = df_resultat_innond_final[~df_resultat_innond_final["Risque_innond"].isna()]
-df_innond_filtered = df_innond_filtered[df_innond_filtered["valeur_fonciere_par_surface"] < 1e4] # Nettoyage des outliers
 
 fig3 = plt.figure(figsize=(10, 6))
-sns.boxplot(
-    x='Risque_innond_court', 
-    y='valeur_fonciere_par_surface', 
-    data=df_innond_filtered,
-    palette=['#4CAF50', '#2196F3', '#FFC107']
-)
+positions, stats = box_stats_filtres("base_innond_final", df_resultat_innond_final, surface_bati, classes_inond, CLASSES_INOND)
+with span("trace"):
+    box_plot(plt.gca(), positions, stats, labels=CLASSES_INOND, colors=['#4CAF50', '#2196F3', '#FFC107'])
 plt.title('Distribution du Prix/m² Bâti en fonction du Type de Risque d\'Inondation (Appartements)')
 plt.xlabel("Type de Risque d'Inondation")
 plt.ylabel('Prix au $m^2$ (Valeur Foncière / Surface Bâtie)')
 plt.xticks(rotation=45, ha='right') 
 plt.tight_layout()
-st.pyplot(fig3)
+with span("affichage"):
+    st.pyplot(fig3)
+afficher_regression("base_innond_final")
 
 
 # --- Risque Sécheresse (Appartements) ---
 st.subheader("Risque Sécheresse : Distribution et Impact sur le Prix/m² Bâti")
-df_resultat = conn.read(path + "base_sech_final.csv", input_format="csv") 
-df_resultat["valeur_fonciere_par_surface"] = df_resultat['valeur_fonciere']/df_resultat['surface_reelle_bati']
+df_resultat = filtrer("base_sech_final", load_features("base_sech_final"), surface_bati, niveaux_sech)
 
 col1_sech_dist, col2_sech_scatter = st.columns(2)
 
@@ -121,57 +259,62 @@ with col1_sech_dist:
     
     secheresse_counts = df_resultat['zone_niveau'].value_counts().sort_index()
     
-    fig_sech_dist = plt.figure(figsize=(6,4))
-    secheresse_counts.plot(
-        kind='bar', 
-        color=['#E8F5E9','#4CAF50', '#FFC107', '#F44336']
-    )
-    plt.xlabel("Niveau de Risque Sécheresse")
-    plt.ylabel("Nombre de transactions")
-    plt.title("Répartition des Niveaux de Risque (0.0 à 3.0)")
-    plt.xticks(rotation=0)
-    plt.tight_layout()
-    st.pyplot(fig_sech_dist)
+    if secheresse_counts.empty:
+        st.info("Aucune transaction ne correspond aux filtres.")
+    else:
+        fig_sech_dist = plt.figure(figsize=(6,4))
+        secheresse_counts.plot(
+            kind='bar', 
+            color=['#E8F5E9','#4CAF50', '#FFC107', '#F44336']
+        )
+        plt.xlabel("Niveau de Risque Sécheresse")
+        plt.ylabel("Nombre de transactions")
+        plt.title("Répartition des Niveaux de Risque (0.0 à 3.0)")
+        plt.xticks(rotation=0)
+        plt.tight_layout()
+        with span("affichage"):
+            st.pyplot(fig_sech_dist)
 
 
 with col2_sech_scatter:
     st.markdown("##### Valeur Foncière vs. Surface selon le Niveau de Sécheresse")
     
-    df_plot_sech = df_resultat[(df_resultat["surface_reelle_bati"] < 400) & (df_resultat["valeur_fonciere"] < 1e6)].copy()
-    df_plot_sech['zone_niveau_str'] = df_plot_sech['zone_niveau'].astype(str)
-    df_plot_sech = df_plot_sech.dropna().sort_values(by = "zone_niveau_str")
+    # Lignes déjà triées par niveau ; le masque écarte aussi les valeurs manquantes
+    df_plot_sech = filtrer_nuage("base_sech_final", load_features("base_sech_final"), surface_bati, niveaux_sech)
     
-    fig4_plotly = px.scatter(
-        df_plot_sech,
-        x="surface_reelle_bati",
-        y="valeur_fonciere",
-        color="zone_niveau_str",
-        hover_name="zone_niveau_str",
-        title="Impact du Niveau de Sécheresse",
-        labels={'zone_niveau_str': 'Niveau Sécheresse'},
-        color_discrete_sequence=['#E8F5E9', '#4CAF50', '#FFC107', '#F44336']
-    )
+    with span("nuage"):
+        fig4_plotly, note_sech = scatter_figure(
+            df_plot_sech,
+            x="surface_reelle_bati",
+            y="valeur_fonciere",
+            color="zone_niveau_str",
+            aggregation=scatter_aggregation,
+            hover_name="zone_niveau_str",
+            title="Impact du Niveau de Sécheresse",
+            labels={'zone_niveau_str': 'Niveau Sécheresse'},
+            color_discrete_sequence=['#E8F5E9', '#4CAF50', '#FFC107', '#F44336']
+        )
     fig4_plotly.update_layout(height=450)
-    st.plotly_chart(fig4_plotly, use_container_width=True)
+    with span("affichage"):
+        st.plotly_chart(fig4_plotly, use_container_width=True)
+    if note_sech:
+        st.caption(note_sech)
 
 
 st.markdown("##### Box Plot : Prix au $m^2$ Bâti en fonction du Risque Sécheresse")
-df_sech_filtered = df_resultat[df_resultat["valeur_fonciere_par_surface"] < 1e4]
 
 fig5 = plt.figure(figsize=(10, 6))
-sns.boxplot(
-    x='zone_niveau', 
-    y='valeur_fonciere_par_surface', 
-    data=df_sech_filtered,
-    order=[0.0, 1.0, 2.0, 3.0], 
-    palette=['#E8F5E9','#4CAF50', '#FFC107', '#F44336']
-)
+positions, stats = box_stats_filtres("base_sech_final", df_resultat, surface_bati, niveaux_sech, NIVEAUX_SECH)
+with span("trace"):
+    box_plot(plt.gca(), positions, stats, labels=NIVEAUX_SECH, colors=['#E8F5E9','#4CAF50', '#FFC107', '#F44336'])
 plt.title('Distribution du Prix/m² Bâti par Niveau de Risque Sécheresse (Appartements)')
 plt.xlabel('Niveau de Risque Sécheresse (0.0: Très Faible, 3.0: Très Fort)')
 plt.ylabel('Prix au $m^2$ (Valeur Foncière / Surface Bâtie)')
 plt.xticks(rotation=0)
 plt.tight_layout()
-st.pyplot(fig5)
+with span("affichage"):
+    st.pyplot(fig5)
+afficher_regression("base_sech_final")
 
 
 # ==============================================================================
@@ -183,9 +326,9 @@ st.markdown("---")
 # --- Risque Inondation (Maisons) ---
 st.subheader("Risque d'Inondation : Distribution et Impact sur le Prix/m² Terrain")
 
-df_resultat_innond_maison_final = conn.read(path + "base_innond_final_maison.csv", input_format="csv")
-df_resultat_innond_maison_final["valeur_fonciere_par_surface"] = df_resultat_innond_maison_final['valeur_fonciere']/df_resultat_innond_maison_final['surface_terrain']
-df_resultat_innond_maison_final['Risque_innond_court'] = df_resultat_innond_maison_final['Risque_innond'].map(MAPPING_LABELS_INOND)
+df_resultat_innond_maison_final = filtrer(
+    "base_innond_final_maison", load_features("base_innond_final_maison"), surface_terrain, classes_inond
+)
 
 
 col1_maison_inond_dist, col2_maison_inond_box = st.columns(2)
@@ -200,32 +343,32 @@ with col1_maison_inond_dist:
     plt.ylabel("Nombre de transactions")
     plt.xticks(rotation=45, ha='right')
     plt.tight_layout()
-    st.pyplot(fig7)
+    with span("affichage"):
+        st.pyplot(fig7)
 
 with col2_maison_inond_box:
     st.markdown("##### Box Plot : Prix au $m^2$ Terrain en fonction du Risque d'Inondation")
-    df_maison_inond_filtered = df_resultat_innond_maison_final[df_resultat_innond_maison_final["valeur_fonciere_par_surface"] < 1.4e3]
 
     fig8 = plt.figure(figsize=(10, 6))
-    sns.boxplot(
-        x='Risque_innond_court', 
-        y='valeur_fonciere_par_surface', 
-        data=df_maison_inond_filtered,
-        palette=['#4CAF50', '#2196F3', '#FFC107']
+    positions, stats = box_stats_filtres(
+        "base_innond_final_maison", df_resultat_innond_maison_final, surface_terrain, classes_inond, CLASSES_INOND
     )
+    with span("trace"):
+        box_plot(plt.gca(), positions, stats, labels=CLASSES_INOND, colors=['#4CAF50', '#2196F3', '#FFC107'])
     plt.title('Distribution du Prix/m² Terrain par Risque d\'Inondation (Maisons)')
     plt.xlabel("Type de Risque d'Inondation")
     plt.ylabel('Prix au $m^2$ Terrain (Valeur Foncière / Surface Terrain)')
     plt.xticks(rotation=45, ha='right')
     plt.tight_layout()
-    st.pyplot(fig8)
+    with span("affichage"):
+        st.pyplot(fig8)
+    afficher_regression("base_innond_final_maison")
 
 
 # --- Risque Sécheresse (Maisons) ---
 st.subheader("Risque Sécheresse : Distribution et Impact sur le Prix/m² Terrain")
 
-df_resultat_maison = conn.read(path + "base_sech_final_maison.csv", input_format="csv") 
-df_resultat_maison["valeur_fonciere_par_surf"] = df_resultat_maison["valeur_fonciere"] / df_resultat_maison["surface_terrain"]
+df_resultat_maison = filtrer("base_sech_final_maison", load_features("base_sech_final_maison"), surface_terrain, niveaux_sech)
 
 col1_maison_sech_dist, col2_maison_sech_box = st.columns(2)
 
@@ -234,38 +377,40 @@ with col1_maison_sech_dist:
     
     secheresse_counts_maison = df_resultat_maison['zone_niveau'].value_counts().sort_index()
     
-    fig_sech_maison_dist = plt.figure(figsize=(6,4))
-    secheresse_counts_maison.plot(
-        kind='bar', 
-        color=['#E8F5E9','#4CAF50', '#FFC107', '#F44336']
-    )
-    plt.xlabel("Niveau de Risque Sécheresse")
-    plt.ylabel("Nombre de transactions")
-    plt.title("Répartition des Niveaux de Risque (0.0 à 3.0)")
-    plt.xticks(rotation=0)
-    plt.tight_layout()
-    st.pyplot(fig_sech_maison_dist)
+    if secheresse_counts_maison.empty:
+        st.info("Aucune transaction ne correspond aux filtres.")
+    else:
+        fig_sech_maison_dist = plt.figure(figsize=(6,4))
+        secheresse_counts_maison.plot(
+            kind='bar', 
+            color=['#E8F5E9','#4CAF50', '#FFC107', '#F44336']
+        )
+        plt.xlabel("Niveau de Risque Sécheresse")
+        plt.ylabel("Nombre de transactions")
+        plt.title("Répartition des Niveaux de Risque (0.0 à 3.0)")
+        plt.xticks(rotation=0)
+        plt.tight_layout()
+        with span("affichage"):
+            st.pyplot(fig_sech_maison_dist)
 
 
 with col2_maison_sech_box:
     st.markdown("##### Box Plot : Prix au $m^2$ Terrain en fonction du Risque Sécheresse")
 
-    df_maison_sech_filtered = df_resultat_maison[df_resultat_maison["valeur_fonciere_par_surf"] < 1.5e3]
-
     fig6 = plt.figure(figsize=(10, 6))
-    sns.boxplot(
-        x='zone_niveau', 
-        y='valeur_fonciere_par_surf', 
-        data=df_maison_sech_filtered,
-        order=[0.0, 1.0, 2.0, 3.0], 
-        palette=['#E8F5E9','#4CAF50', '#FFC107', '#F44336']
+    positions, stats = box_stats_filtres(
+        "base_sech_final_maison", df_resultat_maison, surface_terrain, niveaux_sech, NIVEAUX_SECH
     )
+    with span("trace"):
+        box_plot(plt.gca(), positions, stats, labels=NIVEAUX_SECH, colors=['#E8F5E9','#4CAF50', '#FFC107', '#F44336'])
     plt.title('Distribution du Prix/m² Terrain par Niveau de Risque Sécheresse (Maisons)')
     plt.xlabel('Niveau de Risque Sécheresse (0.0: Très Faible, 3.0: Très Fort)')
     plt.ylabel('Prix au $m^2$ Terrain (Valeur Foncière / Surface Terrain)')
     plt.xticks(rotation=0)
     plt.tight_layout()
-    st.pyplot(fig6)
+    with span("affichage"):
+        st.pyplot(fig6)
+    afficher_regression("base_sech_final_maison")
 
 
 # ==============================================================================
@@ -298,4 +443,6 @@ with st.expander("Analyse Détaillée de l'Impact des Risques sur les Prix (Prix
     * **Péril Sécheresse (RGA) :**
         * La **hausse de prix moyenne du foncier est moins marquée** dans les zones à haut risque RGA pour les maisons que pour les appartements.
         * **Hypothèse :** Les maisons étant plus sensibles aux risques RGA que les appartements, la **diminution du prix causée par la localisation dans une zone sensible à la sécheresse compense** la hausse du prix liée à la localisation dans un endroit où le prix du foncier est naturellement plus élevé. C'est ici que l'effet de décote du risque RGA, même faible, pourrait être visible.
-    """)
\ No newline at end of file
+    """)
+
+finish()
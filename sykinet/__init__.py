@@ -0,0 +1,6 @@
+"""
+Outils partagés de l'application Sykinet (chargement et préparation des données).
+
+Les pages Streamlit (`pages/`) importent ce paquet ; les traitements hors ligne
+s'exécutent avec `python -m sykinet.<module>`.
+"""
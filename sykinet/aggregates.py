@@ -0,0 +1,104 @@
+"""
+Agrégats pré-calculés : surface par classe d'aléa et par département.
+
+Les camemberts de la page 2 n'ont besoin que de quelques sommes par classe ;
+ce traitement les calcule une fois pour les 96 départements (un processus par
+département, géométrie en pleine résolution) et les écrit dans une petite
+table `aggregats_surfaces.csv` lue par la page à la place des géométries.
+
+    python -m sykinet.aggregates --workers 8
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from sykinet.data import read_dataset
+from sykinet.departements import DEPARTEMENTS
+from sykinet.figures import order_areas
+from sykinet.legends import LAYER_LEGENDS
+from sykinet.schemas import get_schema
+from sykinet.storage import BASE_URL, data_path, filesystem_from_url
+
+AGGREGATES_DATASET = "aggregats_surfaces"
+
+
+def department_areas(fs, dept, base_path):
+    """
+    Surface totale (m²) par classe pour chaque couche d'aléa d'un département.
+    Les couches absentes du stockage sont ignorées.
+    """
+    rows = []
+    for layer, (class_column, _) in LAYER_LEGENDS.items():
+        try:
+            gdf = read_dataset(fs, layer, dept, columns=(class_column,), base_path=base_path)
+        except FileNotFoundError:
+            print(f"{layer} {dept} : fichier absent, ignoré", file=sys.stderr)
+            continue
+        areas = gdf.geometry.area.groupby(gdf[class_column], observed=True).sum()
+        rows += [
+            {"dept": dept, "layer": layer, "classe": str(code), "area": float(area)}
+            for code, area in areas.items()
+        ]
+    return rows
+
+
+def _department_task(args):
+    base_url, dept = args
+    fs, base_path = filesystem_from_url(base_url)
+    return department_areas(fs, dept, base_path)
+
+
+def build_aggregates(base_url=BASE_URL, depts=DEPARTEMENTS, workers=None):
+    """
+    Calcule les agrégats de tous les départements en parallèle et écrit la table.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = [row for dept_rows in pool.map(_department_task, [(base_url, d) for d in depts])
+                for row in dept_rows]
+    table = pd.DataFrame(rows, columns=["dept", "layer", "classe", "area"])
+
+    fs, base_path = filesystem_from_url(base_url)
+    path = data_path(get_schema(AGGREGATES_DATASET).filename, base_path)
+    if fs.exists(path):
+        # Les départements non recalculés conservent leurs agrégats précédents
+        previous = read_dataset(fs, AGGREGATES_DATASET, base_path=base_path)
+        previous = previous[~previous["dept"].isin(list(depts))]
+        table = pd.concat([previous.astype(table.dtypes.to_dict()), table], ignore_index=True)
+    table = table.sort_values(["dept", "layer", "classe"], ignore_index=True)
+    with fs.open(path, "w") as f:
+        table.to_csv(f, index=False)
+    return table
+
+
+def areas_for(table, layer, dept):
+    """
+    Série des surfaces par classe d'un département, indexée par les codes de la
+    légende (entiers pour `gridcode`, libellés pour `ALEA`) et ordonnée comme
+    les camemberts.
+    """
+    _, legend = LAYER_LEGENDS[layer]
+    rows = table[(table["layer"] == layer) & (table["dept"] == dept)]
+    index = rows["classe"].astype(str)
+    if all(isinstance(code, int) for code in legend):
+        index = index.astype(int)
+    areas = pd.Series(rows["area"].to_numpy(dtype=float), index=index.to_numpy()).sort_index()
+    return order_areas(areas, layer)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Surfaces par classe d'aléa et par département.")
+    parser.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--dept", action="append", help="Département(s) à traiter (défaut : tous).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    table = build_aggregates(args.base_url, args.dept or DEPARTEMENTS, args.workers)
+    print(f"{len(table)} lignes écrites pour {table['dept'].nunique()} départements")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+Banc d'essai reproductible des pages, sur données synthétiques locales.
+
+Les vraies bases ne sont que dans le bucket GCS : `generate` écrit dans un
+dossier local, organisé comme le bucket, des bases synthétiques à l'échelle
+d'un département (même schéma que les vraies) :
+
+* couches d'aléa `inondation` / `secheresse` : pavage de Voronoï de l'emprise
+  du département, classes `gridcode` / `ALEA` tirées au hasard, en GeoParquet
+  et en CSV à géométrie WKT ;
+* synthèses nationales de la page 1 (`pct_*` par département) ;
+* bases de transactions `base_*_final` de la page 4.
+
+`run` chronomètre sans navigateur chaque étape des pages 1, 2 et 4 sur ce
+dossier (système de fichiers local à la place du bucket) : chargement,
+décodage WKT, calcul de `NIVEAU`, agrégation des surfaces, colonnes dérivées,
+rendu des figures et sérialisation du cache. Les temps sont écrits en JSON ;
+`compare` signale les étapes plus lentes qu'une référence enregistrée.
+
+    python -m sykinet.bench generate /tmp/sykinet-bench
+    python -m sykinet.bench run /tmp/sykinet-bench --out bench.json
+    python -m sykinet.bench compare reference.json bench.json --threshold 0.2
+"""
+
+import argparse
+import json
+import pickle
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+
+import geopandas as gpd
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import Transformer
+
+from sykinet.aggregates import department_areas
+from sykinet.compact import compact
+from sykinet.data import read_dataset
+from sykinet.exposure import PCT_COLUMNS, compute_niveau
+from sykinet.features import FEATURE_SPECS, MAPPING_LABELS_INOND, compute_features
+from sykinet.figures import area_by_class, area_pie_figure, box_plot, figure_to_png, hazard_map_figure
+from sykinet.filters import build_index
+from sykinet.geoparquet import CRS, parquet_path
+from sykinet.hedonic import fit, regression_columns
+from sykinet.legends import LAYER_LEGENDS
+from sykinet.quantiles import box_stats, compute_sketches
+from sykinet.scatter import scatter_figure
+from sykinet.schemas import get_schema
+from sykinet.storage import data_path, filesystem_from_url
+
+FIXTURE_MANIFEST = "bench_manifest.json"
+DEPTS = ("33", "34")
+POLYGONS = 20_000
+SALES = 200_000
+SEED = 0
+
+# Emprise d'un département synthétique (m, Lambert-93) ; départements côte à côte
+DEPT_SIZE = 100_000
+ORIGIN = (350_000, 6_400_000)
+
+# Classe d'inondation (`CLASSE`) de chaque `gridcode`
+CLASSE_LABELS = {
+    0: "Pas de débordement de nappe ni d'inondation de cave",
+    1: "Zones potentiellement sujettes aux débordements de nappe",
+    2: "Zones potentiellement sujettes aux inondations de cave",
+}
+PACKAGES = ("numpy", "pandas", "geopandas", "shapely", "pyarrow", "matplotlib", "plotly", "streamlit")
+
+# Écart absolu sous lequel une différence de temps est attribuée au bruit (s)
+MIN_DELTA = 0.005
+
+
+# ***************************************************************
+# Données synthétiques
+# ***************************************************************
+
+def dept_box(i):
+    x0, y0 = ORIGIN[0] + i * DEPT_SIZE, ORIGIN[1]
+    return shapely.box(x0, y0, x0 + DEPT_SIZE, y0 + DEPT_SIZE)
+
+
+def voronoi_layer(rng, box, n_polygons):
+    """
+    Pavage de Voronoï de `box` (environ `n_polygons` polygones jointifs).
+    """
+    minx, miny, maxx, maxy = box.bounds
+    seeds = shapely.points(rng.uniform(minx, maxx, n_polygons), rng.uniform(miny, maxy, n_polygons))
+    cells = shapely.get_parts(shapely.voronoi_polygons(shapely.multipoints(seeds), extend_to=box))
+    cells = shapely.intersection(cells, box)
+    return cells[shapely.get_type_id(cells) == 3]
+
+
+def write_geo(fs, gdf, name, dept, base_path):
+    """
+    Écrit une base géographique en GeoParquet et en CSV à géométrie WKT.
+    """
+    csv_path = data_path(get_schema(name).filename_for(dept), base_path)
+    with fs.open(parquet_path(csv_path), "wb") as f:
+        gdf.to_parquet(f, index=False, compression="zstd")
+    with fs.open(csv_path, "w") as f:
+        gdf.to_wkt().to_csv(f)
+
+
+def synthetic_transactions(rng, depts, n_sales):
+    """
+    Ventes DVF enrichies (colonnes des bases `base_*_final`), réparties
+    uniformément dans les emprises des départements.
+    """
+    dept_idx = rng.integers(len(depts), size=n_sales)
+    x = ORIGIN[0] + dept_idx * DEPT_SIZE + rng.uniform(0, DEPT_SIZE, n_sales)
+    y = ORIGIN[1] + rng.uniform(0, DEPT_SIZE, n_sales)
+    longitude, latitude = Transformer.from_crs(CRS, "EPSG:4326", always_xy=True).transform(x, y)
+    codes = np.array(depts)[dept_idx]
+    surface = np.round(rng.lognormal(4.2, 0.5, n_sales))
+    niveau = rng.integers(-1, 4, n_sales).astype(float)
+    niveau[niveau < 0] = np.nan
+    return pd.DataFrame({
+        "id_mutation": np.char.add("2023-", np.arange(n_sales).astype(str)),
+        "date_mutation": "2023-01-01",
+        "nature_mutation": "Vente",
+        "valeur_fonciere": np.round(surface * rng.lognormal(8.0, 0.4, n_sales), 2),
+        "code_commune": np.char.add(codes, rng.integers(1, 400, n_sales).astype(str).astype("<U3")),
+        "code_departement": codes,
+        "type_local": rng.choice(["Appartement", "Maison"], n_sales),
+        "surface_reelle_bati": surface,
+        "surface_terrain": np.round(rng.lognormal(6.5, 0.8, n_sales)),
+        "longitude": longitude,
+        "latitude": latitude,
+        "Risque_innond": rng.choice(list(CLASSE_LABELS.values()), n_sales),
+        "zone_niveau": niveau,
+    })
+
+
+def generate(base_url, depts=DEPTS, polygons=POLYGONS, sales=SALES, seed=SEED):
+    """
+    Écrit le jeu synthétique complet dans `base_url` et son manifeste.
+    """
+    fs, base_path = filesystem_from_url(base_url)
+    fs.makedirs(base_path, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    for i, dept in enumerate(depts):
+        box = dept_box(i)
+        for layer, (column, legend) in LAYER_LEGENDS.items():
+            cells = voronoi_layer(rng, box, polygons)
+            classes = rng.choice(list(legend), len(cells))
+            attributes = {column: classes, "dep": dept}
+            if layer == "inondation":
+                attributes["CLASSE"] = [CLASSE_LABELS[code] for code in classes]
+            write_geo(fs, gpd.GeoDataFrame(attributes, geometry=cells, crs=CRS), layer, dept, base_path)
+
+    boxes = [dept_box(i) for i in range(len(depts))]
+    for layer, name in (("inondation", "innond_complet"), ("secheresse", "secheresse_complet")):
+        shares = rng.dirichlet(np.ones(len(PCT_COLUMNS[layer])), len(depts))
+        columns = {column: shares[:, j] for j, column in enumerate(PCT_COLUMNS[layer].values())}
+        write_geo(fs, gpd.GeoDataFrame({"dep": list(depts), **columns}, geometry=boxes, crs=CRS),
+                  name, None, base_path)
+
+    transactions = synthetic_transactions(rng, list(depts), sales)
+    for name, spec in FEATURE_SPECS.items():
+        type_local = "Maison" if name.endswith("_maison") else "Appartement"
+        other = "zone_niveau" if spec.hazard == "Risque_innond" else "Risque_innond"
+        rows = transactions[transactions["type_local"] == type_local].drop(columns=other)
+        with fs.open(data_path(get_schema(name).filename, base_path), "w") as f:
+            rows.to_csv(f)
+
+    manifest = {"depts": list(depts), "polygons": polygons, "sales": sales, "seed": seed}
+    with fs.open(data_path(FIXTURE_MANIFEST, base_path), "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def read_fixture_manifest(fs, base_path):
+    path = data_path(FIXTURE_MANIFEST, base_path)
+    if not fs.exists(path):
+        return None
+    with fs.open(path, "r") as f:
+        return json.load(f)
+
+
+# ***************************************************************
+# Étapes chronométrées
+# ***************************************************************
+
+class Timer:
+    """
+    Temps de chaque étape (`{étape: [secondes par essai]}`), meilleur de `repeat` essais.
+    """
+
+    def __init__(self, repeat=3):
+        self.repeat = repeat
+        self.timings = {}
+
+    def add(self, stage, func):
+        """
+        Chronomètre `func()` sur `repeat` essais et renvoie son dernier résultat.
+        Une étape mesurée pour plusieurs départements ou bases cumule leurs temps.
+        """
+        runs = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = func()
+            runs.append(time.perf_counter() - start)
+        previous = self.timings.get(stage, [0.0] * self.repeat)
+        self.timings[stage] = [a + b for a, b in zip(previous, runs)]
+        return result
+
+
+def cache_roundtrip(df):
+    """
+    Ce que coûte un accès au cache des pages : forme compacte sérialisée,
+    relue et reconstruite.
+    """
+    payload = pickle.dumps(compact(df), protocol=pickle.HIGHEST_PROTOCOL)
+    return pickle.loads(payload).to_frame()
+
+
+def read_wkt_layer(fs, csv_path):
+    with fs.open(csv_path, "rb") as f:
+        df = pd.read_csv(f)
+    return gpd.GeoDataFrame(df, geometry=gpd.GeoSeries.from_wkt(df.pop("geometry"), crs=CRS))
+
+
+def bench_page1(timer, fs, base_path):
+    tables = {}
+    for layer, name in (("inondation", "innond_complet"), ("secheresse", "secheresse_complet")):
+        csv_path = data_path(get_schema(name).filename, base_path)
+        gdf = timer.add("page1/chargement", lambda: read_dataset(fs, name, base_path=base_path))
+        timer.add("page1/decodage_wkt", lambda: read_wkt_layer(fs, csv_path))
+        niveau = timer.add("page1/niveau", lambda: compute_niveau(gdf, layer))
+        tables[name] = gdf.assign(NIVEAU=niveau)
+
+    def render(gdf):
+        fig, ax = plt.subplots(1, 1, figsize=(8, 6))
+        gdf.plot(column="NIVEAU", ax=ax, legend=True, edgecolor="gray", linewidth=0.3)
+        ax.set_axis_off()
+        return figure_to_png(fig)
+
+    for gdf in tables.values():
+        timer.add("page1/rendu", lambda: render(gdf))
+        timer.add("page1/serialisation", lambda: cache_roundtrip(gdf))
+
+
+def bench_page2(timer, fs, base_path, depts):
+    for dept in depts:
+        for layer, (column, _) in LAYER_LEGENDS.items():
+            csv_path = data_path(get_schema(layer).filename_for(dept), base_path)
+            gdf = timer.add("page2/chargement",
+                            lambda: read_dataset(fs, layer, dept, columns=(column,), base_path=base_path))
+            timer.add("page2/decodage_wkt", lambda: read_wkt_layer(fs, csv_path))
+            areas = timer.add("page2/agregation_surfaces", lambda: area_by_class(gdf, layer))
+            timer.add("page2/rendu_carte", lambda: figure_to_png(hazard_map_figure(gdf, layer, dept)))
+            timer.add("page2/rendu_camembert", lambda: figure_to_png(area_pie_figure(areas, layer, dept)))
+            timer.add("page2/serialisation", lambda: cache_roundtrip(gdf))
+        timer.add("page2/agregats_hors_ligne", lambda: department_areas(fs, dept, base_path))
+
+
+def bench_page4(timer, fs, base_path):
+    for name, spec in FEATURE_SPECS.items():
+        columns = tuple(dict.fromkeys(spec.source_columns + regression_columns(spec)))
+        df = timer.add("page4/chargement", lambda: read_dataset(fs, name, columns=columns, base_path=base_path))
+        features = timer.add("page4/colonnes_derivees", lambda: compute_features(df, spec))
+        sketches = timer.add("page4/esquisses", lambda: compute_sketches(features, spec))
+        index = timer.add("page4/index", lambda: build_index(features, spec))
+        low, high = np.nanquantile(features["valeur_fonciere"], [0.25, 0.75])
+        timer.add("page4/filtres", lambda: index.select(ranges={"valeur_fonciere": (low, high)}))
+        timer.add("page4/regression", lambda: fit(df, spec))
+
+        order = sorted(MAPPING_LABELS_INOND.values()) if spec.hazard == "Risque_innond" else None
+
+        def render_box():
+            fig = plt.figure(figsize=(10, 6))
+            positions, stats = box_stats(sketches, order)
+            labels = order or sorted({classe for classe, _ in sketches})
+            box_plot(plt.gca(), positions, stats, labels=labels, colors=["#4CAF50", "#2196F3", "#FFC107"])
+            return figure_to_png(fig)
+
+        timer.add("page4/rendu_boxplot", render_box)
+        if spec.scatter:
+            plotted = features[features["masque_nuage"]]
+            timer.add("page4/rendu_nuage", lambda: scatter_figure(
+                plotted, x=spec.surface, y="valeur_fonciere", color=spec.box_column)[0].to_json())
+        timer.add("page4/serialisation", lambda: pickle.loads(pickle.dumps(features)))
+
+
+def run(base_url, repeat=3):
+    """
+    Chronomètre toutes les étapes sur le jeu synthétique de `base_url`.
+    Renvoie le résultat sérialisable en JSON.
+    """
+    fs, base_path = filesystem_from_url(base_url)
+    manifest = read_fixture_manifest(fs, base_path)
+    if manifest is None:
+        raise FileNotFoundError(f"{FIXTURE_MANIFEST} absent de {base_url} : lancer `python -m sykinet.bench generate`")
+
+    timer = Timer(repeat)
+    bench_page1(timer, fs, base_path)
+    bench_page2(timer, fs, base_path, manifest["depts"])
+    bench_page4(timer, fs, base_path)
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "packages": {package: _package_version(package) for package in PACKAGES},
+            "fixtures": manifest,
+            "repeat": repeat,
+        },
+        "stages": {
+            stage: {"best": min(runs), "median": statistics.median(runs), "runs": runs}
+            for stage, runs in timer.timings.items()
+        },
+    }
+
+
+def _package_version(package):
+    try:
+        return version(package)
+    except PackageNotFoundError:
+        return None
+
+
+# ***************************************************************
+# Comparaison avec une référence
+# ***************************************************************
+
+def compare(reference, current, threshold=0.2, min_delta=MIN_DELTA):
+    """
+    Compare les meilleurs temps de chaque étape. Une étape régresse si elle
+    est plus lente de plus de `threshold` (relatif) et de `min_delta` secondes.
+    Renvoie `[(étape, référence, actuel, ratio, verdict)]`.
+    """
+    rows = []
+    for stage in sorted(set(reference["stages"]) | set(current["stages"])):
+        before = reference["stages"].get(stage, {}).get("best")
+        after = current["stages"].get(stage, {}).get("best")
+        if before is None or after is None:
+            rows.append((stage, before, after, None, "absente" if after is None else "nouvelle"))
+            continue
+        ratio = after / before if before else float("inf")
+        if ratio > 1 + threshold and after - before > min_delta:
+            verdict = "RÉGRESSION"
+        elif ratio < 1 - threshold and before - after > min_delta:
+            verdict = "gain"
+        else:
+            verdict = ""
+        rows.append((stage, before, after, ratio, verdict))
+    return rows
+
+
+def _seconds(value):
+    return "-" if value is None else f"{value * 1000:.1f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des pages sur données synthétiques.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_generate = sub.add_parser("generate", help="Écrit le jeu de données synthétique.")
+    p_generate.add_argument("base_url", help="Dossier du jeu synthétique (local).")
+    p_generate.add_argument("--dept", action="append", help="Département(s) synthétique(s) (défaut : 33 et 34).")
+    p_generate.add_argument("--polygons", type=int, default=POLYGONS, help="Polygones par couche et département.")
+    p_generate.add_argument("--sales", type=int, default=SALES, help="Nombre total de ventes.")
+    p_generate.add_argument("--seed", type=int, default=SEED)
+
+    p_run = sub.add_parser("run", help="Chronomètre les étapes des pages.")
+    p_run.add_argument("base_url", help="Dossier du jeu synthétique (local).")
+    p_run.add_argument("--out", default=None, help="Fichier JSON des résultats (sortie standard par défaut).")
+    p_run.add_argument("--repeat", type=int, default=3, help="Essais par étape (meilleur temps retenu).")
+
+    p_compare = sub.add_parser("compare", help="Compare des résultats à une référence.")
+    p_compare.add_argument("reference", help="Résultats JSON de référence.")
+    p_compare.add_argument("current", help="Résultats JSON à comparer.")
+    p_compare.add_argument("--threshold", type=float, default=0.2, help="Ralentissement relatif toléré.")
+    p_compare.add_argument("--min-delta", type=float, default=MIN_DELTA, help="Écart absolu toléré (s).")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        manifest = generate(args.base_url, tuple(args.dept or DEPTS), args.polygons, args.sales, args.seed)
+        print(f"jeu synthétique écrit dans {args.base_url} : {manifest}")
+    elif args.command == "run":
+        matplotlib.use("Agg")
+        results = json.dumps(run(args.base_url, args.repeat), indent=1)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(results)
+        else:
+            print(results)
+    else:
+        with open(args.reference) as f:
+            reference = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare(reference, current, args.threshold, args.min_delta)
+        print(f"{'étape':<32} {'réf. ms':>10} {'actuel ms':>10} {'ratio':>7}")
+        for stage, before, after, ratio, verdict in rows:
+            ratio_text = "-" if ratio is None else f"{ratio:.2f}"
+            print(f"{stage:<32} {_seconds(before):>10} {_seconds(after):>10} {ratio_text:>7}  {verdict}")
+        regressions = [row[0] for row in rows if row[4] == "RÉGRESSION"]
+        if regressions:
+            print(f"{len(regressions)} étape(s) en régression : {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
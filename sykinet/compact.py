@@ -0,0 +1,126 @@
+"""
+Représentation compacte des bases conservées dans le cache des pages.
+
+`st.cache_data` garde chaque résultat sérialisé et le désérialise à chaque
+accès. Une GeoDataFrame y coûte un objet GEOS (et son WKB) par polygone ; une
+`CompactFrame` ne contient que des tableaux contigus :
+
+* colonnes limitées à celles demandées, classes d'aléa en catégories dont la
+  table des libellés est la légende partagée (sykinet.legends), codes int8 ;
+* numériques non déclarés dans le schéma ramenés au plus petit type exact
+  (entiers) ou en float32 ;
+* géométrie en un seul tampon de coordonnées (`shapely.to_ragged_array`),
+  en float32 relatif à l'origine de la couche, et ses tableaux d'offsets.
+
+L'écart de position introduit par le float32 est inférieur à 2 cm pour une
+emprise de moins de 500 km (un département) : sans effet sur les cartes, qui
+sont au mieux tracées au mètre. Les traitements hors ligne lisent les bases
+avec `read_dataset`, en double précision.
+"""
+
+from dataclasses import dataclass
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from sykinet.legends import LAYER_LEGENDS
+
+# Colonne de classe -> libellés de la légende (table des catégories partagée)
+CLASS_CATEGORIES = {column: list(legend) for column, legend in LAYER_LEGENDS.values()}
+
+
+@dataclass
+class CompactFrame:
+    """
+    Colonnes compactées d'une base et, pour une couche géographique, tampon de
+    coordonnées (`coords`, relatives à `origin`), offsets et type de géométrie.
+    """
+    attributes: pd.DataFrame
+    geometry_type: object = None
+    origin: np.ndarray = None
+    coords: np.ndarray = None
+    offsets: tuple = ()
+    present: np.ndarray = None
+    crs: object = None
+    # Géométries non convertibles en tampon (collections hétérogènes), gardées telles quelles
+    geometry: gpd.GeoSeries = None
+
+    @property
+    def nbytes(self):
+        """
+        Octets occupés par les colonnes et le tampon de géométrie.
+        """
+        size = int(self.attributes.memory_usage(deep=True).sum())
+        if self.coords is not None:
+            size += self.coords.nbytes + self.present.nbytes + sum(o.nbytes for o in self.offsets)
+        if self.geometry is not None:
+            size += sum(len(wkb) for wkb in shapely.to_wkb(np.asarray(self.geometry.array)) if wkb)
+        return size
+
+    def to_frame(self):
+        """
+        DataFrame, ou GeoDataFrame pour une couche géographique, reconstruite
+        à partir du tampon (un appel vectorisé).
+        """
+        if self.geometry is not None:
+            return gpd.GeoDataFrame(self.attributes, geometry=self.geometry)
+        if self.coords is None:
+            return self.attributes
+        geoms = np.full(len(self.attributes), None, dtype=object)
+        coords = self.coords.astype(np.float64) + self.origin
+        geoms[self.present] = shapely.from_ragged_array(self.geometry_type, coords, self.offsets)
+        geometry = gpd.GeoSeries(geoms, index=self.attributes.index, crs=self.crs)
+        return gpd.GeoDataFrame(self.attributes, geometry=geometry)
+
+
+def compact_columns(df, declared=()):
+    """
+    Colonnes compactées de `df` (hors géométrie). Les colonnes de `declared`
+    (types fixés par le schéma) ne sont pas rétrogradées.
+    """
+    df = pd.DataFrame(df.drop(columns="geometry", errors="ignore"))
+    for col in df.columns:
+        series = df[col]
+        if col in CLASS_CATEGORIES:
+            legend = CLASS_CATEGORIES[col]
+            # Légende d'abord, puis les valeurs hors légende éventuelles (conservées)
+            extra = sorted(set(series.dropna().unique()) - set(legend), key=str)
+            if not pd.api.types.is_integer_dtype(series.dtype) or extra:
+                df[col] = pd.Categorical(series, categories=legend + extra)
+        elif col in declared:
+            continue
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            df[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series.dtype):
+            df[col] = series.astype(np.float32)
+        elif pd.api.types.is_string_dtype(series.dtype) and series.nunique() < len(series) // 2:
+            df[col] = series.astype("category")
+    return df
+
+
+def compact(df, declared=()):
+    """
+    `CompactFrame` d'une DataFrame ou d'une GeoDataFrame.
+    """
+    attributes = compact_columns(df, declared)
+    if not isinstance(df, gpd.GeoDataFrame):
+        return CompactFrame(attributes)
+
+    geoms = np.asarray(df.geometry.array)
+    present = ~(shapely.is_missing(geoms) | shapely.is_empty(geoms))
+    try:
+        geometry_type, coords, offsets = shapely.to_ragged_array(geoms[present], include_z=False)
+    except ValueError:
+        return CompactFrame(attributes, geometry=df.geometry)
+    origin = np.floor(coords.min(axis=0)) if len(coords) else np.zeros(2)
+    return CompactFrame(
+        attributes,
+        geometry_type=geometry_type,
+        origin=origin,
+        coords=(coords - origin).astype(np.float32),
+        offsets=tuple(o.astype(np.int32) for o in offsets),
+        present=present,
+        crs=df.crs,
+    )
@@ -0,0 +1,148 @@
+"""
+Couche d'accès aux données partagée par toutes les pages.
+
+Chaque base est décrite dans `sykinet.schemas` ; `load_dataset` lit uniquement
+les colonnes demandées, applique les types déclarés et met le résultat en cache
+(un cache par base, département et projection de colonnes), sous forme
+compacte (sykinet.compact).
+"""
+
+import pandas as pd
+import streamlit as st
+
+from sykinet.compact import compact
+from sykinet.dataset_cache import get_dataset_cache
+from sykinet.geoparquet import lod_path, parquet_path, read_geoparquet, read_hazard_layer
+from sykinet.schemas import get_schema
+from sykinet.simplify import pick_tolerance, read_manifest
+from sykinet.spans import annotate, span
+from sykinet.storage import BASE_PATH, data_path, get_filesystem, object_version
+
+
+def apply_dtypes(df, dtypes):
+    """
+    Convertit les colonnes présentes vers les types déclarés. Les codes entiers
+    invalides ou manquants sont ramenés à 0 (comportement historique de `gridcode`).
+    """
+    for col, dtype in dtypes.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        if dtype.startswith("int"):
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(dtype)
+        elif dtype.startswith("float"):
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def read_dataset(fs, name, dept=None, columns=None, base_path=BASE_PATH, lod=None):
+    """
+    Lit une base depuis `fs` sans cache. `columns` restreint la lecture aux
+    colonnes utiles (toutes les colonnes déclarées par défaut) ; `lod` choisit
+    un niveau de détail simplifié (tolérance en mètres, voir sykinet.simplify).
+    """
+    schema = get_schema(name)
+    path = data_path(schema.filename_for(dept), base_path)
+    dtypes = schema.dtypes(columns)
+    if columns is None and schema.columns is not None:
+        columns = list(schema.columns)
+
+    if schema.geometry and lod is not None:
+        df = read_geoparquet(fs, lod_path(path, lod), columns=columns)
+    elif schema.geometry:
+        df = read_hazard_layer(fs, path, columns=columns)
+    else:
+        usecols = None
+        if columns is not None:
+            wanted = set(columns)
+            usecols = lambda c: c in wanted
+        # Les catégories et flottants sont typés dès l'analyse du CSV ;
+        # les codes entiers sont convertis ensuite (valeurs manquantes possibles)
+        parse_dtypes = {c: t for c, t in dtypes.items() if not t.startswith("int")}
+        with span("lecture_csv"), fs.open(path, "rb") as f:
+            df = pd.read_csv(f, usecols=usecols, dtype=parse_dtypes)
+
+    return apply_dtypes(df, dtypes)
+
+
+def dataset_version(fs, name, dept=None, base_path=BASE_PATH):
+    """
+    Version du fichier effectivement lu pour une base (GeoParquet s'il existe).
+    """
+    schema = get_schema(name)
+    path = data_path(schema.filename_for(dept), base_path)
+    if schema.geometry and fs.exists(parquet_path(path)):
+        path = parquet_path(path)
+    return object_version(fs, path)
+
+
+@st.cache_data(show_spinner=False)
+def _load_compact(name, dept, columns, lod):
+    annotate(cache="miss")
+    df = read_dataset(get_filesystem(), name, dept=dept, columns=columns, lod=lod)
+    with span("compaction"):
+        return compact(df, declared=get_schema(name).dtypes())
+
+
+def load_dataset(name, dept=None, columns=None, lod=None):
+    """
+    Version mise en cache de `read_dataset` pour les pages Streamlit : le cache
+    conserve la forme compacte, reconstruite en (Geo)DataFrame à chaque appel.
+    """
+    with span(f"chargement {name}", cached=True):
+        frame = _load_compact(name, dept, columns, lod)
+    with span("reconstruction"):
+        return frame.to_frame()
+
+
+def load_shared_dataset(name, dept=None, columns=None, lod=None):
+    """
+    Base partagée entre les sessions (sykinet.dataset_cache) : ni copie des
+    données ni désérialisation à l'accès. L'objet renvoyé est une copie
+    superficielle : le modifier ne touche pas l'exemplaire partagé.
+    """
+    columns = None if columns is None else tuple(columns)
+    with span(f"chargement {name}", cached=True):
+        return get_dataset_cache().get_or_load(
+            name, dept, (columns, lod), load_dataset_version(name, dept),
+            lambda: read_dataset(get_filesystem(), name, dept=dept, columns=columns, lod=lod),
+        )
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_lod_manifest(name, dept=None):
+    """
+    Niveaux de détail disponibles pour une base, relus toutes les dix minutes
+    (niveaux construits par `python -m sykinet.simplify` pris en compte sans
+    redémarrage).
+    """
+    return read_manifest(get_filesystem(), name, dept)
+
+
+def map_lod(name, dept=None, figsize=(12, 12)):
+    """
+    Niveau de détail (tolérance, None pour la pleine résolution) lu par
+    `load_map_dataset` pour une figure de taille `figsize` : à inclure dans
+    les clés des images rendues à partir de la couche.
+    """
+    return pick_tolerance(load_lod_manifest(name, dept), figsize)
+
+
+def load_map_dataset(name, dept=None, columns=None, figsize=(12, 12), shared=False):
+    """
+    Charge une couche cartographiée au niveau de détail le plus grossier encore
+    fidèle pour une figure de taille `figsize` (pleine résolution à défaut).
+    Avec `shared`, la couche est l'exemplaire partagé en lecture seule.
+    """
+    lod = map_lod(name, dept, figsize)
+    load = load_shared_dataset if shared else load_dataset
+    return load(name, dept, columns=columns, lod=lod)
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_dataset_version(name, dept=None):
+    """
+    Version d'une base, revalidée (métadonnées seulement) toutes les dix minutes.
+    """
+    return dataset_version(get_filesystem(), name, dept)
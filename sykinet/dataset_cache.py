@@ -0,0 +1,203 @@
+"""
+Cache mémoire partagé des bases immuables, borné en octets, éviction LRU.
+
+`st.cache_data` renvoie une copie désérialisée à chaque accès et ne s'invalide
+que globalement. Ce cache, unique par processus serveur, garde un seul
+exemplaire de chaque base et le renvoie tel quel à toutes les sessions :
+
+* les objets renvoyés partagent les données de l'exemplaire du cache, qui ne
+  peut pas être modifié par leur intermédiaire (`shared_view`) : une
+  (Geo)DataFrame est remise en copie superficielle, un tableau numpy en
+  lecture seule ;
+* chaque entrée est comptée à sa taille mémoire réelle (colonnes, et pour la
+  géométrie coordonnées et objets GEOS, voir `estimate_bytes`) ; au-delà de
+  `SYKINET_DATASET_CACHE_BYTES`, les entrées les moins récemment utilisées
+  sont évincées ;
+* une entrée est identifiée par (base, département, paramètres, version) :
+  charger une nouvelle version remplace les anciennes, et `invalidate` retire
+  les entrées d'une base et/ou d'un département sans toucher aux autres ;
+* deux sessions qui demandent la même entrée en même temps ne la chargent
+  qu'une fois.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import shapely
+import streamlit as st
+
+from sykinet.compact import CompactFrame
+from sykinet.spans import annotate
+
+DEFAULT_MAX_BYTES = int(os.environ.get("SYKINET_DATASET_CACHE_BYTES", 2 * 1024 ** 3))
+
+# Mémoire GEOS mesurée (shapely 2, GEOS 3.12) : 24 octets par coordonnée (XYZ)
+# et environ 290 octets par partie de géométrie, objet Python compris
+COORD_BYTES = 24
+PART_BYTES = 290
+
+_MISSING = object()
+
+
+def geometry_bytes(geoms):
+    """
+    Mémoire occupée par un tableau de géométries shapely.
+    """
+    geoms = np.asarray(geoms)
+    present = geoms[~shapely.is_missing(geoms)]
+    return int(COORD_BYTES * shapely.get_num_coordinates(present).sum()
+               + PART_BYTES * np.maximum(shapely.get_num_geometries(present), 1).sum())
+
+
+def estimate_bytes(value):
+    """
+    Taille mémoire d'une entrée : colonnes (`memory_usage(deep=True)`) et
+    géométrie pour une (Geo)DataFrame, tampons pour une `CompactFrame`.
+    """
+    if isinstance(value, CompactFrame):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        geometry_columns = [c for c in value.columns if str(value[c].dtype) == "geometry"]
+        size = int(value.drop(columns=geometry_columns).memory_usage(deep=True).sum())
+        return size + sum(geometry_bytes(value[c].array) for c in geometry_columns)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+def shared_view(value):
+    """
+    Objet remis à une session pour une entrée partagée, sans copie des données :
+    copie superficielle d'une (Geo)DataFrame (ajouter, remplacer ou retirer une
+    colonne ne touche pas l'exemplaire du cache ; avec le copy-on-write de
+    pandas, une écriture en place copie la colonne touchée), vue en lecture
+    seule d'un tableau numpy.
+    """
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, np.ndarray):
+        view = value.view()
+        view.flags.writeable = False
+        return view
+    return value
+
+
+class DatasetCache:
+    """
+    Entrées `(base, département, paramètres, version) -> objet`, taille totale
+    bornée par `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clé -> (objet, taille), du moins au plus récent
+        self._loading = {}  # clé -> verrou du chargement en cours
+        self._size = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def get_or_load(self, dataset, dept, params, version, load):
+        """
+        Renvoie l'objet partagé de l'entrée (`shared_view`), en appelant
+        `load()` uniquement s'il est absent. `params` (hachable) distingue les
+        variantes d'une même base : colonnes, niveau de détail...
+        """
+        key = (dataset, dept, params, version)
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return shared_view(value)
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            # Chargée par une autre session pendant l'attente du verrou
+            value = self._lookup(key)
+            if value is not _MISSING:
+                return shared_view(value)
+            with self._lock:
+                self.misses += 1
+            annotate(cache="miss")
+            try:
+                value = load()
+                self._put(key, value, estimate_bytes(value))
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return shared_view(value)
+
+    def _put(self, key, value, size):
+        with self._lock:
+            # Les autres versions de la même entrée sont périmées
+            stale = [k for k in self._entries if k[:3] == key[:3] and k != key]
+            for k in stale:
+                self._remove(k)
+            self.invalidations += len(stale)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size)
+            self._size += size
+            self._evict(keep=key)
+
+    def _remove(self, key):
+        _, size = self._entries.pop(key)
+        self._size -= size
+
+    def _evict(self, keep=None):
+        # `keep` : entrée tout juste chargée, conservée même si elle dépasse seule la borne
+        while self._size > self.max_bytes and len(self._entries) > (keep is not None):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def invalidate(self, dataset=None, dept=None):
+        """
+        Retire les entrées de la base `dataset` et/ou du département `dept`
+        (toutes si aucun n'est donné). Renvoie le nombre d'entrées retirées.
+        """
+        with self._lock:
+            keys = [key for key in self._entries
+                    if (dataset is None or key[0] == dataset) and (dept is None or key[1] == dept)]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            by_dataset = {}
+            for (dataset, *_), (_, size) in self._entries.items():
+                by_dataset[dataset] = by_dataset.get(dataset, 0) + size
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "datasets": by_dataset,
+            }
+
+
+@st.cache_resource
+def get_dataset_cache():
+    """
+    Cache des bases partagé par toutes les sessions du serveur.
+    """
+    return DatasetCache()
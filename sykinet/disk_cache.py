@@ -0,0 +1,138 @@
+"""
+Cache de fichiers sur disque local, borné en octets, éviction LRU.
+
+Socle commun du cache des images rendues (sykinet.render_cache) et du cache
+des objets du bucket (sykinet.storage) : chaque entrée est un fichier nommé
+par sa clé ; l'ordre d'utilisation est conservé en mémoire et reconstruit au
+démarrage à partir des dates de modification.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class DiskCache:
+    """
+    Fichiers `<clé><suffix>` dans `directory`, taille totale bornée par `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes, suffix=""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clé -> taille, du moins au plus récent
+        self._size = 0
+
+        os.makedirs(directory, exist_ok=True)
+        # Reprise des entrées d'une exécution précédente, dans l'ordre d'utilisation
+        files = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(suffix) and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:len(entry.name) - len(suffix)], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Clé stable d'une entrée à partir de ses paramètres (représentation textuelle).
+        """
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def __contains__(self, key):
+        # Simple test de présence : ni compteurs ni ordre LRU modifiés
+        with self._lock:
+            return key in self._entries
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def lookup(self, key):
+        """
+        Chemin local de l'entrée (marquée comme récemment utilisée), ou None.
+        """
+        with self._lock:
+            if key in self._entries:
+                try:
+                    os.utime(self.path(key))
+                except FileNotFoundError:
+                    # Supprimée par un autre processus partageant le dossier
+                    self._size -= self._entries.pop(key)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self.path(key)
+            self.misses += 1
+            return None
+
+    def store(self, key, write):
+        """
+        Crée l'entrée en appelant `write(chemin_temporaire)` puis la publie de
+        façon atomique. L'écriture se fait hors verrou. Renvoie le chemin local.
+        """
+        tmp_path = self.path(key) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            write(tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, self.path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)
+            self._entries[key] = size
+            self._size += size
+            self._evict(keep=key)
+        return self.path(key)
+
+    def get(self, key):
+        """
+        Renvoie le contenu de l'entrée, ou None si elle est absente.
+        """
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data):
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        self.store(key, write)
+
+    def _evict(self, keep=None):
+        # `keep` (la plus récente) : entrée tout juste publiée, conservée même si elle dépasse seule la borne
+        while self._size > self.max_bytes and len(self._entries) > (keep is not None):
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
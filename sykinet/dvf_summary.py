@@ -0,0 +1,185 @@
+"""
+Synthèse de DVF en un seul passage, à mémoire bornée.
+
+Produit les trois petites tables de la page 3 :
+
+* `df_doublons.csv` : lignes des mutations à local unique / à plusieurs locaux ;
+* `differents_locaux.csv` : nombre de lignes par `type_local` ;
+* `nature_mutation.csv` : nombre de lignes par `nature_mutation` ;
+
+et le fichier des ventes d'un seul local (maison ou appartement) qui alimente
+la jointure spatiale des bases de la page 4 (sykinet.spatial_join).
+
+Chaque bloc est résumé par un processus en un `DvfSummary` ; les résumés se
+combinent dans l'ordre du fichier (`merge`), les mutations à cheval sur deux
+blocs étant recollées. DVF est trié par `id_mutation` : les lignes d'une même
+mutation sont contiguës.
+
+    python -m sykinet.dvf_summary /chemin/dvf.csv.gz --workers 8
+"""
+
+import argparse
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from sykinet.schemas import get_schema
+from sykinet.spatial_join import CHUNKSIZE, SALES_FILENAME, read_dvf_chunks, select_sales
+from sykinet.storage import BASE_URL, data_path, filesystem_from_url
+
+# Libellés des deux catégories de df_doublons
+SINGLE_LABEL = "Local unique"
+MULTI_LABEL = "Plusieurs locaux"
+
+SUMMARY_COLUMNS = ["id_mutation", "type_local", "nature_mutation"]
+
+
+@dataclass
+class DvfSummary:
+    """
+    Comptages partiels d'une portion contiguë de DVF.
+
+    Les mutations entièrement vues sont classées (`single_rows` / `multi_rows`) ;
+    la première et la dernière suite de lignes (`edges`, paires `(id_mutation,
+    nombre de lignes)`) restent ouvertes car elles peuvent se poursuivre dans
+    la portion voisine.
+    """
+    single_rows: int = 0
+    multi_rows: int = 0
+    type_local: Counter = field(default_factory=Counter)
+    nature_mutation: Counter = field(default_factory=Counter)
+    edges: list = field(default_factory=list)
+
+    @classmethod
+    def from_chunk(cls, chunk):
+        ids = chunk["id_mutation"].to_numpy()
+        summary = cls(
+            type_local=Counter(chunk["type_local"].value_counts().to_dict()),
+            nature_mutation=Counter(chunk["nature_mutation"].value_counts().to_dict()),
+        )
+        if len(ids) == 0:
+            return summary
+        # Longueur de chaque suite de lignes d'une même mutation
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        lengths = np.diff(np.r_[starts, len(ids)])
+        runs = list(zip(ids[starts].tolist(), lengths.tolist()))
+        summary._close(runs)
+        return summary
+
+    def _count(self, runs):
+        for _, n in runs:
+            if n == 1:
+                self.single_rows += 1
+            else:
+                self.multi_rows += n
+
+    def _close(self, runs):
+        # Les suites intérieures sont complètes ; seules les extrémités restent ouvertes
+        self._count(runs[1:-1])
+        self.edges = runs[:1] + runs[1:][-1:]
+
+    def merge(self, other):
+        """
+        Résumé de la portion `self` suivie immédiatement de la portion `other`.
+        """
+        runs = list(self.edges)
+        for i, (mutation, n) in enumerate(other.edges):
+            if i == 0 and runs and runs[-1][0] == mutation:
+                runs[-1] = (mutation, runs[-1][1] + n)
+            else:
+                runs.append((mutation, n))
+        merged = DvfSummary(
+            self.single_rows + other.single_rows,
+            self.multi_rows + other.multi_rows,
+            self.type_local + other.type_local,
+            self.nature_mutation + other.nature_mutation,
+        )
+        merged._close(runs)
+        return merged
+
+    def finish(self):
+        """
+        Résumé final : les suites ouvertes sont classées à leur tour.
+        """
+        final = DvfSummary(self.single_rows, self.multi_rows, self.type_local, self.nature_mutation)
+        final._count(self.edges)
+        return final
+
+    def tables(self):
+        """
+        Tables de la page 3 : (df_doublons, differents_locaux, nature_mutation).
+        """
+        doublons = pd.DataFrame([{SINGLE_LABEL: self.single_rows, MULTI_LABEL: self.multi_rows}])
+        locaux = pd.DataFrame(self.type_local.most_common(), columns=["type_local", "count"])
+        natures = pd.DataFrame(self.nature_mutation.most_common(), columns=["nature_mutation", "count"])
+        return doublons, locaux, natures
+
+
+def _summarise_chunk(chunk):
+    return DvfSummary.from_chunk(chunk)
+
+
+def single_local_sales(rows):
+    """
+    Ventes de maisons et d'appartements parmi des mutations complètes : seules
+    les mutations d'une seule ligne (un seul local) sont retenues.
+    """
+    return select_sales(rows[~rows["id_mutation"].duplicated(keep=False)])
+
+
+def summarise(source, base_url=BASE_URL, workers=None, chunksize=CHUNKSIZE):
+    """
+    Lit DVF une fois, écrit les tables de la page 3 et le fichier des ventes
+    d'un seul local, puis renvoie le résumé final.
+    """
+    fs, base_path = filesystem_from_url(base_url)
+    carry = None
+    header = True
+    summary = DvfSummary()
+    pending = deque()
+    max_pending = 2 * (workers or os.cpu_count())
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            fs.open(data_path(SALES_FILENAME, base_path), "wt", compression="gzip") as sales_file:
+        for chunk in read_dvf_chunks(source, chunksize):
+            pending.append(pool.submit(_summarise_chunk, chunk[SUMMARY_COLUMNS]))
+            # Blocs en vol bornés : les résumés sont combinés dans l'ordre dès qu'ils arrivent
+            while len(pending) > max_pending:
+                summary = summary.merge(pending.popleft().result())
+
+            # La dernière mutation du bloc peut se poursuivre dans le suivant : elle est reportée
+            rows = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+            is_open = rows["id_mutation"] == rows["id_mutation"].iloc[-1]
+            carry = rows[is_open]
+            single_local_sales(rows[~is_open]).to_csv(sales_file, header=header, index=False)
+            header = False
+        if carry is not None:
+            single_local_sales(carry).to_csv(sales_file, header=header, index=False)
+
+        while pending:
+            summary = summary.merge(pending.popleft().result())
+    summary = summary.finish()
+
+    for name, table in zip(("df_doublons", "differents_locaux", "nature_mutation"), summary.tables()):
+        with fs.open(data_path(get_schema(name).filename, base_path), "w") as f:
+            table.to_csv(f, index=False)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthèse de DVF en un passage (tables de la page 3).")
+    parser.add_argument("source", help="Fichier DVF (dvf.csv.gz, local ou URL fsspec).")
+    parser.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    args = parser.parse_args(argv)
+
+    summary = summarise(args.source, args.base_url, args.workers, args.chunksize)
+    print(f"{summary.single_rows} lignes à local unique, {summary.multi_rows} lignes à plusieurs locaux")
+
+
+if __name__ == "__main__":
+    main()
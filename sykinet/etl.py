@@ -0,0 +1,269 @@
+"""
+Ingestion parallèle et incrémentale des sources brutes (remplace la boucle
+d'ingestion du notebook SYKINET.ipynb).
+
+Sources attendues dans le dossier brut :
+
+* `Dept_XX.zip` (couche `VECTEUR`) : aléa inondation, un fichier par département ;
+* `AleaRG_Fxx_L93.zip` : aléa retrait-gonflement des argiles, national, découpé
+  ici par département à l'aide d'un fichier de contours départementaux ;
+* `dvf.csv.gz` : transactions DVF, réparties par département en un seul passage.
+
+Chaque département est traité par un processus du pool ; les sorties
+(`base_innondation{dept}.parquet`, `df_secheresse{dept}.parquet`,
+`dvf/dvf_{dept}.parquet`) sont écrites dans le dossier des bases lu par les
+pages. Un manifeste (`etl_manifest.json`) conserve l'empreinte SHA-256 de
+chaque source : une nouvelle exécution ne reconstruit que les départements
+dont une source a changé.
+
+    python -m sykinet.etl /chemin/base_sykinet --departements departements.geojson
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from sykinet.departements import DEPARTEMENTS
+from sykinet.geoparquet import CRS, parquet_path
+from sykinet.schemas import get_schema
+from sykinet.storage import BASE_URL, data_path, filesystem_from_url
+
+MANIFEST_NAME = "etl_manifest.json"
+DVF_DIR = "dvf/"
+DVF_CHUNKSIZE = 500_000
+
+
+def inondation_source(raw_dir, dept):
+    return os.path.join(raw_dir, f"Dept_{dept}.zip")
+
+
+def secheresse_source(raw_dir):
+    return os.path.join(raw_dir, "AleaRG_Fxx_L93.zip")
+
+
+def dvf_source(raw_dir):
+    return os.path.join(raw_dir, "dvf.csv.gz")
+
+
+def dvf_path(dept, base_path):
+    return base_path + DVF_DIR + f"dvf_{dept}.parquet"
+
+
+# ***************************************************************
+# Empreintes des sources et manifeste
+# ***************************************************************
+
+def file_digest(path, block_size=1 << 20):
+    """
+    Empreinte SHA-256 du contenu d'un fichier local.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path, previous=None):
+    """
+    Empreinte (taille, date, SHA-256) d'une source. Le contenu n'est relu que si
+    la taille ou la date de modification diffèrent de l'empreinte précédente.
+    """
+    stat = os.stat(path)
+    if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+        return previous
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": file_digest(path)}
+
+
+def load_manifest(fs, base_path):
+    path = base_path + MANIFEST_NAME
+    if not fs.exists(path):
+        return {}
+    with fs.open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(fs, base_path, manifest):
+    with fs.open(base_path + MANIFEST_NAME, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+# ***************************************************************
+# Tâches d'ingestion (une par département)
+# ***************************************************************
+
+def _write_layer(gdf, out_url, name, dept, with_csv):
+    fs, base_path = filesystem_from_url(out_url)
+    csv_path = data_path(get_schema(name).filename_for(dept), base_path)
+    with fs.open(parquet_path(csv_path), "wb") as f:
+        gdf.to_parquet(f, index=False, compression="zstd")
+    if with_csv:
+        # Format historique (géométrie WKT) pour les consommateurs non migrés
+        with fs.open(csv_path, "w") as f:
+            gdf.to_wkt().to_csv(f)
+    return len(gdf)
+
+
+def ingest_inondation(raw_dir, dept, out_url, with_csv=False):
+    """
+    Lit la couche VECTEUR d'un département et écrit `base_innondation{dept}`.
+    """
+    gdf = gpd.read_file(f"zip://{inondation_source(raw_dir, dept)}!VECTEUR")
+    gdf = gdf.to_crs(CRS)
+    gdf["dep"] = dept
+    return _write_layer(gdf, out_url, "inondation", dept, with_csv)
+
+
+def ingest_secheresse(raw_dir, boundaries_path, code_column, dept, out_url, with_csv=False):
+    """
+    Extrait de l'aléa RGA national la partie d'un département et écrit
+    `df_secheresse{dept}`. Seule l'emprise du département est lue.
+    """
+    boundaries = gpd.read_file(boundaries_path).to_crs(CRS)
+    boundary = boundaries[boundaries[code_column].astype(str) == dept]
+    if boundary.empty:
+        raise ValueError(f"Département {dept} absent du fichier de contours {boundaries_path}")
+
+    gdf = gpd.read_file(f"zip://{secheresse_source(raw_dir)}", bbox=tuple(boundary.total_bounds))
+    gdf = gpd.clip(gdf.to_crs(CRS), boundary)
+    gdf["dep"] = dept
+    return _write_layer(gdf, out_url, "secheresse", dept, with_csv)
+
+
+def split_dvf(raw_dir, out_url, chunksize=DVF_CHUNKSIZE):
+    """
+    Répartit `dvf.csv.gz` par département en un seul passage à mémoire bornée
+    (un bloc de `chunksize` lignes à la fois). Renvoie le nombre de lignes par département.
+    """
+    fs, base_path = filesystem_from_url(out_url)
+    fs.makedirs(base_path + DVF_DIR, exist_ok=True)
+    # Schéma fixé par l'en-tête, toutes colonnes texte : une colonne vide dans
+    # le premier bloc d'un département serait sinon typée `null` et les blocs
+    # suivants refusés par son ParquetWriter
+    header = pd.read_csv(dvf_source(raw_dir), nrows=0).columns
+    schema = pa.schema([(column, pa.string()) for column in header])
+    writers, files, counts = {}, {}, {}
+    try:
+        reader = pd.read_csv(dvf_source(raw_dir), chunksize=chunksize, dtype=str)
+        for chunk in reader:
+            for dept, rows in chunk.groupby("code_departement"):
+                table = pa.Table.from_pandas(rows, schema=schema, preserve_index=False)
+                if dept not in writers:
+                    files[dept] = fs.open(dvf_path(dept, base_path), "wb")
+                    writers[dept] = pq.ParquetWriter(files[dept], schema, compression="zstd")
+                writers[dept].write_table(table)
+                counts[dept] = counts.get(dept, 0) + len(rows)
+    finally:
+        for dept, writer in writers.items():
+            writer.close()
+            files[dept].close()
+    return counts
+
+
+# ***************************************************************
+# Planification incrémentale
+# ***************************************************************
+
+def plan(raw_dir, manifest, depts, boundaries_path=None, force=False):
+    """
+    Calcule les empreintes des sources (en parallèle) et renvoie
+    (nouveau manifeste, liste des tâches à reconstruire).
+    """
+    sources = {f"inondation/{d}": [inondation_source(raw_dir, d)] for d in depts}
+    if boundaries_path:
+        for d in depts:
+            sources[f"secheresse/{d}"] = [secheresse_source(raw_dir), boundaries_path]
+    sources["dvf"] = [dvf_source(raw_dir)]
+    # Les tâches dont une source manque sont ignorées (département sans données)
+    sources = {task: paths for task, paths in sources.items() if all(os.path.exists(p) for p in paths)}
+
+    previous = manifest.get("sources", {})
+    unique_paths = sorted({p for paths in sources.values() for p in paths})
+    with ThreadPoolExecutor() as pool:
+        prints = dict(zip(unique_paths, pool.map(lambda p: fingerprint(p, previous.get(p)), unique_paths)))
+
+    stale = []
+    for task, paths in sources.items():
+        built_from = manifest.get("tasks", {}).get(task)
+        current = {p: prints[p]["sha256"] for p in paths}
+        if force or built_from != current:
+            stale.append(task)
+    new_manifest = {
+        "sources": prints,
+        "tasks": {task: {p: prints[p]["sha256"] for p in paths} for task, paths in sources.items()},
+    }
+    return new_manifest, stale
+
+
+def run(raw_dir, out_url=BASE_URL, depts=DEPARTEMENTS, boundaries_path=None, code_column="code",
+        workers=None, force=False, with_csv=False):
+    """
+    Exécute l'ingestion incrémentale et renvoie (tâches reconstruites, tâches en
+    échec). Une tâche en échec n'est pas enregistrée : elle sera retentée.
+    """
+    fs, base_path = filesystem_from_url(out_url)
+    manifest = load_manifest(fs, base_path)
+    new_manifest, stale = plan(raw_dir, manifest, depts, boundaries_path, force)
+    if not stale:
+        return [], []
+
+    rebuilt, failed = [], []
+    done_tasks = dict(manifest.get("tasks", {}))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for task in stale:
+            kind, _, dept = task.partition("/")
+            if kind == "inondation":
+                future = pool.submit(ingest_inondation, raw_dir, dept, out_url, with_csv)
+            elif kind == "secheresse":
+                future = pool.submit(ingest_secheresse, raw_dir, boundaries_path, code_column,
+                                     dept, out_url, with_csv)
+            else:
+                future = pool.submit(split_dvf, raw_dir, out_url)
+            futures[future] = task
+
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                future.result()
+            except Exception as error:
+                print(f"{task} : échec ({error})", file=sys.stderr)
+                failed.append(task)
+                continue
+            # Le manifeste n'enregistre une tâche qu'une fois ses sorties écrites
+            done_tasks[task] = new_manifest["tasks"][task]
+            save_manifest(fs, base_path, {"sources": new_manifest["sources"], "tasks": done_tasks})
+            rebuilt.append(task)
+            print(f"{task} : reconstruit")
+    return rebuilt, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestion parallèle et incrémentale des sources brutes.")
+    parser.add_argument("raw_dir", help="Dossier local des sources (Dept_XX.zip, AleaRG_Fxx_L93.zip, dvf.csv.gz).")
+    parser.add_argument("--out", default=BASE_URL, help="Dossier des bases produites (local ou gs://...).")
+    parser.add_argument("--departements", help="Contours des départements (découpage de l'aléa RGA).")
+    parser.add_argument("--code-column", default="code", help="Colonne du code département dans les contours.")
+    parser.add_argument("--dept", action="append", help="Département(s) à traiter (défaut : tous).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--force", action="store_true", help="Reconstruit tout, sources inchangées comprises.")
+    parser.add_argument("--with-csv", action="store_true", help="Écrit aussi les CSV historiques (WKT).")
+    args = parser.parse_args(argv)
+
+    rebuilt, failed = run(args.raw_dir, args.out, args.dept or DEPARTEMENTS, args.departements,
+                          args.code_column, args.workers, args.force, args.with_csv)
+    print(f"{len(rebuilt)} tâche(s) reconstruite(s)" if rebuilt or failed else "Tout est à jour.")
+    if failed:
+        sys.exit(f"{len(failed)} tâche(s) en échec : {', '.join(sorted(failed))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Exposition des communes aux aléas par superposition spatiale.
+
+Les tables nationales de la page 1 (`df_*_complet.csv`) donnent la part de
+chaque classe d'aléa par département. Ce traitement calcule les mêmes parts
+`pct_*` et le même `NIVEAU` par commune : les polygones d'aléa de chaque
+département sont intersectés avec les contours communaux, un index STRtree
+ne retenant que les couples (commune, polygone) qui se touchent. Un polygone
+entièrement contenu dans une commune n'est pas intersecté : sa surface est
+prise telle quelle.
+
+Un processus par département ; les sorties (`communes_inondation{dept}`,
+`communes_secheresse{dept}`, GeoParquet) sont lues par le zoom communal de la
+page 1.
+
+    python -m sykinet.exposure communes.geojson --code-column INSEE_COM --workers 8
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from sykinet.data import read_dataset
+from sykinet.departements import DEPARTEMENTS
+from sykinet.geoparquet import CRS, parquet_path
+from sykinet.legends import LAYER_LEGENDS
+from sykinet.schemas import get_schema
+from sykinet.storage import BASE_URL, data_path, filesystem_from_url
+
+# Colonne `pct_*` de chaque classe d'aléa (mêmes noms que les tables départementales)
+PCT_COLUMNS = {
+    "inondation": {0: "pct_sans_risque", 1: "pct_debord_nappes", 2: "pct_innond_caves"},
+    "secheresse": {"Nul": "pct_nulle", "Faible": "pct_faible", "Moyen": "pct_moyen", "Fort": "pct_fort"},
+}
+# Classes comptées comme « à risque » dans NIVEAU
+RISK_COLUMNS = {
+    "inondation": ("pct_innond_caves", "pct_debord_nappes"),
+    "secheresse": ("pct_moyen", "pct_fort"),
+}
+COMMUNE_DATASETS = {"inondation": "communes_inondation", "secheresse": "communes_secheresse"}
+
+
+def compute_niveau(df, layer):
+    """
+    Part des zones à risque parmi les zones couvertes par la couche (0 si
+    aucune zone n'est couverte), à partir des colonnes `pct_*`.
+    """
+    total = sum(df[column] for column in PCT_COLUMNS[layer].values())
+    risk = sum(df[column] for column in RISK_COLUMNS[layer])
+    return np.where(total > 0, risk / total.where(total > 0, 1), 0)
+
+
+def commune_department(code):
+    """
+    Département d'un code commune INSEE (trois caractères outre-mer).
+    """
+    return code[:3] if code.startswith("97") else code[:2]
+
+
+# ***************************************************************
+# Superposition (une tâche par département)
+# ***************************************************************
+
+def class_areas(zones, polygons, codes, n_classes):
+    """
+    Surface de chaque classe d'aléa dans chaque zone : tableau (zones x classes).
+    `codes` donne la classe (0 à n_classes - 1, -1 hors légende) de chaque polygone.
+    """
+    areas = np.zeros((len(zones), n_classes))
+    tree = shapely.STRtree(polygons)
+    zone_idx, polygon_idx = tree.query(zones, predicate="intersects")
+    known = codes[polygon_idx] >= 0
+    zone_idx, polygon_idx = zone_idx[known], polygon_idx[known]
+
+    # Polygones entièrement dans la zone : pas d'intersection à calculer
+    shapely.prepare(zones)
+    inside = shapely.contains_properly(zones[zone_idx], polygons[polygon_idx])
+    pair_areas = shapely.area(polygons[polygon_idx])
+    crossing = ~inside
+    pair_areas[crossing] = shapely.area(
+        shapely.intersection(zones[zone_idx[crossing]], polygons[polygon_idx[crossing]])
+    )
+    np.add.at(areas, (zone_idx, codes[polygon_idx]), pair_areas)
+    return areas
+
+
+def overlay_layer(communes, hazard, layer):
+    """
+    Parts `pct_*` de chaque classe dans chaque commune et NIVEAU, pour une couche.
+    """
+    class_column, _ = LAYER_LEGENDS[layer]
+    columns = PCT_COLUMNS[layer]
+    lookup = {value: code for code, value in enumerate(columns)}
+    codes = hazard[class_column].astype(object).map(lookup).fillna(-1).to_numpy(dtype=np.int64)
+
+    polygons = shapely.make_valid(np.asarray(hazard.geometry.array))
+    zones = np.asarray(communes.geometry.array)
+    areas = class_areas(zones, polygons, codes, len(columns))
+
+    result = communes[["code_commune", "geometry"]].copy()
+    commune_areas = shapely.area(zones)
+    for j, column in enumerate(columns.values()):
+        result[column] = (areas[:, j] / commune_areas).astype("float32")
+    result["NIVEAU"] = compute_niveau(result, layer).astype("float32")
+    return result
+
+
+def overlay_department(out_url, dept, communes):
+    """
+    Calcule et écrit l'exposition des communes d'un département à chaque
+    couche d'aléa présente dans le stockage. Renvoie les couches traitées.
+    """
+    fs, base_path = filesystem_from_url(out_url)
+    written = []
+    for layer, name in COMMUNE_DATASETS.items():
+        class_column, _ = LAYER_LEGENDS[layer]
+        try:
+            hazard = read_dataset(fs, layer, dept, columns=(class_column,), base_path=base_path)
+        except FileNotFoundError:
+            print(f"{layer} {dept} : couche absente, ignorée", file=sys.stderr)
+            continue
+        result = overlay_layer(communes, hazard.to_crs(CRS) if hazard.crs else hazard, layer)
+        path = data_path(get_schema(name).filename_for(dept), base_path)
+        with fs.open(parquet_path(path), "wb") as f:
+            result.to_parquet(f, index=False, compression="zstd")
+        written.append(layer)
+    return written
+
+
+def read_communes(communes_path, code_column="code", dept_column=None):
+    """
+    Contours communaux en Lambert 93 : colonnes `code_commune`, `dept`, géométrie.
+    Sans `dept_column`, le département est déduit du code INSEE.
+    """
+    communes = gpd.read_file(communes_path).to_crs(CRS)
+    communes["code_commune"] = communes[code_column].astype(str)
+    if dept_column is None:
+        communes["dept"] = communes["code_commune"].map(commune_department)
+    else:
+        communes["dept"] = communes[dept_column].astype(str)
+    return communes[["code_commune", "dept", "geometry"]]
+
+
+def run(communes_path, out_url=BASE_URL, depts=DEPARTEMENTS, code_column="code", dept_column=None, workers=None):
+    """
+    Superpose les couches d'aléa et les communes de chaque département en
+    parallèle. Renvoie `(traités, en_échec)`.
+    """
+    communes = read_communes(communes_path, code_column, dept_column)
+    by_dept = dict(tuple(communes.groupby("dept", sort=False)))
+    done, failed = {}, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for dept in depts:
+            if dept not in by_dept:
+                print(f"{dept} : aucune commune dans {communes_path}, ignoré", file=sys.stderr)
+                continue
+            subset = by_dept[dept].reset_index(drop=True)
+            futures[pool.submit(overlay_department, out_url, dept, subset)] = dept
+        for future in as_completed(futures):
+            dept = futures[future]
+            try:
+                done[dept] = future.result()
+            except Exception as exc:
+                print(f"{dept} : échec ({exc!r})", file=sys.stderr)
+                failed.append(dept)
+    return done, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exposition des communes aux aléas (superposition spatiale).")
+    parser.add_argument("communes", help="Contours communaux (GeoJSON, GeoPackage, Shapefile...).")
+    parser.add_argument("--out", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--code-column", default="code", help="Colonne du code commune INSEE.")
+    parser.add_argument("--dept-column", default=None,
+                        help="Colonne du code département (déduit du code commune par défaut).")
+    parser.add_argument("--dept", action="append", help="Département(s) à traiter (défaut : tous).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    done, failed = run(args.communes, args.out, args.dept or DEPARTEMENTS,
+                       args.code_column, args.dept_column, args.workers)
+    for dept in sorted(done):
+        print(f"{dept} : {', '.join(done[dept]) or 'aucune couche'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
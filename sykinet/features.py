@@ -0,0 +1,177 @@
+"""
+Colonnes dérivées matérialisées des bases de transactions (page 4).
+
+Le prix au m², le libellé court du risque d'inondation, le niveau de
+sécheresse en texte et les filtres d'outliers standard sont calculés une fois
+par version de la base source et stockés à côté d'elle
+(`<base>_features.parquet`, types compacts). La page lit directement des
+tables prêtes à tracer, avec un masque booléen par filtre :
+
+* `masque_nuage` : lignes traçables dans le nuage de points valeur / surface
+  (appartements ; les bornes de surface et de valeur se règlent sur la page) ;
+* `masque_boxplot` : box plots du prix au m² (seuil d'outliers de la base).
+
+    python -m sykinet.features
+"""
+
+import argparse
+from dataclasses import dataclass
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from sykinet.data import dataset_version, load_dataset_version, read_dataset
+from sykinet.schemas import get_schema
+from sykinet.spans import annotate, span
+from sykinet.storage import BASE_PATH, BASE_URL, data_path, filesystem_from_url, get_filesystem
+
+# Libellés courts des classes d'inondation
+MAPPING_LABELS_INOND = {
+    "Pas de débordement de nappe ni d'inondation de cave": 'Pas de Risque',
+    "Zones potentiellement sujettes aux inondations de cave": 'Risque Caves',
+    "Zones potentiellement sujettes aux débordements de nappe": 'Risque Nappes'
+}
+
+# Clé des métadonnées Parquet : version de la base source des colonnes dérivées
+SOURCE_VERSION_KEY = b"sykinet_source_version"
+# À incrémenter à chaque modification des colonnes dérivées : invalide les fichiers matérialisés
+FEATURES_VERSION = 3
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """
+    Colonnes dérivées d'une base : aléa, surface du prix au m², nom de la
+    colonne de prix, seuil d'outliers du box plot et présence du nuage de points.
+    """
+    name: str
+    hazard: str
+    surface: str
+    price: str
+    max_price: float
+    scatter: bool = False
+
+    @property
+    def source_columns(self):
+        return (self.hazard, self.surface, "valeur_fonciere", "code_departement")
+
+    @property
+    def box_column(self):
+        """
+        Colonne des classes d'aléa en abscisse des box plots.
+        """
+        return "Risque_innond_court" if self.hazard == "Risque_innond" else self.hazard
+
+
+FEATURE_SPECS = {
+    spec.name: spec
+    for spec in [
+        FeatureSpec("base_innond_final", "Risque_innond", "surface_reelle_bati",
+                    "valeur_fonciere_par_surface", 1e4, scatter=True),
+        FeatureSpec("base_sech_final", "zone_niveau", "surface_reelle_bati",
+                    "valeur_fonciere_par_surface", 1e4, scatter=True),
+        FeatureSpec("base_innond_final_maison", "Risque_innond", "surface_terrain",
+                    "valeur_fonciere_par_surface", 1.4e3),
+        FeatureSpec("base_sech_final_maison", "zone_niveau", "surface_terrain",
+                    "valeur_fonciere_par_surf", 1.5e3),
+    ]
+}
+
+
+def features_path(name, base_path=BASE_PATH):
+    return data_path(get_schema(name).filename, base_path)[: -len(".csv")] + "_features.parquet"
+
+
+def source_tag(version):
+    """
+    Étiquette d'un fichier matérialisé : version de la base source et des colonnes dérivées.
+    """
+    return f"{FEATURES_VERSION}:{version}"
+
+
+def compute_features(df, spec):
+    """
+    Ajoute à une base (colonnes `spec.source_columns`) ses colonnes dérivées et masques.
+    """
+    df = df[list(spec.source_columns)].copy()
+    df[spec.price] = (df["valeur_fonciere"] / df[spec.surface]).astype("float32")
+
+    if spec.hazard == "Risque_innond":
+        df["Risque_innond_court"] = df["Risque_innond"].astype(object).map(MAPPING_LABELS_INOND).astype("category")
+        hazard_known = df["Risque_innond_court"].notna()
+    else:
+        df["zone_niveau_str"] = df["zone_niveau"].astype(str).astype("category")
+        hazard_known = df["zone_niveau"].notna()
+        # Ordre des niveaux dans la légende du nuage de points
+        df = df.sort_values("zone_niveau_str", kind="stable", ignore_index=True)
+
+    if spec.scatter:
+        df["masque_nuage"] = True
+        if spec.hazard == "zone_niveau":
+            df["masque_nuage"] = df[[spec.hazard, spec.surface, "valeur_fonciere", spec.price]].notna().all(axis=1)
+    # Les lignes sans classe d'aléa ne figurent pas dans les box plots
+    df["masque_boxplot"] = (df[spec.price] < spec.max_price) & hazard_known
+    return df
+
+
+def build_features(fs, name, base_path=BASE_PATH):
+    """
+    Calcule et écrit les colonnes dérivées d'une base, étiquetées par sa version.
+    """
+    spec = FEATURE_SPECS[name]
+    version = dataset_version(fs, name, base_path=base_path)
+    df = compute_features(read_dataset(fs, name, columns=spec.source_columns, base_path=base_path), spec)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, SOURCE_VERSION_KEY: source_tag(version).encode()})
+    with fs.open(features_path(name, base_path), "wb") as f:
+        pq.write_table(table, f, compression="zstd")
+    return df
+
+
+def read_features(fs, name, base_path=BASE_PATH):
+    """
+    Colonnes dérivées d'une base : fichier matérialisé s'il correspond à la
+    version courante de la base, calcul à la volée sinon.
+    """
+    spec = FEATURE_SPECS[name]
+    path = features_path(name, base_path)
+    if fs.exists(path):
+        with fs.open(path, "rb") as f:
+            parquet = pq.ParquetFile(f)
+            stored = (parquet.schema_arrow.metadata or {}).get(SOURCE_VERSION_KEY, b"").decode()
+            if stored == source_tag(dataset_version(fs, name, base_path=base_path)):
+                return parquet.read().to_pandas()
+    return compute_features(read_dataset(fs, name, columns=spec.source_columns, base_path=base_path), spec)
+
+
+@st.cache_data(show_spinner=False)
+def _load_features(name, version):
+    annotate(cache="miss")
+    return read_features(get_filesystem(), name)
+
+
+def load_features(name):
+    """
+    Table prête à tracer d'une base de la page 4, mise en cache par version.
+    """
+    with span(f"chargement {name}", cached=True):
+        return _load_features(name, load_dataset_version(name))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Colonnes dérivées des bases de la page 4.")
+    parser.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--base", action="append", choices=list(FEATURE_SPECS),
+                        help="Base(s) à traiter (défaut : toutes).")
+    args = parser.parse_args(argv)
+
+    fs, base_path = filesystem_from_url(args.base_url)
+    for name in args.base or FEATURE_SPECS:
+        df = build_features(fs, name, base_path)
+        print(f"{name} : {len(df)} lignes -> {features_path(name, base_path)}")
+
+
+if __name__ == "__main__":
+    main()
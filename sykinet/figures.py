@@ -0,0 +1,177 @@
+"""
+Construction des figures Matplotlib des couches d'aléa départementales
+(carte par classe et camembert des surfaces) et des box plots pré-calculés de
+la page 4, indépendamment de Streamlit.
+"""
+
+import io
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.colors import ListedColormap, to_rgba
+from matplotlib.patches import Patch
+
+from sykinet.legends import LAYER_LEGENDS
+from sykinet.raster import rasterize_layer
+
+# À incrémenter à chaque modification du rendu : invalide les images en cache
+STYLE_VERSION = 2
+
+MAP_FIGSIZE = (12, 12)
+# Largeur (pixels) de la grille rastérisée des cartes départementales
+MAP_RASTER_PX = 1200
+PIE_FIGSIZE = (8, 8)
+
+# Titres propres à chaque couche
+MAP_TITLES = {
+    "inondation": ("Carte d'Aléa Basée sur le Gridcode - Département {dept}", "Grille de Code d'Aléa"),
+    "secheresse": ("Carte de risque sécheresse - Département {dept}", "Grille des risques"),
+}
+PIE_TITLES = {
+    "inondation": "Répartition de la Surface d'Aléa Inondation ({dept})",
+    "secheresse": "Répartition de la Surface de Risque Sécheresse ({dept})",
+}
+
+
+def hazard_map_figure(gdf, layer, dept, width_px=MAP_RASTER_PX):
+    """
+    Carte d'une couche d'aléa : les polygones sont rastérisés en une grille de
+    classes (sykinet.raster) puis affichés par un unique `imshow` ; les polygones
+    hors légende apparaissent en fond gris.
+    """
+    class_column, legend = LAYER_LEGENDS[layer]
+    return raster_map_figure(rasterize_layer(gdf, class_column, list(legend), width_px=width_px), layer, dept)
+
+
+def raster_map_figure(raster, layer, dept):
+    """
+    Carte d'une couche d'aléa déjà rastérisée (grille des rangs de la légende,
+    voir `rasterize_layer`), cadrée sur l'emprise de la grille.
+    """
+    _, legend = LAYER_LEGENDS[layer]
+    title, legend_title = MAP_TITLES[layer]
+
+    fig, ax = plt.subplots(figsize=MAP_FIGSIZE)
+
+    # Calcul des bornes
+    minx, miny, maxx, maxy = raster.bounds
+    x_buffer = (maxx - minx) * 0.02
+    y_buffer = (maxy - miny) * 0.02
+
+    ax.set_xlim(minx - x_buffer, maxx + x_buffer)
+    ax.set_ylim(miny - y_buffer, maxy + y_buffer)
+    ax.set_aspect('equal')
+    ax.set_axis_off()
+    ax.set_title(title.format(dept=dept), fontsize=18)
+
+    # Une couleur par classe de la légende, puis le gris de fond ; hors polygones : transparent
+    colors = [to_rgba(color, 0.9) for color, _ in legend.values()] + [to_rgba('lightgrey', 0.5)]
+    ax.imshow(
+        np.ma.masked_less(raster.grid, 0),
+        cmap=ListedColormap(colors),
+        vmin=-0.5,
+        vmax=len(colors) - 0.5,
+        extent=raster.extent,
+        interpolation='nearest'
+    )
+
+    legend_handles = [
+        Patch(facecolor=color, edgecolor='black', label=label)
+        for (color, label), area in zip(legend.values(), raster.class_areas(len(legend)))
+        if area > 0
+    ]
+
+    # Créer la légende discrète
+    if legend_handles:
+        ax.legend(
+            handles=legend_handles,
+            title=legend_title,
+            loc='lower right',
+            fancybox=True,
+            framealpha=0.85,
+            borderpad=1,
+            fontsize=10
+        )
+    return fig
+
+
+def order_areas(areas, layer):
+    """
+    Ordonne les surfaces par classe comme la légende pour la sécheresse
+    (Nul, Faible, Moyen, Fort), sans les classes absentes.
+    """
+    if layer == "secheresse":
+        _, legend = LAYER_LEGENDS[layer]
+        areas = areas.reindex(list(legend), fill_value=0)
+        areas = areas[areas > 0]
+    return areas
+
+
+def area_by_class(gdf, layer):
+    """
+    Surface totale par classe d'aléa calculée sur la géométrie (ordre des
+    camemberts). Le GeoDataFrame n'est pas modifié.
+    """
+    class_column, _ = LAYER_LEGENDS[layer]
+    areas = gdf.geometry.area.groupby(gdf[class_column], observed=True).sum()
+    return order_areas(areas, layer)
+
+
+def area_pie_figure(areas, layer, dept):
+    """
+    Camembert de la répartition des surfaces par classe d'aléa.
+    """
+    _, legend = LAYER_LEGENDS[layer]
+    labels = [legend[code][1] for code in areas.index]
+    colors = [legend[code][0] for code in areas.index]
+
+    fig, ax = plt.subplots(figsize=PIE_FIGSIZE)
+    ax.pie(
+        areas,
+        labels=labels,
+        colors=colors,
+        autopct='%1.1f%%', # Afficher les pourcentages avec une décimale
+        startangle=90,
+        textprops={'fontsize': 12, 'fontweight': 'bold'}
+    )
+    ax.set_title(PIE_TITLES[layer].format(dept=dept), fontsize=14)
+    return fig
+
+
+def box_plot(ax, positions, stats, labels, colors):
+    """
+    Box plots tracés à partir de statistiques pré-calculées (sykinet.quantiles),
+    dans le style de `seaborn.boxplot` : une boîte colorée par position de
+    `labels`, les positions sans statistiques restant vides.
+    """
+    ax.set_xticks(range(len(labels)), labels)
+    ax.set_xlim(-0.5, len(labels) - 0.5)
+    if not stats:
+        return None
+    artists = ax.bxp(
+        stats,
+        positions=positions,
+        widths=0.8,
+        patch_artist=True,
+        boxprops={'edgecolor': '.26'},
+        whiskerprops={'color': '.26'},
+        capprops={'color': '.26'},
+        medianprops={'color': '.26'},
+        flierprops={'marker': 'd', 'markerfacecolor': '.26', 'markeredgecolor': '.26', 'markersize': 4},
+    )
+    for box, position in zip(artists['boxes'], positions):
+        box.set_facecolor(colors[position % len(colors)])
+    # `bxp` replace les graduations sur les seules positions tracées
+    ax.set_xticks(range(len(labels)), labels)
+    ax.set_xlim(-0.5, len(labels) - 0.5)
+    return artists
+
+
+def figure_to_png(fig, dpi=200):
+    """
+    Encode une figure en PNG (mêmes réglages que `st.pyplot`) puis la ferme.
+    """
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
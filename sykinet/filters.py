@@ -0,0 +1,180 @@
+"""
+Filtres interactifs de la page 4 sur colonnes indexées.
+
+Chaque table prête à tracer (sykinet.features) est indexée une fois par
+version :
+
+* colonnes numériques : permutation triée des lignes (`RangeIndex`), un
+  intervalle se résout par deux recherches dichotomiques ;
+* colonnes catégorielles : lignes regroupées par code (`CategoryIndex`), une
+  sélection de modalités se lit par tranches.
+
+`TableIndex.select` part du critère le plus sélectif (taille connue sans rien
+parcourir) puis vérifie les autres critères sur ses seules lignes candidates :
+le coût suit le nombre de lignes retenues, pas la taille de la table.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from sykinet.data import load_dataset_version
+from sykinet.features import FEATURE_SPECS, load_features
+from sykinet.spans import annotate, span
+
+
+class RangeIndex:
+    """
+    Lignes d'une colonne numérique triées par valeur ; les valeurs manquantes
+    ne sont retenues par aucun intervalle filtrant.
+    """
+
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=float)
+        order = np.argsort(self.values, kind="stable")
+        # Les NaN sont rangés en fin de tri
+        self.order = order[: np.count_nonzero(~np.isnan(self.values))]
+        self.sorted = self.values[self.order]
+
+    @property
+    def bounds(self):
+        if len(self.sorted) == 0:
+            return np.nan, np.nan
+        return self.sorted[0], self.sorted[-1]
+
+    def covers(self, low, high):
+        """
+        Vrai si l'intervalle [low, high] couvre toutes les valeurs : le critère
+        est alors ignoré et les valeurs manquantes conservées.
+        """
+        return len(self.sorted) == 0 or (low <= self.bounds[0] and high >= self.bounds[1])
+
+    def _slice(self, low, high):
+        return (np.searchsorted(self.sorted, low, side="left"),
+                np.searchsorted(self.sorted, high, side="right"))
+
+    def count(self, low, high):
+        start, stop = self._slice(low, high)
+        return max(stop - start, 0)
+
+    def positions(self, low, high):
+        """
+        Lignes dont la valeur est dans l'intervalle fermé [low, high].
+        """
+        start, stop = self._slice(low, high)
+        return self.order[start:max(start, stop)]
+
+    def contains(self, rows, low, high):
+        values = self.values[rows]
+        return (values >= low) & (values <= high)
+
+
+class CategoryIndex:
+    """
+    Lignes d'une colonne catégorielle regroupées par modalité (libellés en texte).
+    """
+
+    def __init__(self, values):
+        categorical = pd.Categorical(values)
+        self.categories = [str(category) for category in categorical.categories]
+        self.codes = categorical.codes.astype(np.int64)
+        self.order = np.argsort(self.codes, kind="stable")
+        # Code -1 (valeur manquante) en tête, puis une tranche par modalité
+        counts = np.bincount(self.codes + 1, minlength=len(self.categories) + 1)
+        self.offsets = np.r_[0, np.cumsum(counts)]
+
+    def _codes(self, selected):
+        lookup = {category: code for code, category in enumerate(self.categories)}
+        return [lookup[str(value)] for value in selected if str(value) in lookup]
+
+    def covers(self, selected):
+        # Toutes les modalités retenues : critère ignoré, valeurs manquantes conservées
+        return len(set(self._codes(selected))) == len(self.categories)
+
+    def count(self, selected):
+        return sum(self.offsets[code + 2] - self.offsets[code + 1] for code in self._codes(selected))
+
+    def positions(self, selected):
+        """
+        Lignes dont la modalité fait partie de `selected`.
+        """
+        slices = [self.order[self.offsets[code + 1]:self.offsets[code + 2]] for code in self._codes(selected)]
+        return np.concatenate(slices) if slices else np.zeros(0, dtype=self.order.dtype)
+
+    def contains(self, rows, selected):
+        allowed = np.zeros(len(self.categories), dtype=bool)
+        allowed[self._codes(selected)] = True
+        codes = self.codes[rows]
+        return (codes >= 0) & allowed[np.maximum(codes, 0)]
+
+
+class TableIndex:
+    """
+    Index des colonnes filtrables d'une table.
+    """
+
+    def __init__(self, df, ranges=(), categories=()):
+        self.size = len(df)
+        self.ranges = {column: RangeIndex(df[column]) for column in ranges}
+        self.categories = {column: CategoryIndex(df[column]) for column in categories}
+
+    def select(self, ranges=None, categories=None):
+        """
+        Positions (triées) des lignes vérifiant tous les critères :
+        `ranges` `{colonne: (min, max)}` (intervalles fermés) et `categories`
+        `{colonne: modalités retenues}`. Renvoie None si aucun critère ne filtre.
+        """
+        criteria = [
+            (self.ranges[column], bounds)
+            for column, bounds in (ranges or {}).items()
+            if not self.ranges[column].covers(*bounds)
+        ] + [
+            (self.categories[column], (list(selected),))
+            for column, selected in (categories or {}).items()
+            if not self.categories[column].covers(selected)
+        ]
+        if not criteria:
+            return None
+
+        criteria.sort(key=lambda criterion: criterion[0].count(*criterion[1]))
+        (index, args), others = criteria[0], criteria[1:]
+        rows = index.positions(*args)
+        for index, args in others:
+            rows = rows[index.contains(rows, *args)]
+        if len(rows) > self.size // 16:
+            # Sélection large : remise en ordre par masque plutôt que par tri
+            bitmap = np.zeros(self.size, dtype=bool)
+            bitmap[rows] = True
+            return np.flatnonzero(bitmap)
+        return np.sort(rows)
+
+
+def take(df, rows):
+    """
+    Lignes `rows` de `df` (toute la table si `rows` vaut None).
+    """
+    return df if rows is None else df.take(rows)
+
+
+def build_index(df, spec):
+    """
+    Index des colonnes filtrables d'une table de la page 4 : surface, valeur
+    foncière, département et classe d'aléa.
+    """
+    return TableIndex(df, ranges=(spec.surface, "valeur_fonciere"),
+                      categories=("code_departement", spec.box_column))
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _load_index(name, version):
+    annotate(cache="miss")
+    return build_index(load_features(name), FEATURE_SPECS[name])
+
+
+def load_index(name):
+    """
+    Index d'une table de la page 4, construit une fois par version et partagé
+    entre les sessions (lecture seule, sans copie à chaque exécution).
+    """
+    with span(f"index {name}", cached=True):
+        return _load_index(name, load_dataset_version(name))
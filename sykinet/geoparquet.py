@@ -0,0 +1,210 @@
+"""
+Stockage binaire des couches d'aléa (GeoParquet, géométrie encodée en WKB).
+
+Les CSV historiques stockent la géométrie en WKT, ce qui impose un
+`df['geometry'].apply(wkt.loads)` ligne par ligne à chaque chargement.
+Ce module convertit une fois pour toutes ces fichiers en Parquet (colonnes
+typées + géométrie WKB) et fournit les lecteurs correspondants, qui décodent
+la géométrie en une seule passe vectorisée (GEOS via shapely 2).
+
+Utilisation en ligne de commande :
+
+    python -m sykinet.geoparquet convert "gs://streamlit-sykinet/base sykinet/"
+    python -m sykinet.geoparquet bench "gs://streamlit-sykinet/base sykinet/" --dept 33
+"""
+
+import argparse
+import time
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow.parquet as pq
+from shapely import wkt
+
+from sykinet.spans import span
+from sykinet.storage import filesystem_from_url
+
+# Motifs des fichiers de couches d'aléa à convertir
+CSV_PATTERNS = ("df_secheresse*.csv", "base_innondation*.csv", "df_*_complet.csv")
+
+CRS = "EPSG:2154"
+
+
+def parquet_path(csv_path):
+    """
+    Renvoie le chemin du fichier Parquet associé à un CSV (même dossier, même nom).
+    """
+    return str(csv_path)[: -len(".csv")] + ".parquet"
+
+
+def lod_path(csv_path, tolerance):
+    """
+    Chemin de la version simplifiée (niveau de détail) d'une couche, tolérance en mètres.
+    """
+    return str(csv_path)[: -len(".csv")] + f"_lod{tolerance}.parquet"
+
+
+def lookup_path(csv_path):
+    """
+    Chemin de l'index de recherche ponctuelle d'une couche (sykinet.lookup).
+    """
+    return str(csv_path)[: -len(".csv")] + "_lookup.parquet"
+
+
+def lod_manifest_path(csv_path):
+    """
+    Chemin du manifeste JSON décrivant les niveaux de détail d'une couche.
+    """
+    return str(csv_path)[: -len(".csv")] + "_lod.json"
+
+
+def _drop_index_columns(df):
+    # Les CSV ont été écrits avec `to_csv` sans `index=False`
+    return df.drop(columns=[c for c in df.columns if c.startswith("Unnamed:")])
+
+
+def csv_to_geoparquet(fs, src, dst=None, crs=CRS):
+    """
+    Convertit un CSV à géométrie WKT en GeoParquet (WKB) et renvoie le chemin écrit.
+    """
+    dst = dst or parquet_path(src)
+    with fs.open(src, "rb") as f:
+        df = _drop_index_columns(pd.read_csv(f))
+
+    # Décodage WKT vectorisé (une seule passe GEOS, pas de boucle Python)
+    geometry = gpd.GeoSeries.from_wkt(df.pop("geometry"), crs=crs)
+    gdf = gpd.GeoDataFrame(df, geometry=geometry)
+
+    with fs.open(dst, "wb") as f:
+        gdf.to_parquet(f, index=False, compression="zstd")
+    return dst
+
+
+def find_hazard_csvs(fs, base_path):
+    """
+    Liste les CSV de couches d'aléa présents dans `base_path`.
+    """
+    base_path = base_path.rstrip("/") + "/"
+    found = set()
+    for pattern in CSV_PATTERNS:
+        found.update(fs.glob(base_path + pattern))
+    return sorted(found)
+
+
+def convert_all(fs, base_path, force=False):
+    """
+    Convertit toutes les couches d'aléa d'un dossier. Les fichiers Parquet plus
+    récents que leur CSV sont conservés sauf si `force` est vrai.
+    """
+    written = []
+    for src in find_hazard_csvs(fs, base_path):
+        dst = parquet_path(src)
+        if not force and fs.exists(dst) and _is_newer(fs, dst, src):
+            continue
+        written.append(csv_to_geoparquet(fs, src, dst))
+    return written
+
+
+def _is_newer(fs, a, b):
+    try:
+        return fs.modified(a) >= fs.modified(b)
+    except (NotImplementedError, AttributeError, FileNotFoundError):
+        return True
+
+
+def read_geoparquet(fs, path, columns=None):
+    """
+    Lit un GeoParquet en GeoDataFrame, en ne décodant que les colonnes demandées
+    (les colonnes absentes du fichier sont ignorées).
+    """
+    with span("lecture_geoparquet"), fs.open(path, "rb") as f:
+        if columns is not None:
+            available = pq.ParquetFile(f).schema_arrow.names
+            columns = [c for c in dict.fromkeys([*columns, "geometry"]) if c in available]
+            f.seek(0)
+        return gpd.read_parquet(f, columns=columns)
+
+
+def read_hazard_layer(fs, csv_path, columns=None, crs=CRS):
+    """
+    Charge une couche d'aléa : version Parquet si elle existe, sinon le CSV
+    d'origine décodé de façon vectorisée.
+    """
+    pq_path = parquet_path(csv_path)
+    if fs.exists(pq_path):
+        return read_geoparquet(fs, pq_path, columns=columns)
+
+    usecols = None
+    if columns is not None:
+        wanted = {*columns, "geometry"}
+        usecols = lambda c: c in wanted
+    with span("lecture_csv"), fs.open(csv_path, "rb") as f:
+        df = _drop_index_columns(pd.read_csv(f, usecols=usecols))
+    with span("decodage_wkt"):
+        geometry = gpd.GeoSeries.from_wkt(df.pop("geometry"), crs=crs)
+    return gpd.GeoDataFrame(df, geometry=geometry)
+
+
+# ***************************************************************
+# Banc d'essai : chargement CSV/WKT historique vs GeoParquet
+# ***************************************************************
+
+def _load_csv_rowwise(fs, csv_path):
+    # Reproduction fidèle du chargement actuel des pages
+    with fs.open(csv_path, "rb") as f:
+        df = pd.read_csv(f)
+    df['geometry'] = df['geometry'].apply(wkt.loads)
+    return gpd.GeoDataFrame(df, geometry='geometry', crs=CRS)
+
+
+def benchmark(fs, csv_path, repeat=3):
+    """
+    Chronomètre le chargement d'une couche en CSV/WKT (ligne à ligne) et en
+    GeoParquet. Renvoie le meilleur temps (en secondes) de chaque méthode.
+    """
+    pq_path = parquet_path(csv_path)
+    if not fs.exists(pq_path):
+        csv_to_geoparquet(fs, csv_path, pq_path)
+
+    def best_of(load):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            gdf = load()
+            timings.append(time.perf_counter() - start)
+        return min(timings), len(gdf)
+
+    t_csv, n_rows = best_of(lambda: _load_csv_rowwise(fs, csv_path))
+    t_parquet, _ = best_of(lambda: read_geoparquet(fs, pq_path))
+    return {"rows": n_rows, "csv_wkt": t_csv, "geoparquet": t_parquet}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conversion des couches d'aléa en GeoParquet.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_convert = sub.add_parser("convert", help="Convertit tous les CSV de couches d'aléa.")
+    p_convert.add_argument("base_url", help="Dossier source (local ou gs://...).")
+    p_convert.add_argument("--force", action="store_true", help="Reconvertit même les fichiers à jour.")
+
+    p_bench = sub.add_parser("bench", help="Compare les temps de chargement CSV et Parquet.")
+    p_bench.add_argument("base_url", help="Dossier source (local ou gs://...).")
+    p_bench.add_argument("--dept", default="33", help="Code du département testé (défaut : 33).")
+    p_bench.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args(argv)
+    fs, base_path = filesystem_from_url(args.base_url)
+
+    if args.command == "convert":
+        for path in convert_all(fs, base_path, force=args.force):
+            print(f"écrit : {path}")
+    else:
+        for name in (f"base_innondation{args.dept}.csv", f"df_secheresse{args.dept}.csv"):
+            res = benchmark(fs, base_path + name, repeat=args.repeat)
+            gain = res["csv_wkt"] / res["geoparquet"] if res["geoparquet"] else float("inf")
+            print(f"{name}: {res['rows']} lignes | CSV/WKT {res['csv_wkt']:.2f}s | "
+                  f"GeoParquet {res['geoparquet']:.2f}s | x{gain:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Régression hédonique à effets fixes : effet des classes d'aléa sur le prix au m².
+
+    log(prix au m²) = Σ β_k 1[classe = k] + γ log(surface) + α_lieu + ε
+
+Les médianes par classe de la page 4 mélangent risque et localisation ; les
+effets fixes α_lieu (département ou commune) absorbent la seconde. Ils sont
+éliminés par transformation within : chaque variable est centrée sur la
+moyenne de son groupe. La matrice indicatrice des groupes, très creuse, n'est
+jamais formée : ses produits (D'X, D'y) se calculent par `np.bincount` sur les
+codes de groupe, en O(n) pour toute la base des ventes.
+
+Les écarts-types sont robustes à la corrélation intra-groupe (un cluster par
+groupe d'effets fixes, correction CR1 comme Stata / reghdfe pour des effets
+fixes emboîtés dans les clusters).
+
+    python -m sykinet.hedonic --effets commune
+"""
+
+import argparse
+import math
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from sykinet.data import load_dataset_version, read_dataset
+from sykinet.features import FEATURE_SPECS, MAPPING_LABELS_INOND
+from sykinet.spans import annotate, span
+from sykinet.storage import BASE_URL, filesystem_from_url, get_filesystem
+
+# Niveaux d'effets fixes de localisation : libellé -> colonne des groupes
+FIXED_EFFECTS = {"departement": "code_departement", "commune": "code_commune"}
+
+
+@dataclass
+class HedonicFit:
+    """
+    Résultat d'une estimation : table des coefficients et diagnostics.
+    """
+    table: pd.DataFrame
+    reference: str
+    fixed_effect: str
+    n_obs: int
+    n_groups: int
+    r2_within: float
+
+
+def design(df, spec, group_column):
+    """
+    Variables de la régression pour une base : log du prix au m², classes
+    d'aléa (libellés de la page 4), log de la surface et codes de groupe.
+    Les lignes incomplètes ou de prix / surface non positifs sont écartées.
+    """
+    # Travail sur les codes catégoriels : aucune conversion ligne à ligne en texte
+    classes = pd.Categorical(df[spec.hazard])
+    if spec.hazard == "Risque_innond":
+        classes = classes.rename_categories(
+            [MAPPING_LABELS_INOND.get(category, category) for category in classes.categories])
+        # Ordre des libellés courts, comme les box plots
+        classes = classes.reorder_categories(sorted(classes.categories))
+    else:
+        classes = classes.rename_categories([str(category) for category in classes.categories])
+    groups = pd.Categorical(df[group_column])
+    valeur = df["valeur_fonciere"].to_numpy(dtype=float)
+    surface = df[spec.surface].to_numpy(dtype=float)
+    valid = (valeur > 0) & (surface > 0) & (classes.codes >= 0) & (groups.codes >= 0)
+
+    classes = classes[valid].remove_unused_categories()
+    log_price = np.log(valeur[valid] / surface[valid])
+    return log_price, classes, np.log(surface[valid]), groups.codes[valid].astype(np.int64)
+
+
+def drop_singletons(groups, *arrays):
+    """
+    Retire les groupes d'une seule observation, sans information une fois les
+    effets fixes absorbés ; les codes de groupe sont renumérotés.
+    """
+    counts = np.bincount(groups)
+    kept = counts[groups] > 1
+    groups = np.unique(groups[kept], return_inverse=True)[1]
+    return (groups,) + tuple(array[kept] for array in arrays)
+
+
+def within(matrix, groups, n_groups):
+    """
+    Centre chaque colonne de `matrix` sur la moyenne de son groupe : X - D (D'D)⁻¹ D'X.
+    """
+    counts = np.bincount(groups, minlength=n_groups)
+    centered = np.empty_like(matrix)
+    for j in range(matrix.shape[1]):
+        means = np.bincount(groups, weights=matrix[:, j], minlength=n_groups) / counts
+        centered[:, j] = matrix[:, j] - means[groups]
+    return centered
+
+
+def identified_columns(X, tol=1e-8):
+    """
+    Colonnes de `X` à conserver, dans l'ordre : chacune doit garder une part
+    propre de sa norme une fois projetée sur les colonnes déjà retenues. Sont
+    écartées, comme les variables « omitted » de Stata, les classes absentes
+    ou constantes dans chaque groupe et les variables colinéaires aux
+    précédentes.
+    """
+    kept = []
+    for j in range(X.shape[1]):
+        column = X[:, j]
+        norm = np.sqrt(column @ column)
+        if kept:
+            column = column - X[:, kept] @ np.linalg.lstsq(X[:, kept], column, rcond=None)[0]
+        if np.sqrt(column @ column) > tol * norm:
+            kept.append(j)
+    return np.isin(np.arange(X.shape[1]), kept)
+
+
+def fit(df, spec, fixed_effect="departement"):
+    """
+    Estime la régression d'une base avec effets fixes `fixed_effect` (clé de
+    `FIXED_EFFECTS`). La classe d'aléa la plus basse sert de référence.
+    Lève ValueError si aucune variable n'est identifiée ou s'il ne reste pas
+    plus de ventes que de variables.
+    """
+    log_price, classes, log_surface, groups = design(df, spec, FIXED_EFFECTS[fixed_effect])
+    groups, log_price, codes, log_surface = drop_singletons(groups, log_price, classes.codes, log_surface)
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+
+    names = [f"{spec.hazard} : {classe}" for classe in classes.categories[1:]] + ["log(surface)"]
+    regressors = np.column_stack(
+        [(codes == code).astype(float) for code in range(1, len(classes.categories))] + [log_surface]
+    )
+    centered = within(np.column_stack([log_price, regressors]), groups, n_groups)
+    y, X = centered[:, 0], centered[:, 1:]
+    identified = identified_columns(X)
+    X, names = X[:, identified], [name for name, keep in zip(names, identified) if keep]
+    n_obs, k = X.shape
+    if k == 0 or n_obs <= k:
+        raise ValueError(f"{n_obs} ventes et {k} variables identifiées après effets fixes : "
+                         "régression non estimable")
+
+    bread = np.linalg.pinv(X.T @ X)
+    beta = bread @ (X.T @ y)
+    residuals = y - X @ beta
+
+    # Scores cumulés par cluster (un par groupe d'effets fixes)
+    scores = np.column_stack([
+        np.bincount(groups, weights=X[:, j] * residuals, minlength=n_groups) for j in range(X.shape[1])
+    ])
+    # Un seul cluster : variance robuste non définie, écarts-types NaN
+    correction = n_groups / (n_groups - 1) * (n_obs - 1) / (n_obs - k) if n_groups > 1 else np.nan
+    covariance = correction * bread @ (scores.T @ scores) @ bread
+    std_errors = np.sqrt(np.diag(covariance))
+    t_stats = beta / std_errors
+
+    table = pd.DataFrame({
+        "Variable": names,
+        "Coefficient": beta,
+        "Écart-type": std_errors,
+        "t": t_stats,
+        "p-valeur": [math.erfc(abs(t) / math.sqrt(2)) for t in t_stats],
+        "Effet sur le prix (%)": 100 * np.expm1(beta),
+    })
+    return HedonicFit(
+        table=table,
+        reference=str(classes.categories[0]),
+        fixed_effect=fixed_effect,
+        n_obs=n_obs,
+        n_groups=n_groups,
+        r2_within=float(1 - residuals @ residuals / (y @ y)),
+    )
+
+
+def regression_columns(spec):
+    return (spec.hazard, spec.surface, "valeur_fonciere", *FIXED_EFFECTS.values())
+
+
+@st.cache_data(show_spinner=False)
+def _load_fit(name, fixed_effect, version):
+    annotate(cache="miss")
+    spec = FEATURE_SPECS[name]
+    df = read_dataset(get_filesystem(), name, columns=regression_columns(spec))
+    with span("ajustement"):
+        return fit(df, spec, fixed_effect)
+
+
+def load_fit(name, fixed_effect="departement"):
+    """
+    Régression d'une base de la page 4, mise en cache par version.
+    """
+    with span(f"regression {name}", cached=True):
+        return _load_fit(name, fixed_effect, load_dataset_version(name))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Régression hédonique à effets fixes des bases de la page 4.")
+    parser.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--base", action="append", choices=list(FEATURE_SPECS),
+                        help="Base(s) à traiter (défaut : toutes).")
+    parser.add_argument("--effets", choices=list(FIXED_EFFECTS), default="departement",
+                        help="Niveau des effets fixes de localisation.")
+    args = parser.parse_args(argv)
+
+    fs, base_path = filesystem_from_url(args.base_url)
+    for name in args.base or FEATURE_SPECS:
+        spec = FEATURE_SPECS[name]
+        try:
+            result = fit(read_dataset(fs, name, columns=regression_columns(spec), base_path=base_path),
+                         spec, args.effets)
+        except ValueError as e:
+            print(f"\n{name} : {e}", file=sys.stderr)
+            continue
+        print(f"\n{name} : {result.n_obs} ventes, {result.n_groups} groupes ({args.effets}), "
+              f"R² within {result.r2_within:.3f}, référence {result.reference}")
+        print(result.table.to_string(index=False, float_format="{:.4f}".format))
+
+
+if __name__ == "__main__":
+    main()
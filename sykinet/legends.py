@@ -0,0 +1,33 @@
+"""
+Légendes (couleur, libellé) des classes d'aléa, partagées par les cartes et
+les graphiques de toutes les pages et traitements hors ligne.
+"""
+
+from matplotlib.colors import to_rgba
+
+legend_mapping_inondation = {
+    0: ['#4CAF50', "Pas de risque (Nappe/Cave)"], # Vert
+    1: ['#FFC107', "Aléa Débordement de Nappe"], # Jaune/Orange
+    2: ['#2196F3', "Aléa Inondation de Cave"] # Bleu
+}
+
+# Légende de sécheresse ordonnée selon l'échelle d'importance du risque
+legend_mapping_secheresse = {
+    "Nul": ["#E8F5E9",'Pas de risque (Nul)'], # Vert très clair, proche du blanc
+    "Faible": ['#4CAF50', "Risque faible"],    # Vert
+    "Moyen": ['#FFC107', "Risque moyen"],    # Jaune/Orange
+    "Fort": ['#F44336', "Risque fort"]      # Rouge
+}
+
+# Colonne de classe et légende de chaque couche d'aléa départementale
+LAYER_LEGENDS = {
+    "inondation": ("gridcode", legend_mapping_inondation),
+    "secheresse": ("ALEA", legend_mapping_secheresse),
+}
+
+
+def rgba_255(color, alpha=1.0):
+    """
+    Convertit une couleur Matplotlib en liste [r, g, b, a] sur 0-255 (format deck.gl).
+    """
+    return [int(round(c * 255)) for c in to_rgba(color, alpha)]
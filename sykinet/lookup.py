@@ -0,0 +1,383 @@
+"""
+Recherche ponctuelle des classes d'aléa pour des lots d'adresses.
+
+Pour chaque point (Lambert-93 ou WGS84), renvoie la classe d'inondation
+(`gridcode`) et la classe de sécheresse (`ALEA`) des polygones affichés en
+page 2, sans charger de GeoDataFrame départemental.
+
+Un index est pré-calculé hors ligne pour chaque (couche, département) et écrit
+à côté de la couche (`<couche>_lookup.parquet`) : polygones rendus valides et
+éclatés en parties simples (emprises plus serrées), rangés selon la courbe de
+Hilbert, avec leur classe et leur rang dans la couche d'origine. Un manifeste
+(`lookup_manifest.json`) donne l'emprise de chaque département : les points
+sont répartis entre départements par un premier index d'emprises, puis testés
+en un seul appel vectorisé (STRtree, prédicat `intersects`) par département.
+Un point couvert par plusieurs polygones reçoit la classe du premier d'entre
+eux dans l'ordre de la couche, comme la jointure de sykinet.spatial_join.
+
+    python -m sykinet.lookup build --workers 8
+    python -m sykinet.lookup query adresses.csv --x longitude --y latitude --crs EPSG:4326 --out classes.csv
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import lru_cache
+
+import fsspec
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+from pyproj import Transformer
+
+from sykinet.data import dataset_version, read_dataset
+from sykinet.departements import DEPARTEMENTS
+from sykinet.features import SOURCE_VERSION_KEY
+from sykinet.geoparquet import CRS, lookup_path
+from sykinet.legends import LAYER_LEGENDS
+from sykinet.mapped import mapped_path, open_mapped, polygon_parts
+from sykinet.schemas import get_schema
+from sykinet.storage import BASE_PATH, BASE_URL, data_path, filesystem_from_url
+
+# À incrémenter à chaque modification du format des index : invalide les fichiers écrits
+LOOKUP_VERSION = 1
+MANIFEST = "lookup_manifest.json"
+LAYERS = tuple(LAYER_LEGENDS)
+
+
+def index_tag(version):
+    return f"{LOOKUP_VERSION}:{version}"
+
+
+def layer_path(layer, dept, base_path=BASE_PATH):
+    return data_path(get_schema(layer).filename_for(dept), base_path)
+
+
+@dataclass
+class LayerIndex:
+    """
+    Index d'une couche d'un département : STRtree des parties de polygones,
+    code de légende (-1 hors légende) et rang dans la couche de chaque partie.
+    """
+    tree: shapely.STRtree
+    codes: np.ndarray
+    ordre: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df, layer):
+        _, legend = LAYER_LEGENDS[layer]
+        lookup = {value: code for code, value in enumerate(legend)}
+        codes = df["classe"].astype(object).map(lookup).fillna(-1).to_numpy(dtype=np.int8)
+        return cls(shapely.STRtree(shapely.from_wkb(df["geometry"].to_numpy())), codes,
+                   df["ordre"].to_numpy(dtype=np.int64))
+
+    def locate(self, points):
+        """
+        Code de légende de chaque point (-1 hors de tout polygone).
+        """
+        result = np.full(len(points), -1, dtype=np.int8)
+        point_idx, part_idx = self.tree.query(points, predicate="intersects")
+        if point_idx.size:
+            # Tri par (point, rang) : le premier polygone de la couche est retenu
+            order = np.lexsort((self.ordre[part_idx], point_idx))
+            point_idx, part_idx = point_idx[order], part_idx[order]
+            first = np.r_[True, point_idx[1:] != point_idx[:-1]]
+            result[point_idx[first]] = self.codes[part_idx[first]]
+        return result
+
+
+# ***************************************************************
+# Construction des index (une tâche par département)
+# ***************************************************************
+
+def index_frame(gdf, column):
+    """
+    Parties polygonales valides de la couche, rangées selon la courbe de
+    Hilbert : colonnes `classe`, `ordre` (rang du polygone source) et
+    `geometry` (WKB).
+    """
+    parts, ordre = polygon_parts(gdf)
+    return pd.DataFrame({
+        "classe": gdf[column].to_numpy()[ordre],
+        "ordre": ordre.astype(np.int32),
+        "geometry": shapely.to_wkb(parts),
+    })
+
+
+def build_index(fs, layer, dept, base_path=BASE_PATH):
+    """
+    Écrit l'index d'une couche d'un département, étiqueté par la version de la
+    couche. Renvoie l'emprise de la couche, ou None si elle est absente.
+    """
+    column, _ = LAYER_LEGENDS[layer]
+    try:
+        gdf = read_dataset(fs, layer, dept, columns=(column,), base_path=base_path)
+    except FileNotFoundError:
+        return None
+    gdf = gdf.to_crs(CRS) if gdf.crs else gdf
+    version = dataset_version(fs, layer, dept, base_path=base_path)
+    table = pa.Table.from_pandas(index_frame(gdf, column), preserve_index=False)
+    table = table.replace_schema_metadata({SOURCE_VERSION_KEY: index_tag(version).encode()})
+    with fs.open(lookup_path(layer_path(layer, dept, base_path)), "wb") as f:
+        pq.write_table(table, f, compression="zstd")
+    return [float(v) for v in gdf.total_bounds]
+
+
+def read_index(fs, layer, dept, base_path=BASE_PATH):
+    """
+    Index d'une couche d'un département : fichier pré-calculé s'il correspond à
+    la version courante de la couche, construit en mémoire sinon. None si la
+    couche est absente du stockage.
+    """
+    path = lookup_path(layer_path(layer, dept, base_path))
+    if fs.exists(path):
+        with fs.open(path, "rb") as f:
+            parquet = pq.ParquetFile(f)
+            stored = (parquet.schema_arrow.metadata or {}).get(SOURCE_VERSION_KEY, b"").decode()
+            if stored == index_tag(dataset_version(fs, layer, dept, base_path=base_path)):
+                return LayerIndex.from_frame(parquet.read().to_pandas(), layer)
+    column, _ = LAYER_LEGENDS[layer]
+    try:
+        gdf = read_dataset(fs, layer, dept, columns=(column,), base_path=base_path)
+    except FileNotFoundError:
+        return None
+    return LayerIndex.from_frame(index_frame(gdf.to_crs(CRS) if gdf.crs else gdf, column), layer)
+
+
+def read_lookup_manifest(fs, base_path=BASE_PATH):
+    """
+    Emprises des départements indexés `{couche: {dept: [xmin, ymin, xmax, ymax]}}`.
+    """
+    path = data_path(MANIFEST, base_path)
+    if not fs.exists(path):
+        return {layer: {} for layer in LAYERS}
+    with fs.open(path, "r") as f:
+        return json.load(f)
+
+
+def write_lookup_manifest(fs, manifest, base_path=BASE_PATH):
+    with fs.open(data_path(MANIFEST, base_path), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+# ***************************************************************
+# Recherche
+# ***************************************************************
+
+@lru_cache(maxsize=8)
+def _transformer(crs):
+    return Transformer.from_crs(crs, CRS, always_xy=True)
+
+
+def to_lambert93(x, y, crs=CRS):
+    """
+    Coordonnées en Lambert-93 (projection de tout le tableau en un appel).
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if crs == CRS:
+        return x, y
+    return _transformer(crs).transform(x, y)
+
+
+class HazardLookup:
+    """
+    Recherche des classes d'aléa d'un lot de points. Les index départementaux
+    sont lus à la première demande et gardés en mémoire (`cache_size` au plus) ;
+    l'index des emprises départementales est lu une fois par instance. Avec
+    `mapped_dir`, les fichiers projetés à jour (sykinet.mapped) remplacent les
+    index, sans lecture ni construction.
+    """
+
+    def __init__(self, fs, base_path=BASE_PATH, cache_size=32, mapped_dir=None):
+        self.fs, self.base_path, self.mapped_dir = fs, base_path, mapped_dir
+        self.index = lru_cache(maxsize=cache_size)(self._read_index)
+        self._routing = None
+
+    def _read_index(self, layer, dept):
+        if self.mapped_dir is not None:
+            try:
+                version = dataset_version(self.fs, layer, dept, base_path=self.base_path)
+            except FileNotFoundError:
+                return None
+            mapped = open_mapped(mapped_path(layer, dept, self.mapped_dir), version)
+            if mapped is not None:
+                return mapped
+        return read_index(self.fs, layer, dept, self.base_path)
+
+    def routing(self, layer):
+        """
+        STRtree des emprises des départements indexés et codes associés.
+        """
+        if self._routing is None:
+            manifest = read_lookup_manifest(self.fs, self.base_path)
+            self._routing = {}
+            for name in LAYERS:
+                depts = sorted(manifest.get(name, {}))
+                boxes = shapely.box(*np.array([manifest[name][d] for d in depts]).reshape(-1, 4).T)
+                self._routing[name] = shapely.STRtree(boxes), np.array(depts, dtype=object)
+        return self._routing[layer]
+
+    def _groups(self, layer, points, depts):
+        """
+        Itère sur (département, positions des points à y chercher).
+        """
+        if depts is not None:
+            codes, uniques = pd.factorize(pd.Series(depts, dtype=object).astype(str))
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            for i, dept in enumerate(uniques):
+                yield dept, order[bounds[i]:bounds[i + 1]]
+            return
+        tree, names = self.routing(layer)
+        if len(names) == 0:
+            raise FileNotFoundError(
+                f"{MANIFEST} : aucun département indexé, lancer `python -m sykinet.lookup build` "
+                "ou fournir les départements des points")
+        point_idx, dept_idx = tree.query(points)
+        order = np.lexsort((point_idx, dept_idx))
+        point_idx, dept_idx = point_idx[order], dept_idx[order]
+        bounds = np.searchsorted(dept_idx, np.arange(len(names) + 1))
+        for i, dept in enumerate(names):
+            if bounds[i + 1] > bounds[i]:
+                yield dept, point_idx[bounds[i]:bounds[i + 1]]
+
+    def classify(self, layer, points, depts=None):
+        """
+        Codes de légende de `layer` pour un tableau de points Lambert-93
+        (-1 hors de tout polygone ou de tout département indexé).
+        """
+        codes = np.full(len(points), -1, dtype=np.int8)
+        for dept, positions in self._groups(layer, points, depts):
+            index = self.index(layer, dept)
+            if index is None:
+                continue
+            if depts is None:
+                # Points déjà classés dans un département dont l'emprise chevauche celle-ci
+                positions = positions[codes[positions] < 0]
+            codes[positions] = index.locate(points[positions])
+        return codes
+
+    def lookup(self, x, y, crs=CRS, depts=None):
+        """
+        Classes d'aléa de chaque point : DataFrame à une colonne catégorielle
+        par couche (`gridcode`, `ALEA`), dans l'ordre des points. `depts`
+        (code département de chaque point) évite la répartition par emprise.
+        """
+        points = shapely.points(*to_lambert93(x, y, crs))
+        result = {}
+        for layer, (column, legend) in LAYER_LEGENDS.items():
+            result[column] = pd.Categorical.from_codes(self.classify(layer, points, depts), list(legend))
+        return pd.DataFrame(result)
+
+    def point(self, x, y, crs=CRS, dept=None):
+        """
+        Classes d'aléa d'un seul point : `{colonne: classe ou None}`.
+        """
+        point = shapely.points(*to_lambert93([x], [y], crs))
+        depts = None if dept is None else [dept]
+        return {
+            column: (list(legend)[code] if code >= 0 else None)
+            for layer, (column, legend) in LAYER_LEGENDS.items()
+            for code in self.classify(layer, point, depts)
+        }
+
+
+# ***************************************************************
+# Ligne de commande
+# ***************************************************************
+
+def _build_task(base_url, dept, layers):
+    fs, base_path = filesystem_from_url(base_url)
+    return {layer: build_index(fs, layer, dept, base_path) for layer in layers}
+
+
+def build(base_url=BASE_URL, depts=DEPARTEMENTS, layers=LAYERS, workers=None):
+    """
+    Construit en parallèle les index des départements et met à jour le
+    manifeste. Renvoie `(emprises par département, en_échec)`.
+    """
+    fs, base_path = filesystem_from_url(base_url)
+    manifest = read_lookup_manifest(fs, base_path)
+    done, failed = {}, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_build_task, base_url, dept, layers): dept for dept in depts}
+        for future in as_completed(futures):
+            dept = futures[future]
+            try:
+                done[dept] = future.result()
+            except Exception as exc:
+                print(f"{dept} : échec ({exc!r})", file=sys.stderr)
+                failed.append(dept)
+    for dept, bounds in done.items():
+        for layer, layer_bounds in bounds.items():
+            if layer_bounds is None:
+                manifest.setdefault(layer, {}).pop(dept, None)
+            else:
+                manifest.setdefault(layer, {})[dept] = layer_bounds
+    write_lookup_manifest(fs, manifest, base_path)
+    return done, failed
+
+
+def query(args):
+    with fsspec.open(args.points, "rb", compression="infer") as f:
+        points = pd.read_csv(f, dtype={args.dept_column: str} if args.dept_column else None)
+    fs, base_path = filesystem_from_url(args.base_url)
+    lookup = HazardLookup(fs, base_path, mapped_dir=args.mapped_dir)
+
+    start = time.perf_counter()
+    depts = points[args.dept_column].to_numpy() if args.dept_column else None
+    classes = lookup.lookup(points[args.x].to_numpy(), points[args.y].to_numpy(), args.crs, depts)
+    elapsed = time.perf_counter() - start
+
+    result = pd.concat([points, classes], axis=1)
+    if args.out:
+        with fsspec.open(args.out, "w", compression="infer") as f:
+            result.to_csv(f, index=False)
+    else:
+        result.to_csv(sys.stdout, index=False)
+    print(f"{len(points)} points en {elapsed:.2f} s ({len(points) / max(elapsed, 1e-9):,.0f} points/s)",
+          file=sys.stderr)
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser = argparse.ArgumentParser(description="Recherche ponctuelle des classes d'aléa.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", parents=[common], help="Construit les index départementaux.")
+    build_parser.add_argument("--dept", action="append", help="Département(s) à traiter (défaut : tous).")
+    build_parser.add_argument("--layer", action="append", choices=LAYERS, help="Couche(s) (défaut : toutes).")
+    build_parser.add_argument("--workers", type=int, default=os.cpu_count())
+
+    query_parser = commands.add_parser("query", parents=[common], help="Classe les points d'un CSV.")
+    query_parser.add_argument("points", help="CSV des points (local ou URL fsspec).")
+    query_parser.add_argument("--x", default="x", help="Colonne des abscisses (ou longitudes).")
+    query_parser.add_argument("--y", default="y", help="Colonne des ordonnées (ou latitudes).")
+    query_parser.add_argument("--crs", default=CRS, help="Système de coordonnées des points (EPSG:2154, EPSG:4326...).")
+    query_parser.add_argument("--dept-column", default=None,
+                              help="Colonne du code département (répartition par emprise sinon).")
+    query_parser.add_argument("--out", default=None, help="CSV de sortie (sortie standard par défaut).")
+    query_parser.add_argument("--mapped-dir", default=None,
+                              help="Dossier des fichiers projetés (python -m sykinet.mapped) à utiliser s'ils sont à jour.")
+    args = parser.parse_args(argv)
+
+    if args.command == "query":
+        query(args)
+        return
+    done, failed = build(args.base_url, args.dept or DEPARTEMENTS, args.layer or LAYERS, args.workers)
+    for dept in sorted(done):
+        layers = [layer for layer, bounds in done[dept].items() if bounds is not None]
+        print(f"{dept} : {', '.join(layers) or 'aucune couche'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+Couches d'aléa départementales projetées en mémoire (`mmap`).
+
+Chaque serveur Streamlit construisait et gardait sa propre copie des
+géométries départementales. Ici, chaque (couche, département) est écrit une
+fois hors ligne dans un fichier binaire local :
+
+* coordonnées des sommets (float64, Lambert-93) et offsets des anneaux et des
+  parties de polygones (disposition de `shapely.to_ragged_array`) ;
+* code de légende et rang dans la couche d'origine de chaque partie ;
+* R-tree compacté : emprises des parties (rangées selon la courbe de Hilbert,
+  comme les index de sykinet.lookup) puis, niveau par niveau, emprises de
+  `NODE_SIZE` nœuds consécutifs.
+
+Le fichier est ouvert par `np.memmap` : l'ouverture ne lit que l'en-tête, rien
+n'est décodé ni construit, et toutes les sessions et tous les processus d'une
+machine partagent les mêmes pages du cache du système. Les cartes de la page 2
+sont rastérisées et les requêtes (points, emprises) résolues directement sur
+ces tableaux.
+
+    python -m sykinet.mapped --out .cache/mapped --workers 8
+    python -m sykinet.mapped --dept 33 --layer inondation --force
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+import streamlit as st
+
+from sykinet.data import dataset_version, load_dataset_version, read_dataset
+from sykinet.departements import DEPARTEMENTS
+from sykinet.geoparquet import CRS
+from sykinet.legends import LAYER_LEGENDS
+from sykinet.raster import NODATA, rasterize_rings
+from sykinet.storage import BASE_PATH, BASE_URL, filesystem_from_url
+
+# À incrémenter à chaque modification du format : invalide les fichiers écrits
+MAPPED_VERSION = 1
+MAGIC = b"SYKMAP\x00\x01"
+# Alignement (octets) des tableaux dans le fichier
+ALIGN = 64
+# Nœuds par niveau du R-tree : 8 minimise le nombre de couples (point, nœud)
+# examinés sur les couches départementales (mesuré entre 4 et 16)
+NODE_SIZE = 8
+
+MAPPED_DIR = os.environ.get("SYKINET_MAPPED_DIR", ".cache/mapped")
+LAYERS = tuple(LAYER_LEGENDS)
+
+
+def mapped_path(layer, dept, directory=MAPPED_DIR):
+    return os.path.join(directory, layer, f"{dept}.sykmap")
+
+
+def _align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _ragged_arange(counts):
+    # 0..n-1 pour chaque longueur de `counts`, concaténés
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def polygon_parts(gdf):
+    """
+    Parties polygonales valides d'une couche, rangées selon la courbe de
+    Hilbert, et rang dans la couche du polygone source de chaque partie.
+    """
+    geoms = shapely.make_valid(np.asarray(gdf.geometry.array))
+    # Deux niveaux : make_valid peut produire des collections de multipolygones
+    parts, ordre = shapely.get_parts(geoms, return_index=True)
+    parts, sub = shapely.get_parts(parts, return_index=True)
+    ordre = ordre[sub]
+    polygonal = (shapely.get_type_id(parts) == 3) & ~shapely.is_empty(parts)
+    parts, ordre = parts[polygonal], ordre[polygonal]
+
+    if not len(parts):
+        return parts, ordre.astype(np.int64)
+    order = np.argsort(gpd.GeoSeries(parts).hilbert_distance().to_numpy(), kind="stable")
+    return parts[order], ordre[order]
+
+
+def pack_rtree(bounds, node_size=NODE_SIZE):
+    """
+    R-tree compacté d'emprises déjà rangées : les feuilles sont `bounds`, chaque
+    niveau supérieur réunit `node_size` nœuds consécutifs du niveau inférieur.
+    Renvoie les emprises de tous les niveaux (feuilles d'abord), une ligne par
+    coordonnée (xmin, ymin, xmax, ymax), et les offsets des niveaux.
+    """
+    levels = [np.asarray(bounds, dtype=np.float64).reshape(-1, 4)]
+    while len(levels[-1]) > node_size:
+        below = levels[-1]
+        starts = np.arange(0, len(below), node_size)
+        levels.append(np.column_stack([
+            np.minimum.reduceat(below[:, 0], starts), np.minimum.reduceat(below[:, 1], starts),
+            np.maximum.reduceat(below[:, 2], starts), np.maximum.reduceat(below[:, 3], starts),
+        ]))
+    offsets = np.cumsum([0] + [len(level) for level in levels]).astype(np.int64)
+    return np.ascontiguousarray(np.concatenate(levels).T), offsets
+
+
+# ***************************************************************
+# Format du fichier : en-tête JSON puis tableaux alignés
+# ***************************************************************
+
+def write_mapped(path, arrays, meta):
+    """
+    Écrit `MAGIC`, la longueur de l'en-tête, l'en-tête JSON (`meta` et la
+    description des tableaux) puis chaque tableau aligné sur `ALIGN` octets.
+    Le fichier est remplacé de façon atomique : les processus qui projettent
+    l'ancienne version la gardent jusqu'à leur prochaine ouverture.
+    """
+    specs, offset = {}, 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        specs[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+    header = json.dumps({**meta, "format": MAPPED_VERSION, "arrays": specs}).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, array in arrays.items():
+            f.write(b"\0" * (data_start + specs[name]["offset"] - f.tell()))
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+class MappedLayer:
+    """
+    Couche d'un département projetée en mémoire : tableaux en lecture seule
+    adossés au fichier, sans copie.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} : fichier de couche projetée invalide")
+        (length,) = struct.unpack("<Q", bytes(buffer[len(MAGIC):len(MAGIC) + 8]))
+        self.header = json.loads(bytes(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + length]))
+        data_start = _align(len(MAGIC) + 8 + length)
+        for name, spec in self.header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            start = data_start + spec["offset"]
+            size = int(np.prod(spec["shape"])) * dtype.itemsize
+            # Vue ndarray simple (l'indexation d'un np.memmap passe par Python)
+            setattr(self, name, np.asarray(buffer[start:start + size]).view(dtype).reshape(spec["shape"]))
+        self.layer, self.dept = self.header["layer"], self.header["dept"]
+        self.bounds = tuple(self.header["bounds"])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def search(self, xmin, ymin, xmax, ymax):
+        """
+        Parcours du R-tree pour un lot d'emprises (tableaux de même longueur) :
+        couples (requête, partie) dont les emprises se recoupent. Pour des
+        points, passer les mêmes tableaux en `xmin`/`xmax` et `ymin`/`ymax`.
+        """
+        points = xmin is xmax and ymin is ymax
+        xmin, ymin, xmax, ymax = (np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (xmin, ymin, xmax, ymax))
+        levels, node_size = self.levels, self.header["node_size"]
+        node_xmin, node_ymin, node_xmax, node_ymax = self.tree
+        top = len(levels) - 2
+        n_top = levels[top + 1] - levels[top]
+        queries = np.repeat(np.arange(len(xmin)), n_top)
+        nodes = np.tile(np.arange(n_top), len(xmin))
+        for level in range(top, -1, -1):
+            index = levels[level] + nodes
+            qx0, qy0 = xmin[queries], ymin[queries]
+            qx1, qy1 = (qx0, qy0) if points else (xmax[queries], ymax[queries])
+            hit = (node_xmin[index] <= qx1) & (node_xmax[index] >= qx0) \
+                & (node_ymin[index] <= qy1) & (node_ymax[index] >= qy0)
+            queries, nodes = queries[hit], nodes[hit]
+            if level == 0:
+                break
+            # Enfants de chaque nœud retenu au niveau inférieur
+            first = nodes * node_size
+            counts = np.minimum(node_size, levels[level] - levels[level - 1] - first)
+            queries = np.repeat(queries, counts)
+            nodes = np.repeat(first, counts) + _ragged_arange(counts)
+        return queries, nodes
+
+    def query_bbox(self, bbox):
+        """
+        Parties dont l'emprise recoupe `bbox` (xmin, ymin, xmax, ymax), dans l'ordre du fichier.
+        """
+        _, parts = self.search(*([v] for v in bbox))
+        return np.sort(parts)
+
+    def contains(self, parts, x, y, max_edges=1 << 22):
+        """
+        Pour chaque couple (partie, point), le point est-il dans la partie ?
+        Règle pair-impair sur les arêtes de la partie, par lots d'au plus
+        `max_edges` arêtes. Un point exactement sur un contour peut être
+        classé d'un côté ou de l'autre.
+        """
+        ring_offsets, coords = self.ring_offsets, self.coords
+        first = ring_offsets[self.part_offsets[parts]]
+        n_edges = ring_offsets[self.part_offsets[parts + 1]] - first - 1
+        inside = np.zeros(len(parts), dtype=bool)
+        total = np.cumsum(n_edges)
+        start = 0
+        while start < len(parts):
+            done = total[start - 1] if start else 0
+            end = max(int(np.searchsorted(total, done + max_edges, side="right")), start + 1)
+            counts = n_edges[start:end]
+            pair = np.repeat(np.arange(end - start), counts)
+            i = np.repeat(first[start:end], counts) + _ragged_arange(counts)
+            # Pas d'arête entre le dernier sommet d'un anneau et le premier du suivant
+            ring = np.searchsorted(ring_offsets, i + 1, side="right") - 1
+            real = ring_offsets[ring] != i + 1
+            pair, i = pair[real], i[real]
+            x0, y0 = coords[i, 0], coords[i, 1]
+            x1, y1 = coords[i + 1, 0], coords[i + 1, 1]
+            px, py = x[start:end][pair], y[start:end][pair]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cross = ((y0 > py) != (y1 > py)) & (px < x0 + (py - y0) * (x1 - x0) / (y1 - y0))
+            inside[start:end] = np.bincount(pair[cross], minlength=end - start) % 2 == 1
+            start = end
+        return inside
+
+    def locate_xy(self, x, y):
+        """
+        Code de légende de chaque point Lambert-93 (-1 hors de tout polygone) :
+        en cas de recouvrement, le premier polygone dans l'ordre de la couche.
+        """
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        result = np.full(len(x), -1, dtype=np.int8)
+        point_idx, parts = self.search(x, y, x, y)
+        keep = self.contains(parts, x[point_idx], y[point_idx])
+        point_idx, parts = point_idx[keep], parts[keep]
+        if point_idx.size:
+            order = np.lexsort((self.ordre[parts], point_idx))
+            point_idx, parts = point_idx[order], parts[order]
+            first = np.r_[True, point_idx[1:] != point_idx[:-1]]
+            result[point_idx[first]] = self.codes[parts[first]]
+        return result
+
+    def locate(self, points):
+        """
+        Même interface que `sykinet.lookup.LayerIndex.locate` (points shapely).
+        """
+        coords = shapely.get_coordinates(points)
+        return self.locate_xy(coords[:, 0], coords[:, 1])
+
+    def geometries(self, parts):
+        """
+        Polygones shapely des parties demandées (construits à la demande).
+        """
+        parts = np.asarray(parts, dtype=np.int64)
+        rings = [np.arange(self.part_offsets[p], self.part_offsets[p + 1]) for p in parts]
+        ring_ids = np.concatenate(rings) if rings else np.empty(0, dtype=np.int64)
+        ring_counts = np.array([len(r) for r in rings], dtype=np.int64)
+        coord_counts = self.ring_offsets[ring_ids + 1] - self.ring_offsets[ring_ids]
+        coord_ids = np.repeat(self.ring_offsets[ring_ids], coord_counts) + _ragged_arange(coord_counts)
+        offsets = (np.r_[0, np.cumsum(coord_counts)], np.r_[0, np.cumsum(ring_counts)])
+        return shapely.from_ragged_array(shapely.GeometryType.POLYGON, np.asarray(self.coords[coord_ids]), offsets)
+
+    def rasterize(self, width_px):
+        """
+        Grille des rangs de la légende (`len(legend)` hors légende), comme
+        `sykinet.raster.rasterize_layer` : un pixel couvert par plusieurs
+        polygones reçoit la classe du dernier dans l'ordre de la couche.
+        """
+        _, legend = LAYER_LEGENDS[self.layer]
+        ranks = np.where(self.codes < 0, len(legend), self.codes).astype(np.int8)
+        poly_codes = np.full(int(self.ordre.max()) + 1 if len(self) else 0, NODATA, dtype=np.int8)
+        poly_codes[self.ordre] = ranks
+        ring_part = np.repeat(np.arange(len(self)), np.diff(self.part_offsets))
+        coord_ring = np.repeat(np.arange(len(ring_part)), np.diff(self.ring_offsets))
+        return rasterize_rings(self.coords, coord_ring, self.ordre[ring_part], poly_codes, self.bounds, width_px)
+
+
+def open_mapped(path, version=None):
+    """
+    Couche projetée de `path`, ou None si le fichier est absent, d'un autre
+    format ou construit pour une autre version de la couche que `version`.
+    """
+    if not os.path.exists(path):
+        return None
+    layer = MappedLayer(path)
+    if layer.header["format"] != MAPPED_VERSION or (version is not None and layer.header["source"] != version):
+        return None
+    return layer
+
+
+@st.cache_resource(max_entries=512, show_spinner=False)
+def _shared_layer(path, version, mtime):
+    return open_mapped(path, version)
+
+
+def mapped_layer(layer, dept, directory=MAPPED_DIR):
+    """
+    Couche projetée partagée par les sessions du serveur, ou None si le fichier
+    n'a pas été construit pour la version courante de la couche.
+    """
+    path = mapped_path(layer, dept, directory)
+    try:
+        mtime = os.path.getmtime(path)
+        version = load_dataset_version(layer, dept)
+    except FileNotFoundError:
+        return None
+    return _shared_layer(path, version, mtime)
+
+
+# ***************************************************************
+# Construction (une tâche par couche et par département)
+# ***************************************************************
+
+def build_mapped(fs, layer, dept, base_path=BASE_PATH, directory=MAPPED_DIR, force=False):
+    """
+    Écrit le fichier projeté d'une couche d'un département. Renvoie son chemin,
+    ou None si la couche est absente ; un fichier à jour n'est pas réécrit
+    (sauf `force`).
+    """
+    column, legend = LAYER_LEGENDS[layer]
+    path = mapped_path(layer, dept, directory)
+    try:
+        version = dataset_version(fs, layer, dept, base_path=base_path)
+    except FileNotFoundError:
+        return None
+    if not force and open_mapped(path, version) is not None:
+        return path
+    gdf = read_dataset(fs, layer, dept, columns=(column,), base_path=base_path)
+    gdf = gdf.to_crs(CRS) if gdf.crs else gdf
+
+    parts, ordre = polygon_parts(gdf)
+    lookup = {value: code for code, value in enumerate(legend)}
+    codes = pd.Series(gdf[column].to_numpy()[ordre], dtype=object).map(lookup).fillna(-1).to_numpy(dtype=np.int8)
+    if len(parts):
+        _, coords, (ring_offsets, part_offsets) = shapely.to_ragged_array(parts, include_z=False)
+    else:
+        coords, ring_offsets, part_offsets = np.empty((0, 2)), np.zeros(1, np.int64), np.zeros(1, np.int64)
+    tree, levels = pack_rtree(shapely.bounds(parts))
+    arrays = {
+        "coords": coords.astype(np.float64),
+        "ring_offsets": ring_offsets.astype(np.int64),
+        "part_offsets": part_offsets.astype(np.int64),
+        "codes": codes,
+        "ordre": ordre.astype(np.int32),
+        "tree": tree,
+        "levels": levels,
+    }
+    meta = {"layer": layer, "dept": dept, "crs": CRS, "source": version, "node_size": NODE_SIZE,
+            "bounds": [float(v) for v in gdf.total_bounds]}
+    return write_mapped(path, arrays, meta)
+
+
+def _build_task(args):
+    base_url, layer, dept, directory, force = args
+    fs, base_path = filesystem_from_url(base_url)
+    return layer, dept, build_mapped(fs, layer, dept, base_path, directory, force)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fichiers projetés en mémoire des couches d'aléa.")
+    parser.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--out", default=MAPPED_DIR, help=f"Dossier local des fichiers (défaut : {MAPPED_DIR}).")
+    parser.add_argument("--dept", action="append", help="Département(s) à traiter (défaut : tous).")
+    parser.add_argument("--layer", action="append", choices=LAYERS, help="Couche(s) (défaut : toutes).")
+    parser.add_argument("--force", action="store_true", help="Réécrit même les fichiers à jour.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    tasks = [(args.base_url, layer, dept, args.out, args.force)
+             for dept in (args.dept or DEPARTEMENTS) for layer in (args.layer or LAYERS)]
+    written = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for layer, dept, path in pool.map(_build_task, tasks):
+            if path is None:
+                continue
+            written += 1
+            print(f"{layer} {dept} : {os.path.getsize(path) / 1e6:.1f} Mo")
+    if not written:
+        print("aucune couche trouvée", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
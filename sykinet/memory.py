@@ -0,0 +1,153 @@
+"""
+Rapport d'occupation mémoire des couches d'aléa, par département.
+
+Compare, pour chaque couche :
+
+* avant : la couche complète telle que les pages la chargeaient (toutes les
+  colonnes source, types inférés, un objet géométrique par polygone) ;
+* après : la forme compacte gardée dans le cache des pages (sykinet.compact).
+
+Pour chaque forme : octets des colonnes, octets de la géométrie (WKB pour les
+objets géométriques, taille réelle du tampon sinon), taille sérialisée (ce que
+`st.cache_data` garde et recopie à chaque accès) et temps de restitution d'une
+copie. Le total indique la mémoire nécessaire pour garder tous les
+départements à la fois.
+
+    python -m sykinet.memory --dept 33 --dept 34
+    python -m sykinet.memory --transactions
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from sykinet.compact import compact
+from sykinet.data import read_dataset
+from sykinet.departements import DEPARTEMENTS
+from sykinet.features import FEATURE_SPECS
+from sykinet.geoparquet import read_hazard_layer
+from sykinet.legends import LAYER_LEGENDS
+from sykinet.schemas import get_schema
+from sykinet.storage import BASE_URL, data_path, filesystem_from_url
+
+MB = 1024 ** 2
+
+
+def frame_bytes(df):
+    """
+    Octets des colonnes et de la géométrie (WKB) d'une (Geo)DataFrame.
+    """
+    columns = int(df.drop(columns="geometry", errors="ignore").memory_usage(deep=True).sum())
+    geometry = 0
+    if "geometry" in df.columns:
+        geometry = sum(len(wkb) for wkb in shapely.to_wkb(np.asarray(df.geometry.array)) if wkb)
+    return columns, geometry
+
+
+def serialized(obj, restore=lambda loaded: loaded, repeat=3):
+    """
+    Taille sérialisée d'un objet et meilleur temps de désérialisation puis
+    restitution sur `repeat` essais.
+    """
+    payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        restore(pickle.loads(payload))
+        timings.append(time.perf_counter() - start)
+    return len(payload), min(timings)
+
+
+def measure(before, after, declared):
+    """
+    Mesures avant / après d'une base : une ligne par forme.
+    """
+    compacted = compact(after, declared)
+    columns = int(compacted.attributes.memory_usage(deep=True).sum())
+    before_size, before_time = serialized(before)
+    after_size, after_time = serialized(compacted, lambda loaded: loaded.to_frame())
+    return {
+        "avant": (*frame_bytes(before), before_size, before_time),
+        "après": (columns, compacted.nbytes - columns, after_size, after_time),
+    }
+
+
+def department_report(base_url, dept):
+    """
+    Mesures des couches d'aléa d'un département : `{couche: mesures}`.
+    """
+    fs, base_path = filesystem_from_url(base_url)
+    result = {}
+    for layer, (column, _) in LAYER_LEGENDS.items():
+        schema = get_schema(layer)
+        path = data_path(schema.filename_for(dept), base_path)
+        try:
+            before = read_hazard_layer(fs, path)
+        except FileNotFoundError:
+            continue
+        after = read_dataset(fs, layer, dept, columns=(column,), base_path=base_path)
+        result[layer] = measure(before, after, schema.dtypes())
+    return result
+
+
+def transactions_report(base_url):
+    """
+    Mesures des bases de transactions de la page 4 : `{base: mesures}`.
+    """
+    fs, base_path = filesystem_from_url(base_url)
+    result = {}
+    for name, spec in FEATURE_SPECS.items():
+        with fs.open(data_path(get_schema(name).filename, base_path), "rb") as f:
+            before = pd.read_csv(f)
+        after = read_dataset(fs, name, columns=spec.source_columns, base_path=base_path)
+        result[name] = measure(before, after, get_schema(name).dtypes())
+    return result
+
+
+def format_rows(label, measures):
+    lines = []
+    for form, (columns, geometry, size, seconds) in measures.items():
+        lines.append(f"{label:<28} {form:<6} {columns / MB:9.1f} {geometry / MB:9.1f} "
+                     f"{size / MB:9.1f} {seconds * 1000:9.1f}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Occupation mémoire des couches avant / après compaction.")
+    parser.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--dept", action="append", help="Département(s) à mesurer (défaut : tous).")
+    parser.add_argument("--transactions", action="store_true", help="Mesure les bases de transactions (page 4).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    print(f"{'base':<28} {'forme':<6} {'colonnes':>9} {'géométrie':>9} {'cache':>9} {'copie ms':>9}  (Mo)")
+    totals = {"avant": np.zeros(4), "après": np.zeros(4)}
+    if args.transactions:
+        reports = transactions_report(args.base_url).items()
+    else:
+        depts = args.dept or DEPARTEMENTS
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = pool.map(department_report, [args.base_url] * len(depts), depts)
+            reports = [(f"{layer} {dept}", measures)
+                       for dept, layers in zip(depts, results) for layer, measures in layers.items()]
+    for label, measures in reports:
+        print("\n".join(format_rows(label, measures)))
+        for form, values in measures.items():
+            totals[form] += values
+    if not np.any(totals["avant"]):
+        print("aucune base mesurée", file=sys.stderr)
+        sys.exit(1)
+    print("\n".join(format_rows("TOTAL", {form: tuple(values) for form, values in totals.items()})))
+    ratio = totals["après"][2] / totals["avant"][2]
+    print(f"cache : {totals['après'][2] / MB:.1f} Mo au lieu de {totals['avant'][2] / MB:.1f} Mo ({ratio:.0%})")
+
+
+if __name__ == "__main__":
+    main()
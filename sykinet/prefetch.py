@@ -0,0 +1,107 @@
+"""
+Chargement concurrent et préchargement en arrière-plan des bases.
+
+Les fonctions de chargement mises en cache (`st.cache_data`) sont lancées
+dans un pool de threads partagé : les téléchargements et décodages
+indépendants se recouvrent au lieu de s'additionner. Le script appelle
+ensuite ces mêmes fonctions normalement : Streamlit fait attendre l'appel sur
+le calcul déjà en cours (verrou par clé de cache) puis sert le résultat.
+
+Les préchargements sont spéculatifs : leurs erreurs sont ignorées, l'appel
+normal du script les reproduira et les signalera.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import streamlit as st
+
+from sykinet.departements import DEPARTEMENTS
+
+MAX_WORKERS = int(os.environ.get("SYKINET_PREFETCH_WORKERS", 4))
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """
+    Pool de threads exécutant des chargements en arrière-plan ; un appel déjà
+    en cours (même fonction, mêmes arguments) n'est pas relancé.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sykinet-prefetch")
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def submit(self, call):
+        """
+        Lance `call()` (fonction sans argument, typiquement un `functools.partial`)
+        et renvoie son `Future`.
+        """
+        key = _call_key(call)
+        with self._lock:
+            if key in self._in_flight:
+                return self._in_flight[key]
+            future = self._executor.submit(_quiet, call)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+
+def _call_key(call):
+    if isinstance(call, partial):
+        return (call.func, call.args, tuple(sorted(call.keywords.items())))
+    return call
+
+
+def _quiet(call):
+    try:
+        return call()
+    except Exception:
+        logger.debug("Préchargement en échec : %r", call, exc_info=True)
+        return None
+
+
+@st.cache_resource
+def get_prefetcher():
+    """
+    Pool de préchargement partagé par toutes les sessions du serveur.
+    """
+    return Prefetcher()
+
+
+def prefetch(*calls):
+    """
+    Lance les chargements `calls` en parallèle, sans attendre leur fin.
+    """
+    prefetcher = get_prefetcher()
+    return [prefetcher.submit(call) for call in calls]
+
+
+def warm_department(load, dept_code, layers, **kwargs):
+    """
+    Préchargement spéculatif d'un département : `load(couche, dept_code,
+    columns=colonnes, **kwargs)` pour chaque paire (couche, colonnes) de
+    `layers`. `load` est une fonction de module et `layers` un tuple : l'appel
+    garde la même clé d'une exécution du script à l'autre, et un préchargement
+    encore en cours n'est pas relancé.
+    """
+    for layer, columns in layers:
+        load(layer, dept_code, columns=columns, **kwargs)
+
+
+def neighbours(dept, distance=1):
+    """
+    Départements voisins de `dept` dans la liste du sélecteur (précédents et suivants).
+    """
+    i = DEPARTEMENTS.index(dept)
+    return [DEPARTEMENTS[j] for j in range(i - distance, i + distance + 1)
+            if j != i and 0 <= j < len(DEPARTEMENTS)]
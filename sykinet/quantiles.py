@@ -0,0 +1,254 @@
+"""
+Esquisses de quantiles fusionnables pour les box plots de la page 4.
+
+Chaque base est résumée hors ligne par une esquisse de son prix au m² pour
+chaque couple (classe d'aléa, département), écrite à côté de la base
+(`<base>_quantiles.parquet`). La page ne relit plus les transactions : elle
+fusionne les esquisses des départements voulus (un, une région ou la France
+entière) et trace les statistiques obtenues avec `Axes.bxp`.
+
+Une esquisse conserve les valeurs triées exactes tant qu'elles sont au plus
+`CAPACITY` ; au-delà, elles sont regroupées en centroïdes pondérés selon la
+fonction d'échelle k1 du t-digest, plus fine aux extrémités (moustaches et
+points extrêmes). Le minimum et le maximum restent exacts.
+
+    python -m sykinet.quantiles --workers 4
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from sykinet.data import dataset_version, load_dataset_version
+from sykinet.features import FEATURE_SPECS, SOURCE_VERSION_KEY, features_path, read_features, source_tag
+from sykinet.spans import annotate, span
+from sykinet.storage import BASE_PATH, BASE_URL, filesystem_from_url, get_filesystem
+
+# Nombre maximal de centroïdes par esquisse
+CAPACITY = 1000
+
+
+@dataclass
+class QuantileSketch:
+    """
+    Centroïdes triés (`values`, `weights`) d'une distribution et ses bornes exactes.
+    """
+    values: np.ndarray
+    weights: np.ndarray
+    min: float = np.nan
+    max: float = np.nan
+
+    @classmethod
+    def from_values(cls, values, capacity=CAPACITY):
+        values = np.sort(np.asarray(values, dtype=float))
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return cls(values, np.ones(0))
+        return cls(values, np.ones(len(values)), values[0], values[-1]).compress(capacity)
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    @property
+    def exact(self):
+        return bool(np.all(self.weights == 1))
+
+    def merge(self, other, capacity=CAPACITY):
+        """
+        Esquisse de la réunion des deux distributions.
+        """
+        values = np.concatenate([self.values, other.values])
+        weights = np.concatenate([self.weights, other.weights])
+        order = np.argsort(values, kind="stable")
+        merged = QuantileSketch(values[order], weights[order],
+                                np.fmin(self.min, other.min), np.fmax(self.max, other.max))
+        return merged.compress(capacity)
+
+    def compress(self, capacity=CAPACITY):
+        if len(self.values) <= capacity:
+            return self
+        cumulative = np.cumsum(self.weights)
+        q = (cumulative - self.weights / 2) / cumulative[-1]
+        # Échelle k1 : paquets de poids faible près de 0 et 1, larges autour de la médiane
+        bucket = np.floor(capacity * (np.arcsin(2 * q - 1) / np.pi + 0.5)).astype(np.int64)
+        bucket = np.minimum(bucket, capacity - 1)
+        weights = np.bincount(bucket, weights=self.weights, minlength=capacity)
+        sums = np.bincount(bucket, weights=self.weights * self.values, minlength=capacity)
+        kept = weights > 0
+        return QuantileSketch(sums[kept] / weights[kept], weights[kept], self.min, self.max)
+
+    def quantile(self, q):
+        """
+        Quantile(s) `q` ; interpolation linéaire identique à `numpy.quantile`
+        tant que l'esquisse est exacte.
+        """
+        if len(self.values) == 0:
+            return np.full(np.shape(q), np.nan)
+        if self.exact:
+            return np.quantile(self.values, q)
+        cumulative = np.cumsum(self.weights)
+        positions = np.r_[0.0, (cumulative - self.weights / 2) / cumulative[-1], 1.0]
+        return np.interp(q, positions, np.r_[self.min, self.values, self.max])
+
+    def box_stats(self, label, whis=1.5):
+        """
+        Statistiques d'un box plot au format de `matplotlib.axes.Axes.bxp`
+        (moustaches à `whis` écarts interquartiles, comme Matplotlib et seaborn).
+        Au-delà de `CAPACITY` valeurs, les points extrêmes tracés sont les
+        centroïdes hors moustaches, pas chaque transaction.
+        """
+        q1, med, q3 = self.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        points = np.r_[self.min, self.values, self.max]
+        inside = points[(points >= q1 - whis * iqr) & (points <= q3 + whis * iqr)]
+        whislo = inside.min() if len(inside) else q1
+        whishi = inside.max() if len(inside) else q3
+        return {
+            "label": label,
+            "med": med,
+            "q1": q1,
+            "q3": q3,
+            "iqr": iqr,
+            "whislo": whislo,
+            "whishi": whishi,
+            "mean": float(np.average(self.values, weights=self.weights)) if len(self.values) else np.nan,
+            "fliers": np.unique(points[(points < whislo) | (points > whishi)]),
+        }
+
+
+def quantiles_path(name, base_path=BASE_PATH):
+    return features_path(name, base_path)[: -len("_features.parquet")] + "_quantiles.parquet"
+
+
+def compute_sketches(features, spec, capacity=CAPACITY):
+    """
+    Esquisses du prix au m² des lignes retenues pour les box plots, par
+    (classe d'aléa, département) : dictionnaire `{(classe, dept): esquisse}`.
+    """
+    df = features.loc[features["masque_boxplot"], [spec.box_column, "code_departement", spec.price]]
+    groups = df.groupby([df[spec.box_column].astype(str), df["code_departement"].astype(str)],
+                        observed=True, sort=True)
+    return {key: QuantileSketch.from_values(prices, capacity) for key, prices in groups[spec.price]}
+
+
+def sketches_to_table(sketches):
+    return pa.table({
+        "classe": [classe for classe, _ in sketches],
+        "code_departement": [dept for _, dept in sketches],
+        "min": [s.min for s in sketches.values()],
+        "max": [s.max for s in sketches.values()],
+        "values": [s.values for s in sketches.values()],
+        "weights": [s.weights for s in sketches.values()],
+    })
+
+
+def sketches_from_table(table):
+    return {
+        (row["classe"], row["code_departement"]): QuantileSketch(
+            np.asarray(row["values"], dtype=float), np.asarray(row["weights"], dtype=float),
+            row["min"], row["max"])
+        for row in table.to_pylist()
+    }
+
+
+def build_sketches(fs, name, base_path=BASE_PATH, capacity=CAPACITY):
+    """
+    Calcule et écrit les esquisses d'une base, étiquetées par sa version.
+    """
+    version = dataset_version(fs, name, base_path=base_path)
+    sketches = compute_sketches(read_features(fs, name, base_path), FEATURE_SPECS[name], capacity)
+    table = sketches_to_table(sketches)
+    table = table.replace_schema_metadata({SOURCE_VERSION_KEY: source_tag(version).encode()})
+    with fs.open(quantiles_path(name, base_path), "wb") as f:
+        pq.write_table(table, f, compression="zstd")
+    return sketches
+
+
+def read_sketches(fs, name, base_path=BASE_PATH):
+    """
+    Esquisses d'une base : fichier pré-calculé s'il correspond à la version
+    courante de la base, calcul à partir des colonnes dérivées sinon.
+    """
+    path = quantiles_path(name, base_path)
+    if fs.exists(path):
+        with fs.open(path, "rb") as f:
+            parquet = pq.ParquetFile(f)
+            stored = (parquet.schema_arrow.metadata or {}).get(SOURCE_VERSION_KEY, b"").decode()
+            if stored == source_tag(dataset_version(fs, name, base_path=base_path)):
+                return sketches_from_table(parquet.read())
+    return compute_sketches(read_features(fs, name, base_path), FEATURE_SPECS[name])
+
+
+@st.cache_data(show_spinner=False)
+def _load_sketches(name, version):
+    annotate(cache="miss")
+    return read_sketches(get_filesystem(), name)
+
+
+def load_sketches(name):
+    """
+    Esquisses d'une base de la page 4, mises en cache par version.
+    """
+    with span(f"esquisses {name}", cached=True):
+        return _load_sketches(name, load_dataset_version(name))
+
+
+def combine(sketches, depts=None, classes=None):
+    """
+    Fusionne les esquisses des départements `depts` et des classes `classes`
+    (toutes par défaut) : une esquisse par classe d'aléa.
+    """
+    depts = None if depts is None else {str(dept) for dept in depts}
+    classes = None if classes is None else {str(classe) for classe in classes}
+    combined = {}
+    for (classe, dept), sketch in sketches.items():
+        if (depts is not None and dept not in depts) or (classes is not None and classe not in classes):
+            continue
+        combined[classe] = combined[classe].merge(sketch) if classe in combined else sketch
+    return combined
+
+
+def box_stats(sketches, order=None, depts=None, classes=None):
+    """
+    Statistiques des box plots par classe d'aléa, dans l'ordre `order` (classes
+    triées par défaut) ; les classes sans transaction ou non retenues sont omises.
+    Renvoie `(positions, statistiques)` pour `Axes.bxp`.
+    """
+    combined = {classe: sketch for classe, sketch in combine(sketches, depts, classes).items() if sketch.count > 0}
+    order = sorted(combined) if order is None else [str(classe) for classe in order]
+    positions = [i for i, classe in enumerate(order) if classe in combined]
+    return positions, [combined[order[i]].box_stats(order[i]) for i in positions]
+
+
+def _build_task(args):
+    base_url, name, capacity = args
+    fs, base_path = filesystem_from_url(base_url)
+    sketches = build_sketches(fs, name, base_path, capacity)
+    return name, len(sketches), quantiles_path(name, base_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Esquisses de quantiles des box plots de la page 4.")
+    parser.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--base", action="append", choices=list(FEATURE_SPECS),
+                        help="Base(s) à traiter (défaut : toutes).")
+    parser.add_argument("--capacity", type=int, default=CAPACITY,
+                        help="Nombre maximal de centroïdes par esquisse.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    tasks = [(args.base_url, name, args.capacity) for name in args.base or FEATURE_SPECS]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for name, n_sketches, path in pool.map(_build_task, tasks):
+            print(f"{name} : {n_sketches} esquisses -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Rastérisation NumPy des couches d'aléa catégorielles.
+
+Les polygones d'une couche sont « brûlés » dans une grille de codes de classe
+(int8) en une seule passe vectorisée (remplissage par lignes de balayage,
+règle pair-impair) : le coût dépend du nombre de pixels et de la longueur des
+contours, et non plus du nombre de polygones. La grille s'affiche ensuite avec un
+unique `imshow` et sert aussi aux statistiques de surface par classe.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import shapely
+
+# Code des pixels hors de tout polygone
+NODATA = -1
+
+
+@dataclass(frozen=True)
+class Raster:
+    """
+    Grille de codes de classe et son géoréférencement : la cellule (0, 0) est
+    le coin haut-gauche de `bounds`, chaque pixel mesure `resolution` mètres.
+    """
+    grid: np.ndarray
+    bounds: tuple
+    resolution: float
+
+    @property
+    def extent(self):
+        # Ordre attendu par `imshow(extent=...)` ; la dernière ligne peut déborder sous `miny`
+        minx, _, _, maxy = self.bounds
+        height, width = self.grid.shape
+        return (minx, minx + width * self.resolution, maxy - height * self.resolution, maxy)
+
+    def class_areas(self, n_classes):
+        """
+        Surface (m²) couverte par chaque code de 0 à `n_classes - 1`.
+        """
+        codes = self.grid[self.grid >= 0]
+        counts = np.bincount(codes.ravel(), minlength=n_classes)[:n_classes]
+        return counts * self.resolution ** 2
+
+
+def grid_shape(bounds, width_px):
+    """
+    Résolution (m/pixel) et forme (lignes, colonnes) d'une grille de `width_px`
+    pixels de large couvrant `bounds`.
+    """
+    if not np.all(np.isfinite(bounds)):
+        # Couche sans polygone (emprise NaN) : grille vide d'une ligne
+        return 1.0, (1, width_px)
+    minx, miny, maxx, maxy = bounds
+    resolution = max(maxx - minx, 1e-9) / width_px
+    height_px = max(int(np.ceil((maxy - miny) / resolution)), 1)
+    return resolution, (height_px, width_px)
+
+
+def rasterize(geoms, codes, bounds, width_px, dtype=np.int8):
+    """
+    Brûle les polygones `geoms` dans une grille, chaque pixel dont le centre
+    est dans un polygone recevant le code correspondant de `codes`.
+    """
+    geoms = np.asarray(geoms)
+    if geoms.size == 0:
+        resolution, shape = grid_shape(bounds, width_px)
+        return Raster(np.full(shape, NODATA, dtype=dtype), tuple(bounds), resolution)
+
+    # Anneaux (extérieurs et trous) de chaque partie de polygone
+    parts, part_geom = shapely.get_parts(geoms, return_index=True)
+    rings, ring_part = shapely.get_rings(parts, return_index=True)
+    coords, coord_ring = shapely.get_coordinates(rings, return_index=True)
+    return rasterize_rings(coords, coord_ring, part_geom[ring_part], codes, bounds, width_px, dtype)
+
+
+def rasterize_rings(coords, coord_ring, ring_poly, codes, bounds, width_px, dtype=np.int8):
+    """
+    Cœur de `rasterize` sur des tableaux de coordonnées : `coord_ring` donne
+    l'anneau de chaque sommet, `ring_poly` le polygone de chaque anneau et
+    `codes` le code de chaque polygone. Un pixel couvert par plusieurs
+    polygones reçoit le code du dernier.
+    """
+    codes = np.asarray(codes)
+    resolution, (height, width) = grid_shape(bounds, width_px)
+    minx, _, _, maxy = bounds
+    grid = np.full((height, width), NODATA, dtype=dtype)
+    if len(coords) == 0:
+        return Raster(grid, tuple(bounds), resolution)
+
+    # 1. Arêtes : sommets consécutifs d'un même anneau, en coordonnées pixel
+    same_ring = coord_ring[1:] == coord_ring[:-1]
+    u = (coords[:, 0] - minx) / resolution - 0.5
+    v = (maxy - coords[:, 1]) / resolution - 0.5
+    u0, v0, u1, v1 = u[:-1][same_ring], v[:-1][same_ring], u[1:][same_ring], v[1:][same_ring]
+    edge_poly = ring_poly[coord_ring[:-1][same_ring]]
+
+    # 2. Lignes de pixels traversées par chaque arête (centres dans ]v_min, v_max])
+    v_min, v_max = np.minimum(v0, v1), np.maximum(v0, v1)
+    row_start = np.clip(np.floor(v_min).astype(np.int64) + 1, 0, height)
+    row_end = np.clip(np.floor(v_max).astype(np.int64) + 1, 0, height)
+    n_rows = np.maximum(row_end - row_start, 0)
+    keep = n_rows > 0
+    if not keep.any():
+        return Raster(grid, tuple(bounds), resolution)
+    u0, v0, u1, v1 = u0[keep], v0[keep], u1[keep], v1[keep]
+    edge_poly, row_start, n_rows = edge_poly[keep], row_start[keep], n_rows[keep]
+
+    # 3. Intersections arête / ligne, toutes arêtes confondues
+    edge_id = np.repeat(np.arange(n_rows.size), n_rows)
+    offsets = np.arange(edge_id.size) - np.repeat(np.cumsum(n_rows) - n_rows, n_rows)
+    rows = row_start[edge_id] + offsets
+    t = (rows - v0[edge_id]) / (v1[edge_id] - v0[edge_id])
+    xs = u0[edge_id] + t * (u1[edge_id] - u0[edge_id])
+    polys = edge_poly[edge_id]
+
+    # 4. Règle pair-impair : intersections triées par (polygone, ligne, x),
+    #    puis appariées deux à deux pour former les segments intérieurs
+    order = np.lexsort((xs, rows, polys))
+    xs, rows, polys = xs[order], rows[order], polys[order]
+    x_start, x_end = xs[0::2], xs[1::2]
+    span_rows, span_polys = rows[0::2], polys[0::2]
+
+    col_start = np.clip(np.ceil(x_start).astype(np.int64), 0, width)
+    col_end = np.clip(np.ceil(x_end).astype(np.int64), 0, width)
+    span_len = np.maximum(col_end - col_start, 0)
+
+    # 5. Remplissage de tous les segments en une affectation
+    span_id = np.repeat(np.arange(span_len.size), span_len)
+    cols = col_start[span_id] + np.arange(span_id.size) - np.repeat(np.cumsum(span_len) - span_len, span_len)
+    grid[span_rows[span_id], cols] = codes[span_polys[span_id]]
+    return Raster(grid, tuple(bounds), resolution)
+
+
+def rasterize_layer(gdf, class_column, classes, width_px=1200):
+    """
+    Rastérise une couche d'aléa : chaque classe de `classes` reçoit son rang
+    (0, 1, ...) ; les polygones d'une autre classe reçoivent `len(classes)`.
+    """
+    codes = pd.Index(list(classes)).get_indexer(gdf[class_column]).astype(np.int8)
+    codes[codes < 0] = len(classes)
+    return rasterize(np.asarray(gdf.geometry.array), codes, tuple(gdf.total_bounds), width_px)
@@ -0,0 +1,55 @@
+"""
+Cache disque des images rendues (cartes et graphiques), avec éviction LRU.
+
+Mettre les données en cache ne suffit pas : le tracé Matplotlib et l'encodage
+PNG dominent le temps de chaque rerun. Les images encodées sont stockées sur le
+disque local sous une clé (page, version des données, département, couche,
+paramètres de style) ; un nouvel affichage ne coûte alors qu'une lecture de
+fichier. La taille totale est bornée (`SYKINET_RENDER_CACHE_BYTES`) et les
+images les moins récemment utilisées sont supprimées en premier.
+"""
+
+import os
+
+import streamlit as st
+
+from sykinet.disk_cache import DiskCache
+from sykinet.figures import figure_to_png
+from sykinet.spans import annotate, span
+
+DEFAULT_DIR = os.environ.get("SYKINET_RENDER_CACHE_DIR", ".cache/renders")
+DEFAULT_MAX_BYTES = int(os.environ.get("SYKINET_RENDER_CACHE_BYTES", 256 * 1024 ** 2))
+
+
+class RenderCache(DiskCache):
+    """
+    Cache d'images encodées sur disque, borné en octets, éviction LRU.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(directory, max_bytes, suffix=".png")
+
+    def get_or_render(self, parts, render):
+        """
+        Renvoie l'image PNG identifiée par `parts`, en appelant `render()`
+        (qui renvoie une figure Matplotlib) uniquement en cas d'absence.
+        """
+        key = self.make_key(*parts)
+        with span(f"rendu {parts[0]}", cached=True):
+            data = self.get(key)
+            if data is None:
+                annotate(cache="miss")
+                with span("trace"):
+                    fig = render()
+                with span("encodage_png"):
+                    data = figure_to_png(fig)
+                self.put(key, data)
+        return data
+
+
+@st.cache_resource
+def get_render_cache():
+    """
+    Cache de rendu partagé par toutes les sessions du serveur.
+    """
+    return RenderCache()
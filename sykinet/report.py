@@ -0,0 +1,249 @@
+"""
+Rapport national hors ligne : cartes d'aléa et camemberts des surfaces de la
+page 2 pour tous les départements, sans Streamlit.
+
+Les figures sont construites par les mêmes fonctions que la page
+(sykinet.figures), un processus par département, et écrites sous
+`<out>/<dept>/<couche>_<carte|camembert>.<png|pdf>` ; `index.html` les
+rassemble. Les surfaces des camemberts sont calculées sur la géométrie en
+pleine résolution, comme les agrégats de la page (sykinet.aggregates).
+
+Un département dont les versions des couches, le style des figures et les
+formats demandés sont inchangés depuis le dernier passage (`report.json`) et
+dont les fichiers existent encore n'est pas recalculé. L'échec d'un
+département n'interrompt pas les autres : il garde son entrée précédente, le
+manifeste et l'index sont écrits, et la commande se termine en erreur.
+
+    python -m sykinet.report --out rapport --workers 8
+    python -m sykinet.report --dept 33 --format png --force
+"""
+
+import argparse
+import html
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+import matplotlib.pyplot as plt
+
+from sykinet.data import dataset_version, read_dataset
+from sykinet.departements import DEPARTEMENTS
+from sykinet.figures import MAP_RASTER_PX, STYLE_VERSION, area_by_class, area_pie_figure, hazard_map_figure
+from sykinet.legends import LAYER_LEGENDS
+from sykinet.storage import BASE_URL, filesystem_from_url
+
+REPORT_DIR = "rapport"
+MANIFEST = "report.json"
+FORMATS = ("png", "pdf")
+# Résolution des PNG (celle des images de la page, `figure_to_png`)
+DPI = 200
+PAD_INCHES = 0.1
+
+FIGURES = {"carte": "Carte", "camembert": "Surfaces par classe"}
+LAYER_TITLES = {"inondation": "Inondation", "secheresse": "Sécheresse"}
+
+
+def fingerprint(fs, dept, base_path, formats):
+    """
+    Entrées d'un département : versions des couches (None si absente), style
+    des figures et formats. Un département est à jour si elles sont inchangées.
+    """
+    versions = {}
+    for layer in LAYER_LEGENDS:
+        try:
+            versions[layer] = dataset_version(fs, layer, dept, base_path)
+        except FileNotFoundError:
+            versions[layer] = None
+    return {"layers": versions, "style": STYLE_VERSION, "raster_px": MAP_RASTER_PX, "formats": sorted(formats)}
+
+
+def save_figure(fig, stem, formats):
+    """
+    Écrit une figure dans chaque format (`<stem>.<format>`) puis la ferme.
+    Renvoie les noms des fichiers écrits.
+    """
+    try:
+        # Cadre ajusté (`bbox_inches="tight"`) calculé une seule fois : sinon
+        # chaque format retrace toute la figure pour le mesurer
+        bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(PAD_INCHES)
+        for fmt in formats:
+            fig.savefig(f"{stem}.{fmt}", format=fmt, dpi=DPI, bbox_inches=bbox)
+    finally:
+        plt.close(fig)
+    return [f"{os.path.basename(stem)}.{fmt}" for fmt in formats]
+
+
+def render_department(fs, dept, base_path, out_dir, formats):
+    """
+    Cartes et camemberts d'un département : `{couche: {figure: [fichiers]}}`.
+    Les couches absentes du stockage sont ignorées.
+    """
+    dept_dir = os.path.join(out_dir, dept)
+    files = {}
+    for layer, (class_column, _) in LAYER_LEGENDS.items():
+        try:
+            gdf = read_dataset(fs, layer, dept, columns=(class_column,), base_path=base_path)
+        except FileNotFoundError:
+            print(f"{layer} {dept} : fichier absent, ignoré", file=sys.stderr)
+            continue
+        os.makedirs(dept_dir, exist_ok=True)
+        files[layer] = {
+            "carte": save_figure(hazard_map_figure(gdf, layer, dept),
+                                 os.path.join(dept_dir, f"{layer}_carte"), formats),
+            "camembert": save_figure(area_pie_figure(area_by_class(gdf, layer), layer, dept),
+                                     os.path.join(dept_dir, f"{layer}_camembert"), formats),
+        }
+    return files
+
+
+def _up_to_date(entry, inputs, out_dir, dept):
+    if entry is None or entry["inputs"] != inputs:
+        return False
+    return all(os.path.exists(os.path.join(out_dir, dept, name))
+               for figures in entry["files"].values() for names in figures.values() for name in names)
+
+
+def _department_task(args):
+    base_url, dept, out_dir, formats, previous, force = args
+    fs, base_path = filesystem_from_url(base_url)
+    inputs = fingerprint(fs, dept, base_path, formats)
+    if not force and _up_to_date(previous, inputs, out_dir, dept):
+        return dept, previous, False
+    start = time.perf_counter()
+    files = render_department(fs, dept, base_path, out_dir, formats)
+    return dept, {"inputs": inputs, "files": files, "seconds": round(time.perf_counter() - start, 2)}, True
+
+
+def read_report_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_report_manifest(out_dir, manifest):
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+# ***************************************************************
+# Index
+# ***************************************************************
+
+def write_index(out_dir, manifest):
+    """
+    Écrit `index.html` : une ligne par département, une vignette (PNG) et les
+    liens vers chaque format pour chaque figure.
+    """
+    columns = [(layer, figure) for layer in LAYER_LEGENDS for figure in FIGURES]
+    header = "".join(f"<th>{LAYER_TITLES.get(layer, layer)} : {FIGURES[figure]}</th>" for layer, figure in columns)
+    rows = []
+    for dept in sorted(manifest, key=lambda d: (DEPARTEMENTS.index(d) if d in DEPARTEMENTS else len(DEPARTEMENTS), d)):
+        files = manifest[dept]["files"]
+        cells = []
+        for layer, figure in columns:
+            names = files.get(layer, {}).get(figure, [])
+            if not names:
+                cells.append("<td>absente</td>")
+                continue
+            links = " ".join(f'<a href="{html.escape(dept)}/{html.escape(name)}">{name.rsplit(".", 1)[1].upper()}</a>'
+                             for name in names)
+            thumb = next((name for name in names if name.endswith(".png")), None)
+            image = f'<img src="{html.escape(dept)}/{html.escape(thumb)}" loading="lazy"><br>' if thumb else ""
+            cells.append(f"<td>{image}{links}</td>")
+        rows.append(f"<tr><th>{html.escape(dept)}</th>{''.join(cells)}</tr>")
+    generated = time.strftime("%Y-%m-%d %H:%M")
+    document = f"""<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>Cartes d'aléa par département</title>
+<style>
+body {{ font-family: sans-serif; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 4px; text-align: center; vertical-align: top; }}
+img {{ width: 180px; }}
+</style>
+</head>
+<body>
+<h1>Cartes d'aléa par département</h1>
+<p>{len(manifest)} départements, généré le {generated} (style {STYLE_VERSION}).</p>
+<table>
+<tr><th>Département</th>{header}</tr>
+{chr(10).join(rows)}
+</table>
+</body>
+</html>
+"""
+    path = os.path.join(out_dir, "index.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(document)
+    return path
+
+
+def build_report(base_url=BASE_URL, out_dir=REPORT_DIR, depts=DEPARTEMENTS, formats=FORMATS, workers=None,
+                 force=False):
+    """
+    Produit les figures des départements en parallèle (départements à jour
+    ignorés sauf `force`), puis le manifeste et l'index. Renvoie
+    (départements recalculés, départements en échec).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = read_report_manifest(out_dir)
+    rendered, failed = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_department_task, (base_url, dept, out_dir, tuple(formats), manifest.get(dept), force)): dept
+                   for dept in depts}
+        for future in as_completed(futures):
+            dept = futures[future]
+            try:
+                _, entry, changed = future.result()
+            except Exception as exc:
+                # Entrée précédente conservée : recalculée au prochain passage
+                print(f"{dept} : échec ({exc!r})", file=sys.stderr)
+                failed.append(dept)
+                continue
+            if not entry["files"]:
+                # Aucune couche pour ce département : rien à indexer
+                manifest.pop(dept, None)
+                continue
+            manifest[dept] = entry
+            if changed:
+                rendered.append(dept)
+                print(f"{dept} : {sum(len(f) for f in entry['files'].values())} figures en {entry['seconds']} s")
+    write_report_manifest(out_dir, manifest)
+    write_index(out_dir, manifest)
+    return rendered, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cartes et camemberts de la page 2 pour tous les départements.")
+    parser.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--out", default=REPORT_DIR, help=f"Dossier du rapport (défaut : {REPORT_DIR}).")
+    parser.add_argument("--dept", action="append", help="Département(s) à traiter (défaut : tous).")
+    parser.add_argument("--format", action="append", choices=FORMATS, help="Format(s) des figures (défaut : tous).")
+    parser.add_argument("--force", action="store_true", help="Recalcule même les départements à jour.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    matplotlib.use("Agg")
+    start = time.perf_counter()
+    depts = args.dept or DEPARTEMENTS
+    rendered, failed = build_report(args.base_url, args.out, depts, args.format or FORMATS, args.workers, args.force)
+    manifest = read_report_manifest(args.out)
+    if not manifest:
+        print("aucune couche trouvée : rapport vide", file=sys.stderr)
+        sys.exit(1)
+    up_to_date = len((set(depts) & set(manifest)) - set(rendered) - set(failed))
+    print(f"{len(rendered)} départements recalculés, {up_to_date} à jour, {len(failed)} en échec, "
+          f"{time.perf_counter() - start:.1f} s : {os.path.join(args.out, 'index.html')}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Nuages de points à volume borné pour le navigateur (page 4).
+
+Selon le nombre de points à tracer :
+
+* jusqu'à `WEBGL_POINTS` : nuage Plotly SVG habituel ;
+* jusqu'à `MAX_POINTS` : même nuage en WebGL (`scattergl`) ;
+* au-delà, agrégation côté serveur, au choix :
+  - échantillon stratifié par classe de risque, qui conserve en priorité les
+    points extrêmes (hors des quantiles `OUTLIER_QUANTILE`) ;
+  - densité par classe : histogramme 2D, un point par case non vide dont la
+    taille suit le nombre de transactions.
+
+Dans les deux cas, au plus `MAX_POINTS` points sont envoyés au navigateur,
+quelle que soit la taille de la base.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+WEBGL_POINTS = int(os.environ.get("SYKINET_SCATTER_WEBGL_POINTS", 5_000))
+MAX_POINTS = int(os.environ.get("SYKINET_SCATTER_MAX_POINTS", 50_000))
+
+OUTLIER_QUANTILE = 0.01
+DENSITY_BINS = 100
+COUNT_COLUMN = "Nombre de transactions"
+
+AGGREGATIONS = ("echantillon", "densite")
+
+
+def stratified_sample(df, x, y, color, max_points=MAX_POINTS, outlier_quantile=OUTLIER_QUANTILE, seed=0):
+    """
+    Sous-échantillon d'au plus `max_points` lignes, réparti entre les classes
+    de `color` au prorata de leur effectif. Dans chaque classe, les points hors
+    des quantiles `outlier_quantile` / `1 - outlier_quantile` (en x ou en y)
+    occupent jusqu'à la moitié du quota, le reste est tiré au hasard.
+    Le tirage est déterministe (graine fixe) et l'ordre des lignes conservé.
+    """
+    if len(df) <= max_points:
+        return df
+    rng = np.random.default_rng(seed)
+    xs, ys = df[x].to_numpy(dtype=float), df[y].to_numpy(dtype=float)
+    keep = []
+    for positions in df.groupby(color, observed=True, sort=False, dropna=False).indices.values():
+        quota = max(1, int(max_points * len(positions) / len(df)))
+        if len(positions) <= quota:
+            keep.append(positions)
+            continue
+        cx, cy = xs[positions], ys[positions]
+        lo_x, hi_x = np.nanquantile(cx, [outlier_quantile, 1 - outlier_quantile])
+        lo_y, hi_y = np.nanquantile(cy, [outlier_quantile, 1 - outlier_quantile])
+        extreme = (cx < lo_x) | (cx > hi_x) | (cy < lo_y) | (cy > hi_y)
+
+        outliers = positions[extreme]
+        if len(outliers) > quota // 2:
+            outliers = rng.choice(outliers, quota // 2, replace=False)
+        inliers = positions[~extreme]
+        others = rng.choice(inliers, min(quota - len(outliers), len(inliers)), replace=False)
+        keep += [outliers, others]
+    return df.iloc[np.sort(np.concatenate(keep))]
+
+
+def binned_density(df, x, y, color, bins=DENSITY_BINS):
+    """
+    Histogramme 2D par classe de `color` sur une grille commune de `bins` x
+    `bins` cases : une ligne par case non vide (centre de la case, classe,
+    nombre de transactions).
+    """
+    xs, ys = df[x].to_numpy(dtype=float), df[y].to_numpy(dtype=float)
+    classes = pd.Categorical(df[color])
+    valid = np.isfinite(xs) & np.isfinite(ys) & (classes.codes >= 0)
+    xs, ys, codes = xs[valid], ys[valid], classes.codes[valid].astype(np.int64)
+    if len(xs) == 0:
+        return pd.DataFrame({
+            x: np.empty(0), y: np.empty(0),
+            color: pd.Categorical([], categories=classes.categories),
+            COUNT_COLUMN: np.empty(0, dtype=np.int64),
+        })
+
+    x_edges = np.linspace(xs.min(), xs.max(), bins + 1)
+    y_edges = np.linspace(ys.min(), ys.max(), bins + 1)
+    ix = np.clip(np.searchsorted(x_edges, xs, side="right") - 1, 0, bins - 1)
+    iy = np.clip(np.searchsorted(y_edges, ys, side="right") - 1, 0, bins - 1)
+
+    counts = np.bincount((codes * bins + ix) * bins + iy, minlength=len(classes.categories) * bins * bins)
+    cells = np.flatnonzero(counts)
+    cell_code, cell_x, cell_y = cells // (bins * bins), (cells // bins) % bins, cells % bins
+    return pd.DataFrame({
+        x: (x_edges[cell_x] + x_edges[cell_x + 1]) / 2,
+        y: (y_edges[cell_y] + y_edges[cell_y + 1]) / 2,
+        color: pd.Categorical.from_codes(cell_code, classes.categories),
+        COUNT_COLUMN: counts[cells],
+    })
+
+
+def scatter_figure(df, x, y, color, aggregation="echantillon",
+                   webgl_points=WEBGL_POINTS, max_points=MAX_POINTS, **px_kwargs):
+    """
+    Nuage de points Plotly de `df` dont le volume reste borné (voir le module).
+    Renvoie (figure, note) ; `note` décrit l'agrégation appliquée, ou vaut None.
+    """
+    n = len(df)
+    note = None
+    if n > max_points and aggregation == "densite":
+        # Grille réduite si besoin pour rester sous `max_points` cases au total
+        n_classes = max(df[color].nunique(), 1)
+        df = binned_density(df, x, y, color, bins=min(DENSITY_BINS, int(np.sqrt(max_points / n_classes))))
+        px_kwargs = {**px_kwargs, "size": COUNT_COLUMN, "size_max": 14}
+        note = f"Densité par classe : {_count(len(df))} cases non vides pour {_count(n)} transactions."
+    elif n > max_points:
+        df = stratified_sample(df, x, y, color, max_points)
+        note = f"Échantillon stratifié (extrêmes conservés) : {_count(len(df))} points sur {_count(n)}."
+
+    render_mode = "webgl" if n > webgl_points else "svg"
+    fig = px.scatter(df, x=x, y=y, color=color, render_mode=render_mode, **px_kwargs)
+    return fig, note
+
+
+def _count(n):
+    return f"{n:,}".replace(",", " ")
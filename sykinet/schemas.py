@@ -0,0 +1,133 @@
+"""
+Schémas déclaratifs des bases Sykinet.
+
+Chaque base déclare ses colonnes utiles et leur type explicite : les lecteurs
+n'analysent que les colonnes demandées et ne laissent plus pandas inférer des
+colonnes `object` / `float64` coûteuses en mémoire.
+"""
+
+from dataclasses import dataclass, field
+
+# Colonnes des bases de transactions (DVF enrichies des classes d'aléa)
+_TRANSACTION_COLUMNS = {
+    "valeur_fonciere": "float32",
+    "surface_reelle_bati": "float32",
+    "surface_terrain": "float32",
+    "code_departement": "category",
+    "code_commune": "category",
+    "longitude": "float64",
+    "latitude": "float64",
+}
+
+
+@dataclass(frozen=True)
+class DatasetSchema:
+    """
+    Description d'une base : nom de fichier (éventuellement paramétré par
+    `{dept}`), colonnes typées et présence d'une géométrie.
+
+    `columns` vaut None pour les petites tables de synthèse lues telles quelles.
+    """
+    name: str
+    filename: str
+    columns: dict = field(default=None)
+    geometry: bool = False
+
+    @property
+    def per_department(self):
+        return "{dept}" in self.filename
+
+    def filename_for(self, dept=None):
+        if self.per_department:
+            if dept is None:
+                raise ValueError(f"La base '{self.name}' nécessite un code département.")
+            return self.filename.format(dept=dept)
+        return self.filename
+
+    def dtypes(self, columns=None):
+        """
+        Types des colonnes demandées (toutes les colonnes déclarées par défaut).
+        """
+        if self.columns is None:
+            return {}
+        if columns is None:
+            return dict(self.columns)
+        unknown = set(columns) - set(self.columns) - {"geometry"}
+        if unknown:
+            raise KeyError(f"Colonnes inconnues pour '{self.name}' : {sorted(unknown)}")
+        return {c: self.columns[c] for c in columns if c in self.columns}
+
+
+SCHEMAS = {
+    schema.name: schema
+    for schema in [
+        # --- Transactions enrichies (page 4) ---
+        DatasetSchema(
+            "base_innond_final", "base_innond_final.csv",
+            {**_TRANSACTION_COLUMNS, "Risque_innond": "category"},
+        ),
+        DatasetSchema(
+            "base_sech_final", "base_sech_final.csv",
+            {**_TRANSACTION_COLUMNS, "zone_niveau": "float32"},
+        ),
+        DatasetSchema(
+            "base_innond_final_maison", "base_innond_final_maison.csv",
+            {**_TRANSACTION_COLUMNS, "Risque_innond": "category"},
+        ),
+        DatasetSchema(
+            "base_sech_final_maison", "base_sech_final_maison.csv",
+            {**_TRANSACTION_COLUMNS, "zone_niveau": "float32"},
+        ),
+        # --- Tables de synthèse DVF (page 3), quelques lignes chacune ---
+        DatasetSchema("df_doublons", "df_doublons.csv"),
+        DatasetSchema("differents_locaux", "differents_locaux.csv"),
+        DatasetSchema("nature_mutation", "nature_mutation.csv"),
+        # --- Couches d'aléa par département (page 2) ---
+        DatasetSchema(
+            "inondation", "base_innondation{dept}.csv",
+            {"gridcode": "int8", "CLASSE": "category"}, geometry=True,
+        ),
+        DatasetSchema(
+            "secheresse", "df_secheresse{dept}.csv",
+            {"ALEA": "category"}, geometry=True,
+        ),
+        # --- Surfaces par classe d'aléa et par département (sykinet.aggregates) ---
+        DatasetSchema(
+            "aggregats_surfaces", "aggregats_surfaces.csv",
+            {"dept": "category", "layer": "category", "classe": "category", "area": "float64"},
+        ),
+        # --- Synthèses nationales par département (page 1) ---
+        DatasetSchema(
+            "secheresse_complet", "df_secheresse_complet.csv",
+            {"pct_nulle": "float32", "pct_faible": "float32",
+             "pct_moyen": "float32", "pct_fort": "float32"},
+            geometry=True,
+        ),
+        DatasetSchema(
+            "innond_complet", "df_innond_complet.csv",
+            {"pct_innond_caves": "float32", "pct_debord_nappes": "float32",
+             "pct_sans_risque": "float32"},
+            geometry=True,
+        ),
+        # --- Exposition par commune (zoom de la page 1, sykinet.exposure) ---
+        DatasetSchema(
+            "communes_secheresse", "communes_secheresse{dept}.csv",
+            {"code_commune": "category", "pct_nulle": "float32", "pct_faible": "float32",
+             "pct_moyen": "float32", "pct_fort": "float32", "NIVEAU": "float32"},
+            geometry=True,
+        ),
+        DatasetSchema(
+            "communes_inondation", "communes_inondation{dept}.csv",
+            {"code_commune": "category", "pct_innond_caves": "float32", "pct_debord_nappes": "float32",
+             "pct_sans_risque": "float32", "NIVEAU": "float32"},
+            geometry=True,
+        ),
+    ]
+}
+
+
+def get_schema(name):
+    try:
+        return SCHEMAS[name]
+    except KeyError:
+        raise KeyError(f"Base inconnue : '{name}'. Bases disponibles : {sorted(SCHEMAS)}") from None
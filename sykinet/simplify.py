@@ -0,0 +1,195 @@
+"""
+Niveaux de détail (LOD) pré-calculés des couches cartographiées.
+
+Les polygones BRGM sont tracés en pleine résolution alors que les cartes font
+au plus ~1000 px de large. Cette étape hors ligne produit, pour chaque couche,
+des versions simplifiées à plusieurs tolérances (en mètres, Lambert-93) :
+
+* la simplification est faite sur la *couverture* (`shapely.coverage_simplify`) :
+  une frontière partagée par deux polygones voisins est simplifiée une seule
+  fois, sans trou ni chevauchement entre eux ;
+* si la couche n'est pas une couverture valide (polygones qui se chevauchent),
+  chaque polygone est simplifié séparément en préservant sa topologie.
+
+Un manifeste `<fichier>_lod.json` (emprise, nombre de sommets par niveau) permet
+aux pages de choisir le niveau le plus grossier encore fidèle à la taille de la
+figure, sans lire la géométrie.
+
+    python -m sykinet.simplify build --dept 33
+    python -m sykinet.simplify report --dept 33 --dept 75
+"""
+
+import argparse
+import io
+import json
+import time
+
+import geopandas as gpd
+import matplotlib
+import numpy as np
+import shapely
+
+from sykinet.departements import DEPARTEMENTS
+from sykinet.geoparquet import lod_manifest_path, lod_path, read_geoparquet, read_hazard_layer
+from sykinet.schemas import get_schema
+from sykinet.storage import BASE_PATH, BASE_URL, data_path, filesystem_from_url
+
+# Tolérances de simplification disponibles (mètres)
+TOLERANCES = (10, 20, 50, 100, 200, 500, 1000, 2000)
+
+# Largeur maximale d'affichage d'une carte et écart toléré (en pixels affichés)
+MAX_DISPLAY_PX = 1000
+MAX_ERROR_PX = 0.5
+
+# Couches cartographiées : synthèses nationales (page 1) et couches départementales (page 2)
+NATIONAL_LAYERS = ("secheresse_complet", "innond_complet")
+DEPARTMENT_LAYERS = ("inondation", "secheresse")
+
+
+def count_vertices(geoms):
+    return int(shapely.get_num_coordinates(geoms).sum())
+
+
+def simplify_geometries(geoms, tolerance, coverage=True):
+    """
+    Simplifie un tableau de géométries. Avec `coverage`, les frontières
+    partagées restent identiques entre polygones voisins.
+    """
+    if coverage:
+        return shapely.coverage_simplify(geoms, tolerance)
+    return shapely.simplify(geoms, tolerance, preserve_topology=True)
+
+
+def build_levels(fs, name, dept=None, base_path=BASE_PATH, tolerances=TOLERANCES):
+    """
+    Écrit les niveaux de détail d'une couche et son manifeste ; renvoie le manifeste.
+    """
+    csv_path = data_path(get_schema(name).filename_for(dept), base_path)
+    gdf = read_hazard_layer(fs, csv_path)
+    geoms = np.asarray(gdf.geometry.array)
+    coverage = bool(shapely.coverage_is_valid(geoms))
+
+    manifest = {
+        "bounds": [float(v) for v in gdf.total_bounds],
+        "vertices": count_vertices(geoms),
+        "coverage": coverage,
+        "levels": {},
+    }
+    for tolerance in tolerances:
+        simplified = simplify_geometries(geoms, tolerance, coverage=coverage)
+        lod = gdf.set_geometry(gpd.GeoSeries(simplified, index=gdf.index, crs=gdf.crs))
+        with fs.open(lod_path(csv_path, tolerance), "wb") as f:
+            lod.to_parquet(f, index=False, compression="zstd")
+        manifest["levels"][str(tolerance)] = {"vertices": count_vertices(simplified)}
+
+    with fs.open(lod_manifest_path(csv_path), "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def read_manifest(fs, name, dept=None, base_path=BASE_PATH):
+    """
+    Manifeste des niveaux de détail d'une couche, ou None s'il n'a pas été produit.
+    """
+    path = lod_manifest_path(data_path(get_schema(name).filename_for(dept), base_path))
+    if not fs.exists(path):
+        return None
+    with fs.open(path, "r") as f:
+        return json.load(f)
+
+
+def pick_tolerance(manifest, figsize, dpi=100):
+    """
+    Tolérance la plus grossière dont l'écart reste sous `MAX_ERROR_PX` pixel
+    à la taille d'affichage de la figure ; None si aucun niveau ne convient.
+    """
+    if not manifest or not manifest["levels"]:
+        return None
+    minx, miny, maxx, maxy = manifest["bounds"]
+    width_px = min(figsize[0] * dpi, MAX_DISPLAY_PX)
+    height_px = figsize[1] * width_px / figsize[0]
+    pixel_size = max((maxx - minx) / width_px, (maxy - miny) / height_px)
+
+    faithful = [int(t) for t in manifest["levels"] if int(t) <= pixel_size * MAX_ERROR_PX]
+    return max(faithful) if faithful else None
+
+
+# ***************************************************************
+# Rapport : réduction du nombre de sommets et gain de rendu
+# ***************************************************************
+
+def render_time(gdf, figsize):
+    """
+    Temps (s) de tracé et d'encodage PNG d'une couche, hors Streamlit.
+    """
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    fig, ax = plt.subplots(figsize=figsize)
+    gdf.plot(ax=ax, linewidth=0.05)
+    ax.set_axis_off()
+    fig.savefig(io.BytesIO(), format="png")
+    plt.close(fig)
+    return time.perf_counter() - start
+
+
+def report(fs, name, dept=None, base_path=BASE_PATH, figsize=(12, 12)):
+    """
+    Compare la couche complète et le niveau choisi pour `figsize`.
+    """
+    manifest = read_manifest(fs, name, dept, base_path)
+    tolerance = pick_tolerance(manifest, figsize)
+    if tolerance is None:
+        return None
+    csv_path = data_path(get_schema(name).filename_for(dept), base_path)
+    full = read_hazard_layer(fs, csv_path, columns=())
+    lod = read_geoparquet(fs, lod_path(csv_path, tolerance), columns=())
+    lod_vertices = manifest["levels"][str(tolerance)]["vertices"]
+    return {
+        "dataset": name,
+        "dept": dept,
+        "tolerance": tolerance,
+        "vertices": manifest["vertices"],
+        "lod_vertices": lod_vertices,
+        "reduction": 1 - lod_vertices / max(manifest["vertices"], 1),
+        "render_full": render_time(full, figsize),
+        "render_lod": render_time(lod, figsize),
+    }
+
+
+def _targets(args):
+    if args.national:
+        return [(name, None) for name in NATIONAL_LAYERS]
+    return [(name, dept) for dept in (args.dept or DEPARTEMENTS) for name in DEPARTMENT_LAYERS]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Niveaux de détail des couches cartographiées.")
+    parser.add_argument("command", choices=["build", "report"])
+    parser.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--dept", action="append", help="Département(s) à traiter (défaut : tous).")
+    parser.add_argument("--national", action="store_true", help="Traite les synthèses nationales (page 1).")
+    args = parser.parse_args(argv)
+
+    matplotlib.use("Agg")
+    fs, base_path = filesystem_from_url(args.base_url)
+    for name, dept in _targets(args):
+        label = f"{name} {dept or 'France'}"
+        if args.command == "build":
+            manifest = build_levels(fs, name, dept, base_path)
+            levels = ", ".join(f"{t} m: {lvl['vertices']}" for t, lvl in manifest["levels"].items())
+            print(f"{label} : {manifest['vertices']} sommets -> {levels}"
+                  f"{'' if manifest['coverage'] else ' (hors couverture)'}")
+        else:
+            figsize = (8, 6) if dept is None else (12, 12)
+            res = report(fs, name, dept, base_path, figsize=figsize)
+            if res is None:
+                print(f"{label} : aucun niveau de détail disponible")
+                continue
+            print(f"{label} : niveau {res['tolerance']} m | sommets {res['vertices']} -> "
+                  f"{res['lod_vertices']} (-{res['reduction']:.0%}) | rendu "
+                  f"{res['render_full']:.2f}s -> {res['render_lod']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Chronométrage des étapes de chaque exécution d'une page (spans).
+
+Chaque page ouvre un enregistrement au début de son exécution (`begin`),
+entoure ses chargements, transformations et rendus de `span(nom, ...)` et le
+referme à la fin (`finish`), qui trace le panneau et écrit les métriques :
+
+* panneau de performance (interrupteur de la barre latérale) : cascade des
+  spans de la dernière exécution ;
+* métriques sur disque si `SYKINET_METRICS_DIR` est défini, un jeu de
+  fichiers par processus serveur : une ligne JSON par span
+  (`spans_<pid>.jsonl`, renommé en `.1` au-delà de `SYKINET_SPANS_MAX_BYTES`)
+  et des cumuls au format texte Prometheus (`sykinet_<pid>.prom`, libellé
+  `pid`, pour le collecteur textfile de node_exporter qui fusionne les
+  fichiers du dossier).
+
+Les spans portent les libellés page, département et, pour les appels en
+cache, `cache=hit|miss` : le code qui ne s'exécute qu'en cas d'absence du
+cache le signale par `annotate(cache="miss")`.
+
+Sans panneau ni dossier de métriques, rien n'est enregistré : `span` renvoie
+un gestionnaire de contexte vide partagé (moins d'une microseconde par
+étape).
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+
+import plotly.express as px
+import streamlit as st
+
+METRICS_DIR = os.environ.get("SYKINET_METRICS_DIR")
+# Taille au-delà de laquelle le journal des spans est archivé (une seule archive gardée)
+SPANS_MAX_BYTES = int(os.environ.get("SYKINET_SPANS_MAX_BYTES", 64 * 1024 ** 2))
+PANEL_KEY = "sykinet_perf_panel"
+
+_current = contextvars.ContextVar("sykinet_rerun", default=None)
+_NULL = nullcontext()
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    duration: float = 0.0
+    depth: int = 0
+    labels: dict = field(default_factory=dict)
+
+
+class Rerun:
+    """
+    Spans d'une exécution de page, dans leur ordre d'ouverture.
+    """
+
+    def __init__(self, page, dept=None):
+        self.page = page
+        self.dept = dept
+        self.started = time.perf_counter()
+        self.timestamp = time.time()
+        self.spans = []
+        self._stack = []
+
+    @contextmanager
+    def span(self, name, **labels):
+        if self.dept is not None:
+            labels.setdefault("dept", self.dept)
+        record = Span(name, time.perf_counter() - self.started, depth=len(self._stack), labels=labels)
+        self.spans.append(record)
+        self._stack.append(record)
+        try:
+            yield record
+        except BaseException:
+            # Un appel en cache interrompu n'a rien trouvé dans le cache
+            self.annotate(cache="miss")
+            raise
+        finally:
+            record.duration = time.perf_counter() - self.started - record.start
+            self._stack.pop()
+            # Appel en cache sans exécution du calcul : succès
+            if "cache" in record.labels and record.labels["cache"] is None:
+                record.labels["cache"] = "hit"
+
+    def close(self):
+        """
+        Arrête les spans encore ouverts (exécution interrompue par `st.stop`).
+        """
+        now = time.perf_counter() - self.started
+        for record in self._stack:
+            record.duration = now - record.start
+
+    def annotate(self, **labels):
+        """
+        Renseigne les libellés attendus (`cache=None`) des spans ouverts.
+        """
+        for record in self._stack:
+            for key, value in labels.items():
+                if key in record.labels and record.labels[key] is None:
+                    record.labels[key] = value
+
+
+def begin(page, dept=None):
+    """
+    Ouvre l'enregistrement de l'exécution courante de `page`. Rien n'est
+    enregistré si le panneau est fermé et qu'aucun dossier de métriques n'est défini.
+    """
+    enabled = METRICS_DIR is not None or st.session_state.get(PANEL_KEY, False)
+    _current.set(Rerun(page, None if dept is None else str(dept)) if enabled else None)
+
+
+def set_department(dept):
+    """
+    Département des spans ouverts ensuite (choisi dans la page après `begin`,
+    `None` pour les étapes nationales).
+    """
+    rerun = _current.get()
+    if rerun is not None:
+        rerun.dept = None if dept is None else str(dept)
+
+
+def span(name, cached=False, **labels):
+    """
+    Gestionnaire de contexte chronométrant une étape. Avec `cached`, l'étape
+    est un appel en cache et reçoit le libellé `cache` (hit par défaut).
+    """
+    rerun = _current.get()
+    if rerun is None:
+        return _NULL
+    if cached:
+        labels["cache"] = None
+    return rerun.span(name, **labels)
+
+
+def annotate(**labels):
+    rerun = _current.get()
+    if rerun is not None:
+        rerun.annotate(**labels)
+
+
+# ***************************************************************
+# Panneau et métriques
+# ***************************************************************
+
+def waterfall_figure(rerun):
+    """
+    Cascade des spans : une barre par span, de son début à sa fin (ms).
+    """
+    rows = [{
+        "span": f"{i:02d} " + "· " * record.depth + record.name,
+        "début (ms)": record.start * 1000,
+        "durée (ms)": record.duration * 1000,
+        "cache": record.labels.get("cache") or "-",
+    } for i, record in enumerate(rerun.spans)]
+    fig = px.bar(rows, x="durée (ms)", base="début (ms)", y="span", color="cache", orientation="h",
+                 color_discrete_map={"hit": "#4CAF50", "miss": "#F44336", "-": "#90A4AE"})
+    fig.update_yaxes(autorange="reversed", title=None)
+    fig.update_layout(height=120 + 22 * len(rows), margin={"l": 0, "r": 0, "t": 10, "b": 0}, showlegend=False)
+    return fig
+
+
+class MetricsSink:
+    """
+    Écriture des spans d'un processus dans `directory` : lignes JSON ajoutées
+    (journal archivé au-delà de `max_bytes`) et cumuls Prometheus réécrits (de
+    façon atomique) après chaque exécution. Les fichiers portent le numéro du
+    processus : les processus d'un même serveur n'écrasent pas leurs cumuls.
+    """
+
+    def __init__(self, directory, max_bytes=SPANS_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.pid = os.getpid()
+        self.spans_path = os.path.join(directory, f"spans_{self.pid}.jsonl")
+        self.prom_path = os.path.join(directory, f"sykinet_{self.pid}.prom")
+        self._lock = threading.Lock()
+        self._totals = {}  # (page, span, dept, cache) -> [somme des durées, nombre]
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, rerun):
+        lines = []
+        for record in rerun.spans:
+            labels = {"page": rerun.page, "span": record.name,
+                      "dept": record.labels.get("dept", ""), "cache": record.labels.get("cache") or ""}
+            lines.append(json.dumps({
+                "ts": rerun.timestamp, **labels, "depth": record.depth,
+                "start_ms": round(record.start * 1000, 3), "duration_ms": round(record.duration * 1000, 3),
+            }, ensure_ascii=False))
+            key = tuple(labels.values())
+            with self._lock:
+                total = self._totals.setdefault(key, [0.0, 0])
+                total[0] += record.duration
+                total[1] += 1
+        with self._lock:
+            with open(self.spans_path, "a", encoding="utf-8") as f:
+                f.write("".join(line + "\n" for line in lines))
+                size = f.tell()
+            if size > self.max_bytes:
+                os.replace(self.spans_path, self.spans_path + ".1")
+            self._write_prometheus()
+
+    def close(self):
+        """
+        Retire les cumuls du processus (arrêt du serveur) : le collecteur ne
+        publie plus ceux d'un processus disparu.
+        """
+        with self._lock:
+            if os.path.exists(self.prom_path):
+                os.remove(self.prom_path)
+
+    def _write_prometheus(self):
+        lines = [
+            "# HELP sykinet_span_seconds Durée des étapes des pages.",
+            "# TYPE sykinet_span_seconds summary",
+        ]
+        for (page, name, dept, cache), (seconds, count) in sorted(self._totals.items()):
+            labels = f'page="{page}",span="{name}",dept="{dept}",cache="{cache}",pid="{self.pid}"'
+            lines.append(f"sykinet_span_seconds_sum{{{labels}}} {seconds:.6f}")
+            lines.append(f"sykinet_span_seconds_count{{{labels}}} {count}")
+        tmp_path = f"{self.prom_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prom_path)
+
+
+@st.cache_resource
+def get_metrics_sink():
+    """
+    Écriture des métriques partagée par toutes les sessions du serveur.
+    """
+    sink = MetricsSink(METRICS_DIR)
+    atexit.register(sink.close)
+    return sink
+
+
+def finish():
+    """
+    Referme l'enregistrement : interrupteur et cascade dans la barre latérale,
+    écriture des métriques.
+    """
+    rerun = _current.get()
+    _current.set(None)
+    if rerun is not None:
+        rerun.close()
+    with st.sidebar:
+        st.markdown("---")
+        panel = st.toggle("⏱️ Panneau de performance", key=PANEL_KEY,
+                          help="Durée de chaque étape de la dernière exécution de la page.")
+        if panel and rerun is not None and rerun.spans:
+            total = (time.perf_counter() - rerun.started) * 1000
+            st.caption(f"Exécution : {total:.0f} ms, {len(rerun.spans)} étapes "
+                       "(vert : cache, rouge : calculé)")
+            st.plotly_chart(waterfall_figure(rerun), use_container_width=True)
+        elif panel:
+            st.caption("Étapes enregistrées à partir de la prochaine exécution.")
+    if rerun is not None and METRICS_DIR is not None:
+        get_metrics_sink().write(rerun)
@@ -0,0 +1,274 @@
+"""
+Jointure spatiale des transactions DVF avec les couches d'aléa.
+
+Produit les bases finales de la page 4 (`base_innond_final`, `base_sech_final`
+et leurs variantes `_maison`) : chaque vente d'appartement ou de maison reçoit
+la classe d'inondation (`Risque_innond`, libellé `CLASSE` du polygone) et le
+niveau de sécheresse (`zone_niveau`) du polygone qui la contient.
+
+La source est le fichier des ventes d'un seul local (`ventes_un_local.csv.gz`)
+écrit par `python -m sykinet.dvf_summary` : dans `dvf.csv.gz`, une mutation de
+plusieurs locaux occupe plusieurs lignes (même `id_mutation`) et serait
+comptée plusieurs fois. Elle est lue par blocs (mémoire bornée par la taille
+de bloc), les coordonnées sont projetées en Lambert-93 d'un seul appel par bloc, puis chaque
+département du bloc est confié à un processus qui interroge un index R-tree
+compact (STRtree) des polygones du département. Un département est toujours
+traité par le même processus : son index n'est construit qu'une fois pour tout
+le fichier, et chaque processus ne garde que les index de ses départements.
+Les lignes sont écrites dans l'ordre du fichier source, avec un index continu :
+le résultat ne dépend ni de la taille des blocs ni du nombre de processus.
+Les bases sont écrites sous des noms temporaires puis renommées une fois la
+jointure terminée : une exécution interrompue laisse les précédentes intactes.
+
+    python -m sykinet.dvf_summary /chemin/dvf.csv.gz --workers 8
+    python -m sykinet.spatial_join --workers 8
+"""
+
+import argparse
+import os
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import fsspec
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import Transformer
+
+from sykinet.data import read_dataset
+from sykinet.geoparquet import CRS
+from sykinet.legends import LAYER_LEGENDS
+from sykinet.schemas import get_schema
+from sykinet.storage import BASE_URL, data_path, filesystem_from_url
+
+CHUNKSIZE = 500_000
+
+# Ventes d'un seul local écrites par sykinet.dvf_summary, source de la jointure
+SALES_FILENAME = "ventes_un_local.csv.gz"
+
+# Colonnes DVF converties en nombres ; les autres sont recopiées telles quelles
+NUMERIC_COLUMNS = [
+    "valeur_fonciere", "surface_reelle_bati", "surface_terrain",
+    "nombre_pieces_principales", "longitude", "latitude",
+]
+
+# Niveau de sécheresse associé à chaque classe d'aléa RGA
+ZONE_NIVEAU = {"Nul": 0.0, "Faible": 1.0, "Moyen": 2.0, "Fort": 3.0}
+
+# Base finale produite pour chaque (type de local, colonne d'aléa)
+OUTPUTS = {
+    ("Appartement", "Risque_innond"): "base_innond_final",
+    ("Appartement", "zone_niveau"): "base_sech_final",
+    ("Maison", "Risque_innond"): "base_innond_final_maison",
+    ("Maison", "zone_niveau"): "base_sech_final_maison",
+}
+
+# Colonne de classe lue dans chaque couche pour la jointure
+JOIN_COLUMNS = {"inondation": "CLASSE", "secheresse": LAYER_LEGENDS["secheresse"][0]}
+
+
+# ***************************************************************
+# Index spatiaux (un jeu par processus)
+# ***************************************************************
+
+# Sans limite : un processus ne reçoit que ses départements (`DepartmentPools`),
+# l'ensemble des processus garde au plus une fois les index nationaux
+@lru_cache(maxsize=None)
+def hazard_index(base_url, layer, dept):
+    """
+    Index STRtree des polygones d'une couche d'un département et tableau des
+    classes associées, ou None si la couche est absente du stockage.
+    """
+    fs, base_path = filesystem_from_url(base_url)
+    column = JOIN_COLUMNS[layer]
+    try:
+        gdf = read_dataset(fs, layer, dept, columns=(column,), base_path=base_path)
+    except FileNotFoundError:
+        return None
+    return shapely.STRtree(np.asarray(gdf.geometry.array)), gdf[column].astype(object).to_numpy()
+
+
+def classify_points(tree, classes, x, y):
+    """
+    Classe du polygone contenant chaque point (NaN hors de tout polygone). Un
+    point couvert par plusieurs polygones reçoit la classe du premier d'entre
+    eux dans l'ordre de la couche.
+    """
+    result = np.full(len(x), np.nan, dtype=object)
+    point_idx, poly_idx = tree.query(shapely.points(x, y), predicate="intersects")
+    if point_idx.size:
+        # Tri par (point, polygone) : la première paire de chaque point est retenue
+        order = np.lexsort((poly_idx, point_idx))
+        point_idx, poly_idx = point_idx[order], poly_idx[order]
+        first = np.r_[True, point_idx[1:] != point_idx[:-1]]
+        result[point_idx[first]] = classes[poly_idx[first]]
+    return result
+
+
+def _classify_department(base_url, dept, x, y):
+    """
+    Tâche d'un processus : classes d'inondation et niveaux de sécheresse des
+    points d'un département.
+    """
+    classes = {}
+    for layer in JOIN_COLUMNS:
+        index = hazard_index(base_url, layer, dept)
+        if index is None:
+            classes[layer] = np.full(len(x), np.nan, dtype=object)
+        else:
+            classes[layer] = classify_points(*index, x, y)
+    niveau = pd.Series(classes["secheresse"]).map(ZONE_NIVEAU).to_numpy(dtype="float64")
+    return classes["inondation"], niveau
+
+
+# ***************************************************************
+# Traitement par blocs
+# ***************************************************************
+
+def read_dvf_chunks(source, chunksize=CHUNKSIZE, fs=None):
+    """
+    Itère sur les blocs de DVF (local ou URL fsspec, ou chemin dans `fs` ;
+    compression déduite du nom). Toutes les colonnes sont lues en texte sauf
+    `NUMERIC_COLUMNS`, ce qui rend les types indépendants du découpage en blocs.
+    """
+    opened = fsspec.open(source, "rb", compression="infer") if fs is None else fs.open(source, "rb", compression="infer")
+    with opened as f:
+        for chunk in pd.read_csv(f, chunksize=chunksize, dtype=str, keep_default_na=False, na_values=[""]):
+            for col in NUMERIC_COLUMNS:
+                if col in chunk.columns:
+                    chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+            yield chunk
+
+
+def select_sales(chunk):
+    """
+    Ventes d'appartements et de maisons du bloc.
+    """
+    mask = (chunk["nature_mutation"] == "Vente") & chunk["type_local"].isin(["Appartement", "Maison"])
+    return chunk[mask]
+
+
+class DepartmentPools:
+    """
+    Processus attitrés : `workers` pools d'un processus chacun, et un pool fixe
+    par département, choisi à sa première apparition parmi les moins chargés
+    (en nombre de points). Un pool partagé confierait chaque tâche au premier
+    processus libre, qui reconstruirait alors l'index de tous les départements.
+    """
+
+    def __init__(self, workers=None):
+        self._stack = ExitStack()
+        self.pools = [self._stack.enter_context(ProcessPoolExecutor(max_workers=1))
+                      for _ in range(workers or os.cpu_count() or 1)]
+        self.load = [0] * len(self.pools)
+        self.assigned = {}
+
+    def submit(self, dept, n_points, fn, *args):
+        if dept not in self.assigned:
+            self.assigned[dept] = self.load.index(min(self.load))
+        worker = self.assigned[dept]
+        self.load[worker] += n_points
+        return self.pools[worker].submit(fn, *args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return self._stack.__exit__(*exc)
+
+
+def submit_chunk(pools, base_url, sales, transformer):
+    """
+    Projette les coordonnées du bloc en Lambert-93 puis soumet une tâche par
+    département au processus attitré du département.
+    """
+    x, y = transformer.transform(sales["longitude"].to_numpy(), sales["latitude"].to_numpy())
+    futures = []
+    for dept, positions in sales.groupby("code_departement", sort=False).indices.items():
+        futures.append((positions, pools.submit(dept, len(positions), _classify_department,
+                                                base_url, dept, x[positions], y[positions])))
+    return futures
+
+
+def collect_chunk(sales, futures):
+    """
+    Rassemble les classes calculées par département dans l'ordre du bloc.
+    """
+    risque = np.full(len(sales), np.nan, dtype=object)
+    niveau = np.full(len(sales), np.nan)
+    for positions, future in futures:
+        risque[positions], niveau[positions] = future.result()
+    return sales.assign(Risque_innond=risque, zone_niveau=niveau)
+
+
+def run(source=None, base_url=BASE_URL, workers=None, chunksize=CHUNKSIZE):
+    """
+    Exécute la jointure complète et écrit les quatre bases finales. Renvoie le
+    nombre de lignes écrites par base. Sans `source`, lit `ventes_un_local.csv.gz`
+    dans `base_url`.
+    """
+    fs, base_path = filesystem_from_url(base_url)
+    if source is None:
+        chunks = read_dvf_chunks(data_path(SALES_FILENAME, base_path), chunksize, fs=fs)
+    else:
+        chunks = read_dvf_chunks(source, chunksize)
+    transformer = Transformer.from_crs("EPSG:4326", CRS, always_xy=True)
+    paths = {name: data_path(get_schema(name).filename, base_path) for name in OUTPUTS.values()}
+    tmp_paths = {name: f"{path}.{os.getpid()}.tmp" for name, path in paths.items()}
+    files = {name: fs.open(tmp_path, "w") for name, tmp_path in tmp_paths.items()}
+    counts = dict.fromkeys(files, 0)
+    started = set()
+
+    def write(joined):
+        for (type_local, column), name in OUTPUTS.items():
+            rows = joined[joined["type_local"] == type_local].drop(
+                columns=[c for c in ("Risque_innond", "zone_niveau") if c != column]
+            )
+            rows.index = pd.RangeIndex(counts[name], counts[name] + len(rows))
+            rows.to_csv(files[name], header=name not in started)
+            started.add(name)
+            counts[name] += len(rows)
+
+    try:
+        with DepartmentPools(workers) as pools:
+            # Deux blocs en vol : la lecture du suivant recouvre le calcul du courant
+            pending = deque()
+            for chunk in chunks:
+                sales = select_sales(chunk)
+                pending.append((sales, submit_chunk(pools, base_url, sales, transformer)))
+                if len(pending) > 1:
+                    write(collect_chunk(*pending.popleft()))
+            while pending:
+                write(collect_chunk(*pending.popleft()))
+    except BaseException:
+        for name, f in files.items():
+            f.close()
+            if fs.exists(tmp_paths[name]):
+                fs.rm(tmp_paths[name])
+        raise
+
+    # Bases complètes : remplacement des précédentes
+    for name, f in files.items():
+        f.close()
+        fs.mv(tmp_paths[name], paths[name])
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Jointure spatiale DVF x aléas (bases finales de la page 4).")
+    parser.add_argument("source", nargs="?",
+                        help=f"Ventes à joindre (local ou URL fsspec) ; par défaut {SALES_FILENAME} "
+                             "du dossier des bases, écrit par sykinet.dvf_summary.")
+    parser.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    args = parser.parse_args(argv)
+
+    for name, n in run(args.source, args.base_url, args.workers, args.chunksize).items():
+        print(f"{name} : {n} lignes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Accès au stockage des données (bucket GCS via st_files_connection).
+
+Les lectures passent par un cache d'objets sur disque local : un objet n'est
+téléchargé qu'une fois par version (génération GCS / ETag), les lectures
+suivantes, y compris après un redémarrage, ne revalident que ses métadonnées.
+"""
+
+import os
+
+import fsspec
+import streamlit as st
+from st_files_connection import FilesConnection
+
+from sykinet.disk_cache import DiskCache
+
+# Dossier commun à toutes les bases dans le bucket
+BASE_PATH = "streamlit-sykinet/base sykinet/"
+
+# URL équivalente pour les traitements hors ligne (python -m sykinet.<module>)
+BASE_URL = "gs://" + BASE_PATH
+
+OBJECT_CACHE_DIR = os.environ.get("SYKINET_OBJECT_CACHE_DIR", ".cache/objects")
+OBJECT_CACHE_BYTES = int(os.environ.get("SYKINET_OBJECT_CACHE_BYTES", 2 * 1024 ** 3))
+
+
+def get_connection():
+    """
+    Renvoie la connexion GCS partagée (mise en cache par Streamlit).
+    """
+    return st.connection("gcs", type=FilesConnection)
+
+
+@st.cache_resource
+def get_object_cache():
+    """
+    Cache disque des objets du bucket, partagé par toutes les sessions du serveur.
+    """
+    return DiskCache(OBJECT_CACHE_DIR, OBJECT_CACHE_BYTES)
+
+
+def get_filesystem():
+    """
+    Renvoie le système de fichiers fsspec de la connexion GCS, derrière le cache d'objets.
+    """
+    return CachedFilesystem(get_connection().fs, get_object_cache())
+
+
+def data_path(filename, base_path=BASE_PATH):
+    """
+    Chemin complet d'un fichier de la base Sykinet dans le bucket.
+    """
+    return base_path + filename
+
+
+def filesystem_from_url(url):
+    """
+    Renvoie (système de fichiers, dossier) pour une URL fsspec (`gs://...`,
+    chemin local...). Le dossier renvoyé se termine par '/'.
+    """
+    fs, base_path = fsspec.core.url_to_fs(url)
+    return fs, base_path.rstrip("/") + "/"
+
+
+def object_version(fs, path):
+    """
+    Identifiant de version d'un objet (génération GCS, ETag ou date de
+    modification selon le système de fichiers), obtenu sans lire son contenu.
+    """
+    return _info_version(fs.info(path))
+
+
+def _info_version(info):
+    for key in ("generation", "etag", "ETag", "mtime", "LastModified", "updated", "created"):
+        if info.get(key):
+            return str(info[key])
+    return str(info.get("size"))
+
+
+class CachedFilesystem:
+    """
+    Système de fichiers fsspec dont les lectures sont servies par un cache
+    disque (`DiskCache`) indexé par chemin et version de l'objet.
+
+    Chaque ouverture en lecture revalide les métadonnées de l'objet (`info`) ;
+    le contenu n'est téléchargé que si cette version n'est pas déjà en cache.
+    Les écritures et les autres opérations sont déléguées telles quelles.
+    """
+
+    def __init__(self, fs, cache):
+        self.fs = fs
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.fs, name)
+
+    def open(self, path, mode="rb", **kwargs):
+        if "r" not in mode or "+" in mode:
+            return self.fs.open(path, mode, **kwargs)
+        info = self.fs.info(path)
+        if info.get("size") and info["size"] > self.cache.max_bytes:
+            return self.fs.open(path, mode, **kwargs)
+
+        key = self.cache.make_key(self.fs.protocol, path, _info_version(info))
+        local = self.cache.lookup(key)
+        if local is None:
+            local = self.cache.store(key, lambda tmp_path: self.fs.get_file(path, tmp_path))
+        try:
+            return fsspec.open(local, mode, **kwargs).open()
+        except FileNotFoundError:
+            # Évincée entre-temps par une lecture concurrente : nouveau téléchargement
+            local = self.cache.store(key, lambda tmp_path: self.fs.get_file(path, tmp_path))
+            return fsspec.open(local, mode, **kwargs).open()
@@ -0,0 +1,228 @@
+"""
+Pyramide de tuiles vectorielles (GeoJSON pré-calculé) des couches d'aléa.
+
+Le tuilage est fait hors ligne, département par département : pour chaque
+niveau de zoom, la couche est simplifiée à la résolution d'un pixel puis
+découpée selon la grille XYZ (Web Mercator). Les tuiles sont écrites sous
+`static/tiles/<couche>/<dept>/<z>/<x>/<y>.json`, servies telles quelles par
+Streamlit (`enableStaticServing`) ; la carte interactive de la page 2
+(pydeck `TileLayer`) ne télécharge que les tuiles visibles.
+
+    python -m sykinet.tiles --dept 33 --dept 75
+    python -m sykinet.tiles --workers 8            # tous les départements
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pydeck as pdk
+import shapely
+
+from sykinet.data import read_dataset
+from sykinet.departements import DEPARTEMENTS
+from sykinet.legends import LAYER_LEGENDS, rgba_255
+from sykinet.storage import BASE_URL, filesystem_from_url
+
+TILES_DIR = "static/tiles"
+# URL sous laquelle Streamlit sert le dossier `static/` de l'application
+TILES_URL = "/app/static/tiles"
+
+MIN_ZOOM = 6
+MAX_ZOOM = 12
+TILE_SIZE = 256
+
+# Coordonnées tronquées à 6 décimales (~10 cm) pour alléger les tuiles
+_COORD_PRECISION = re.compile(r"(\d\.\d{6})\d+")
+
+
+# ***************************************************************
+# Géométrie de la grille XYZ (Web Mercator)
+# ***************************************************************
+
+def lonlat_to_tile(lon, lat, z):
+    """
+    Indices (x, y) de la tuile contenant le point au zoom `z`.
+    """
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(z, x, y):
+    """
+    Emprise (lon_min, lat_min, lon_max, lat_max) d'une tuile.
+    """
+    n = 2 ** z
+
+    def lat(yy):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * yy / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def tiles_covering(bounds, z):
+    """
+    Itère sur les tuiles (x, y) du zoom `z` qui recouvrent l'emprise donnée.
+    """
+    minx, miny, maxx, maxy = bounds
+    x0, y0 = lonlat_to_tile(minx, maxy, z)
+    x1, y1 = lonlat_to_tile(maxx, miny, z)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield x, y
+
+
+def pixel_size_deg(z):
+    # Largeur d'un pixel (en degrés de longitude) au zoom z
+    return 360.0 / (TILE_SIZE * 2 ** z)
+
+
+# ***************************************************************
+# Construction de la pyramide
+# ***************************************************************
+
+def _features_json(geoms, codes, colors):
+    # Sérialisation vectorisée des géométries, propriétés ajoutées par concaténation
+    geojson = shapely.to_geojson(geoms)
+    props = [json.dumps({"code": str(c), "color": colors[c]}) for c in codes]
+    features = ",".join(
+        f'{{"type":"Feature","geometry":{g},"properties":{p}}}' for g, p in zip(geojson, props)
+    )
+    features = _COORD_PRECISION.sub(r"\1", features)
+    return f'{{"type":"FeatureCollection","features":[{features}]}}'
+
+
+def build_pyramid(gdf, layer, dept, out_dir=TILES_DIR, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """
+    Écrit la pyramide de tuiles d'une couche d'aléa départementale et renvoie
+    le nombre de tuiles écrites. Les tuiles vides ne sont pas écrites.
+    """
+    class_column, legend = LAYER_LEGENDS[layer]
+    colors = {code: rgba_255(color, 0.9) for code, (color, _) in legend.items()}
+
+    gdf = gdf[gdf[class_column].isin(list(legend))].to_crs("EPSG:4326")
+    geoms = np.asarray(gdf.geometry.array)
+    codes = gdf[class_column].to_numpy()
+    bounds = tuple(gdf.total_bounds)
+
+    layer_dir = os.path.join(out_dir, layer, dept)
+    n_tiles = 0
+    for z in range(min_zoom, max_zoom + 1):
+        # Simplification à un demi-pixel : invisible à ce zoom, topologie préservée
+        simplified = shapely.simplify(geoms, pixel_size_deg(z) / 2, preserve_topology=True)
+        tree = shapely.STRtree(simplified)
+        for x, y in tiles_covering(bounds, z):
+            tb = tile_bounds(z, x, y)
+            idx = tree.query(shapely.box(*tb))
+            if idx.size == 0:
+                continue
+            clipped = shapely.clip_by_rect(simplified[idx], *tb)
+            keep = ~shapely.is_empty(clipped)
+            if not keep.any():
+                continue
+            path = os.path.join(layer_dir, str(z), str(x), f"{y}.json")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(_features_json(clipped[keep], codes[idx][keep], colors))
+            n_tiles += 1
+
+    metadata = {
+        "layer": layer, "dept": dept, "bounds": bounds,
+        "min_zoom": min_zoom, "max_zoom": max_zoom, "tiles": n_tiles,
+    }
+    os.makedirs(layer_dir, exist_ok=True)
+    with open(os.path.join(layer_dir, "metadata.json"), "w") as f:
+        json.dump(metadata, f)
+    return n_tiles
+
+
+def _tile_department(args):
+    base_url, layer, dept, out_dir, min_zoom, max_zoom = args
+    fs, base_path = filesystem_from_url(base_url)
+    class_column, _ = LAYER_LEGENDS[layer]
+    gdf = read_dataset(fs, layer, dept, columns=(class_column,), base_path=base_path)
+    return layer, dept, build_pyramid(gdf, layer, dept, out_dir, min_zoom, max_zoom)
+
+
+# ***************************************************************
+# Affichage interactif (page 2)
+# ***************************************************************
+
+def read_metadata(layer, dept, tiles_dir=TILES_DIR):
+    """
+    Métadonnées de la pyramide d'un département, ou None si elle n'a pas été générée.
+    """
+    path = os.path.join(tiles_dir, layer, dept, "metadata.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def tile_deck(layer, dept, tiles_dir=TILES_DIR, tiles_url=TILES_URL, height=700):
+    """
+    Construit la carte pydeck d'une couche départementale à partir de sa
+    pyramide de tuiles, ou renvoie None si les tuiles sont absentes.
+    """
+    metadata = read_metadata(layer, dept, tiles_dir)
+    if metadata is None:
+        return None
+
+    minx, miny, maxx, maxy = metadata["bounds"]
+    extent = max(maxx - minx, (maxy - miny) * 1.5, 1e-6)
+    view_state = pdk.ViewState(
+        longitude=(minx + maxx) / 2,
+        latitude=(miny + maxy) / 2,
+        zoom=max(min(math.log2(360 / extent) + 0.5, metadata["max_zoom"]), 0),
+    )
+    tile_layer = pdk.Layer(
+        "TileLayer",
+        data=f"{tiles_url}/{layer}/{dept}/{{z}}/{{x}}/{{y}}.json",
+        min_zoom=metadata["min_zoom"],
+        max_zoom=metadata["max_zoom"],
+        extent=[minx, miny, maxx, maxy],
+        # Propriétés transmises au GeoJsonLayer de chaque tuile
+        get_fill_color="properties.color",
+        stroked=False,
+        pickable=True,
+    )
+    return pdk.Deck(
+        layers=[tile_layer],
+        initial_view_state=view_state,
+        map_style="light",
+        height=height,
+        tooltip={"text": "Classe : {code}"},
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère les tuiles vectorielles des couches d'aléa.")
+    parser.add_argument("--base-url", default=BASE_URL, help="Dossier des bases (local ou gs://...).")
+    parser.add_argument("--out", default=TILES_DIR, help=f"Dossier de sortie (défaut : {TILES_DIR}).")
+    parser.add_argument("--dept", action="append", help="Département(s) à traiter (défaut : tous).")
+    parser.add_argument("--layer", action="append", choices=sorted(LAYER_LEGENDS),
+                        help="Couche(s) à traiter (défaut : toutes).")
+    parser.add_argument("--min-zoom", type=int, default=MIN_ZOOM)
+    parser.add_argument("--max-zoom", type=int, default=MAX_ZOOM)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    tasks = [
+        (args.base_url, layer, dept, args.out, args.min_zoom, args.max_zoom)
+        for dept in (args.dept or DEPARTEMENTS)
+        for layer in (args.layer or sorted(LAYER_LEGENDS))
+    ]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for layer, dept, n_tiles in pool.map(_tile_department, tasks):
+            print(f"{layer} {dept} : {n_tiles} tuiles")
+
+
+if __name__ == "__main__":
+    main()
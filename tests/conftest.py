@@ -0,0 +1,62 @@
+import pytest
+from fsspec.implementations.memory import MemoryFileSystem
+
+from sykinet.disk_cache import DiskCache
+from sykinet.storage import CachedFilesystem, filesystem_from_url
+
+
+class VersionedMemoryFileSystem(MemoryFileSystem):
+    """
+    Stockage en mémoire qui se comporte comme le bucket GCS : chaque écriture
+    incrémente la génération de l'objet (`info()["generation"]`). Compte les
+    téléchargements (`get_file`).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.generations = {}
+        self.downloads = []
+
+    def pipe_file(self, path, value, **kwargs):
+        super().pipe_file(path, value, **kwargs)
+        path = self._strip_protocol(path)
+        self.generations[path] = self.generations.get(path, 0) + 1
+
+    def info(self, path, **kwargs):
+        info = super().info(path, **kwargs)
+        info["generation"] = self.generations.get(self._strip_protocol(path))
+        return info
+
+    def get_file(self, rpath, lpath, **kwargs):
+        self.downloads.append(self._strip_protocol(rpath))
+        return super().get_file(rpath, lpath, **kwargs)
+
+
+@pytest.fixture
+def memory_fs():
+    """
+    Système de fichiers `memory://` vide (le contenu est partagé au niveau de
+    la classe : il est vidé après chaque test).
+    """
+    fs, base_path = filesystem_from_url("memory://sykinet-tests")
+    yield fs, base_path
+    MemoryFileSystem.store.clear()
+    MemoryFileSystem.pseudo_dirs[:] = [""]
+
+
+@pytest.fixture
+def versioned_fs():
+    fs = VersionedMemoryFileSystem(skip_instance_cache=True)
+    yield fs
+    MemoryFileSystem.store.clear()
+    MemoryFileSystem.pseudo_dirs[:] = [""]
+
+
+@pytest.fixture
+def object_cache(tmp_path):
+    return DiskCache(str(tmp_path / "objects"), max_bytes=1024)
+
+
+@pytest.fixture
+def cached_fs(versioned_fs, object_cache):
+    return CachedFilesystem(versioned_fs, object_cache)
@@ -0,0 +1,106 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from sykinet.dataset_cache import DatasetCache
+
+
+def load_bytes(size, calls=None):
+    def load():
+        if calls is not None:
+            calls.append(size)
+        return b"x" * size
+    return load
+
+
+def test_eviction_follows_lru_order():
+    cache = DatasetCache(max_bytes=30)
+    for dataset in "abc":
+        cache.get_or_load(dataset, None, None, "v1", load_bytes(10))
+    # `a` relue : `b` devient la moins récemment utilisée
+    cache.get_or_load("a", None, None, "v1", load_bytes(10))
+    cache.get_or_load("d", None, None, "v1", load_bytes(10))
+    assert set(cache.stats()["datasets"]) == {"a", "c", "d"}
+
+    calls = []
+    cache.get_or_load("b", None, None, "v1", load_bytes(10, calls))
+    assert calls == [10]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 5, 2)
+    assert (stats["entries"], stats["bytes"]) == (3, 30)
+
+
+def test_entry_larger_than_cap_is_kept_alone():
+    cache = DatasetCache(max_bytes=30)
+    cache.get_or_load("a", None, None, "v1", load_bytes(10))
+    assert cache.get_or_load("b", None, None, "v1", load_bytes(50)) == b"x" * 50
+    assert cache.stats()["datasets"] == {"b": 50}
+
+
+def test_invalidate_by_dataset_and_department():
+    cache = DatasetCache(max_bytes=1000)
+    for dataset in ("inondation", "secheresse"):
+        for dept in ("33", "34"):
+            cache.get_or_load(dataset, dept, None, "v1", load_bytes(10))
+
+    assert cache.invalidate(dataset="inondation", dept="33") == 1
+    assert cache.invalidate(dept="34") == 2
+    assert cache.stats()["entries"] == 1
+    assert cache.invalidate(dataset="secheresse") == 1
+    assert cache.invalidate() == 0
+    assert cache.stats()["invalidations"] == 4
+
+
+def test_new_version_replaces_stale_entry_only():
+    cache = DatasetCache(max_bytes=1000)
+    cache.get_or_load("inondation", "33", ("gridcode",), "v1", load_bytes(10))
+    cache.get_or_load("inondation", "33", None, "v1", load_bytes(20))
+    cache.get_or_load("inondation", "33", ("gridcode",), "v2", load_bytes(30))
+
+    # Seule la variante rechargée perd sa version périmée
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["invalidations"]) == (2, 50, 1)
+    calls = []
+    cache.get_or_load("inondation", "33", None, "v1", load_bytes(20, calls))
+    assert calls == []
+
+
+def test_concurrent_sessions_load_once():
+    cache = DatasetCache(max_bytes=1000)
+    calls = []
+    start = threading.Barrier(8)
+
+    def load():
+        calls.append(1)
+        time.sleep(0.05)
+        return np.arange(10)
+
+    results = [None] * 8
+
+    def session(i):
+        start.wait()
+        results[i] = cache.get_or_load("inondation", "33", None, "v1", load)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(np.array_equal(result, np.arange(10)) for result in results)
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 7
+
+
+def test_sessions_cannot_modify_shared_entry():
+    cache = DatasetCache(max_bytes=10 ** 6)
+    df = cache.get_or_load("base", None, None, "v1", lambda: pd.DataFrame({"a": [1.0, 2.0]}))
+    df["b"] = 0
+    df.loc[0, "a"] = 9.0
+    df.drop(columns="a", inplace=True)
+    assert cache.get_or_load("base", None, None, "v1", None).equals(pd.DataFrame({"a": [1.0, 2.0]}))
+
+    values = cache.get_or_load("tableau", None, None, "v1", lambda: np.zeros(3))
+    assert not values.flags.writeable
@@ -0,0 +1,61 @@
+import os
+
+from sykinet.disk_cache import DiskCache
+
+
+def test_get_put_roundtrip(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=100)
+    assert cache.get("a") is None
+    cache.put("a", b"contenu")
+    assert cache.get("a") == b"contenu"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_eviction_follows_lru_order(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=30)
+    for key in "abc":
+        cache.put(key, b"x" * 10)
+    # `a` relue : `b` devient la moins récemment utilisée
+    assert cache.lookup("a") is not None
+    cache.put("d", b"x" * 10)
+    assert "b" not in cache
+    assert not os.path.exists(cache.path("b"))
+    assert all(key in cache for key in "acd")
+    cache.put("e", b"x" * 10)
+    assert "c" not in cache
+    assert cache.stats() == {
+        "hits": 1, "misses": 0, "evictions": 2, "entries": 3, "bytes": 30, "max_bytes": 30,
+    }
+
+
+def test_entry_larger_than_cap_is_kept_alone(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=30)
+    cache.put("a", b"x" * 10)
+    cache.put("b", b"x" * 50)
+    assert "a" not in cache
+    assert cache.get("b") == b"x" * 50
+
+
+def test_reopen_restores_lru_order_from_mtime(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=30)
+    for i, key in enumerate("abc"):
+        cache.put(key, b"x" * 10)
+        os.utime(cache.path(key), (1_000_000 + i, 1_000_000 + i))
+    os.utime(cache.path("a"), (2_000_000, 2_000_000))
+
+    reopened = DiskCache(str(tmp_path), max_bytes=30)
+    assert reopened.stats()["bytes"] == 30
+    reopened.put("d", b"x" * 10)
+    assert "b" not in reopened
+    assert all(key in reopened for key in "acd")
+
+
+def test_reopen_with_smaller_cap_evicts_oldest(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=30)
+    for i, key in enumerate("abc"):
+        cache.put(key, b"x" * 10)
+        os.utime(cache.path(key), (1_000_000 + i, 1_000_000 + i))
+
+    reopened = DiskCache(str(tmp_path), max_bytes=20)
+    assert "a" not in reopened
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(reopened.path(key)) for key in "bc")
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sykinet.dvf_summary import MULTI_LABEL, SINGLE_LABEL, DvfSummary, summarise
+
+
+def dvf_rows(rng, n_mutations, max_rows=12):
+    """
+    Lignes DVF triées par `id_mutation` : mutations de 1 à `max_rows` lignes,
+    dont une part de mutations d'une seule ligne.
+    """
+    lengths = np.where(rng.random(n_mutations) < 0.5, 1, rng.integers(1, max_rows + 1, n_mutations))
+    ids = np.repeat([f"2023-{i:06d}" for i in range(n_mutations)], lengths)
+    return pd.DataFrame({
+        "id_mutation": ids,
+        "type_local": rng.choice(["Maison", "Appartement", "Dépendance"], len(ids)),
+        "nature_mutation": rng.choice(["Vente", "Echange"], len(ids)),
+    })
+
+
+def expected_counts(rows):
+    counts = rows["id_mutation"].value_counts()
+    return int((counts == 1).sum()), int(counts[counts > 1].sum())
+
+
+def summarise_chunks(rows, chunksize):
+    summary = DvfSummary()
+    for start in range(0, len(rows), chunksize):
+        summary = summary.merge(DvfSummary.from_chunk(rows.iloc[start:start + chunksize]))
+    return summary.finish()
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("chunksize", range(1, 7))
+def test_merge_matches_value_counts(seed, chunksize):
+    rows = dvf_rows(np.random.default_rng(seed), 200)
+    summary = summarise_chunks(rows, chunksize)
+    assert (summary.single_rows, summary.multi_rows) == expected_counts(rows)
+    assert summary.type_local == rows["type_local"].value_counts().to_dict()
+    assert summary.nature_mutation == rows["nature_mutation"].value_counts().to_dict()
+
+
+def test_mutation_spanning_many_chunks():
+    # 11 lignes en blocs de 2 : la mutation B couvre cinq blocs
+    rows = pd.DataFrame({"id_mutation": ["A"] + ["B"] * 9 + ["C"], "type_local": "Maison", "nature_mutation": "Vente"})
+    for chunksize in (1, 2, 3):
+        summary = summarise_chunks(rows, chunksize)
+        assert (summary.single_rows, summary.multi_rows) == (2, 9)
+
+
+def test_chunk_with_a_single_mutation():
+    rows = pd.DataFrame({"id_mutation": ["A", "A", "B", "C", "C", "C"],
+                         "type_local": "Maison", "nature_mutation": "Vente"})
+    # Bloc du milieu réduit à la mutation B, bloc isolé réduit à une ligne
+    chunks = [rows.iloc[:2], rows.iloc[2:3], rows.iloc[3:]]
+    middle = DvfSummary.from_chunk(chunks[1])
+    assert middle.edges == [("B", 1)]
+    assert (middle.single_rows, middle.multi_rows) == (0, 0)
+
+    summary = DvfSummary()
+    for chunk in chunks:
+        summary = summary.merge(DvfSummary.from_chunk(chunk))
+    summary = summary.finish()
+    assert (summary.single_rows, summary.multi_rows) == (1, 5)
+
+
+def test_merge_is_associative():
+    rows = dvf_rows(np.random.default_rng(7), 100)
+    parts = [DvfSummary.from_chunk(rows.iloc[start:start + 4]) for start in range(0, len(rows), 4)]
+    left = DvfSummary()
+    for part in parts:
+        left = left.merge(part)
+    # Combinaison par moitiés successives (ordre du fichier conservé)
+    while len(parts) > 1:
+        parts = [parts[i].merge(parts[i + 1]) if i + 1 < len(parts) else parts[i] for i in range(0, len(parts), 2)]
+    assert left.finish() == parts[0].finish()
+
+
+def test_empty_chunk():
+    rows = pd.DataFrame({"id_mutation": ["A", "A"], "type_local": "Maison", "nature_mutation": "Vente"})
+    empty = DvfSummary.from_chunk(rows.iloc[:0])
+    summary = DvfSummary.from_chunk(rows.iloc[:1]).merge(empty).merge(DvfSummary.from_chunk(rows.iloc[1:]))
+    assert summary.finish().multi_rows == 2
+
+
+def test_summarise_writes_page3_tables(tmp_path, memory_fs):
+    rows = dvf_rows(np.random.default_rng(3), 300)
+    source = tmp_path / "dvf.csv"
+    rows.to_csv(source, index=False)
+    fs, base_path = memory_fs
+
+    summary = summarise(str(source), "memory://" + base_path, workers=2, chunksize=7)
+    assert (summary.single_rows, summary.multi_rows) == expected_counts(rows)
+    with fs.open(base_path + "df_doublons.csv") as f:
+        doublons = pd.read_csv(f)
+    assert doublons[[SINGLE_LABEL, MULTI_LABEL]].iloc[0].tolist() == list(expected_counts(rows))
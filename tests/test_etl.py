@@ -0,0 +1,25 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from sykinet.etl import dvf_path, dvf_source, split_dvf
+
+
+def test_split_dvf_keeps_string_schema_across_chunks(tmp_path, memory_fs):
+    fs, base_path = memory_fs
+    # Colonne `lot1_numero` vide dans le premier bloc du 33, remplie ensuite
+    rows = pd.DataFrame({
+        "id_mutation": ["a", "b", "c", "d", "e"],
+        "code_departement": ["33", "33", "75", "33", "75"],
+        "lot1_numero": [None, None, "4", "12", None],
+        "valeur_fonciere": ["1000", "2000", "3000", "4000", "5000"],
+    })
+    rows.to_csv(dvf_source(tmp_path), index=False, compression="gzip")
+
+    counts = split_dvf(str(tmp_path), "memory://sykinet-tests", chunksize=2)
+
+    assert counts == {"33": 3, "75": 2}
+    with fs.open(dvf_path("33", base_path), "rb") as f:
+        table = pq.read_table(f)
+    assert table.schema == pa.schema([(column, pa.string()) for column in rows.columns])
+    assert table.column("lot1_numero").to_pylist() == [None, None, "12"]
@@ -0,0 +1,63 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from sykinet.bench import dept_box, voronoi_layer
+from sykinet.exposure import PCT_COLUMNS, class_areas, overlay_layer
+from sykinet.geoparquet import CRS
+
+
+@pytest.fixture(scope="module")
+def communes():
+    rng = np.random.default_rng(18)
+    cells = voronoi_layer(rng, dept_box(0), 40)
+    return gpd.GeoDataFrame({"code_commune": [f"33{i:03d}" for i in range(len(cells))]}, geometry=cells, crs=CRS)
+
+
+@pytest.fixture(scope="module")
+def hazard():
+    """
+    Pavage plus fin que les communes (polygones contenus ou à cheval), des
+    disques qui se chevauchent et une classe hors légende.
+    """
+    rng = np.random.default_rng(81)
+    box = dept_box(0)
+    cells = voronoi_layer(rng, box, 600)
+    centres = shapely.points(rng.uniform(*box.bounds[::2], 20), rng.uniform(*box.bounds[1::2], 20))
+    geoms = np.concatenate([cells, shapely.buffer(centres, rng.uniform(500, 5_000, 20))])
+    return gpd.GeoDataFrame({"gridcode": rng.choice([0, 1, 2, 7], len(geoms), p=[0.4, 0.3, 0.25, 0.05])},
+                            geometry=geoms, crs=CRS)
+
+
+def overlay_shares(communes, hazard):
+    """
+    Référence : parts de chaque classe par commune via `gpd.overlay`.
+    """
+    pieces = gpd.overlay(communes, hazard, how="intersection", keep_geom_type=True)
+    pieces["area"] = pieces.area
+    areas = pieces.pivot_table(index="code_commune", columns="gridcode", values="area", aggfunc="sum")
+    areas = areas.reindex(index=communes["code_commune"], columns=list(PCT_COLUMNS["inondation"]), fill_value=0)
+    return areas.fillna(0).to_numpy() / communes.area.to_numpy()[:, None]
+
+
+def test_overlay_layer_matches_gpd_overlay(communes, hazard):
+    result = overlay_layer(communes, hazard, "inondation")
+    expected = overlay_shares(communes, hazard)
+
+    shares = result[list(PCT_COLUMNS["inondation"].values())].to_numpy(dtype=float)
+    np.testing.assert_allclose(shares, expected, atol=1e-6)
+    # NIVEAU : part à risque parmi les zones couvertes par la couche
+    np.testing.assert_allclose(result["NIVEAU"], expected[:, 1:].sum(axis=1) / expected.sum(axis=1), atol=1e-6)
+
+
+def test_class_areas_counts_contained_and_crossing_polygons():
+    zones = np.array([shapely.box(0, 0, 10, 10), shapely.box(10, 0, 20, 10)])
+    polygons = np.array([
+        shapely.box(2, 2, 4, 4),     # contenu dans la première zone
+        shapely.box(8, 0, 12, 10),   # à cheval sur les deux zones
+        shapely.box(0, 0, 20, 10),   # hors légende
+    ])
+    areas = class_areas(zones, polygons, np.array([0, 1, -1]), 2)
+    np.testing.assert_allclose(areas, [[4, 20], [0, 20]])
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sykinet.filters import TableIndex, take
+
+
+def random_table(rng, n_rows):
+    """
+    Table de la page 4 en miniature : valeurs manquantes dans chaque colonne,
+    valeurs répétées (bornes d'intervalle atteintes exactement).
+    """
+    surface = rng.integers(10, 200, n_rows).astype(float)
+    valeur = np.round(rng.lognormal(12, 0.5, n_rows), -3)
+    dept = rng.choice(["33", "34", "75", None], n_rows, p=[0.4, 0.3, 0.25, 0.05])
+    classe = rng.choice(["Faible", "Moyen", "Fort", None], n_rows, p=[0.5, 0.3, 0.15, 0.05])
+    surface[rng.random(n_rows) < 0.1] = np.nan
+    valeur[rng.random(n_rows) < 0.05] = np.nan
+    return pd.DataFrame({"surface": surface, "valeur_fonciere": valeur, "code_departement": dept, "classe": classe})
+
+
+def random_bounds(rng, values):
+    # Intervalle aléatoire : étroit, vide, couvrant ou sur des valeurs présentes
+    finite = values[~np.isnan(values)]
+    if len(finite) == 0:
+        return (0.0, 1.0)
+    kind = rng.integers(6)
+    if kind == 0:
+        return (finite.min() - 1, finite.max() + 1)
+    if kind == 1:
+        return (finite.max() + 1, finite.max() + 2)
+    return tuple(np.sort(rng.choice(finite, 2)))
+
+
+def random_selection(rng, values):
+    present = sorted(set(values.dropna()))
+    return list(rng.choice(present + ["Inconnu"], rng.integers(1, len(present) + 2), replace=False))
+
+
+def reference_rows(df, ranges, categories):
+    """
+    Sélection par masques booléens, avec la règle de `covers` : un critère qui
+    retient toutes les valeurs présentes est ignoré (valeurs manquantes comprises).
+    """
+    mask = np.ones(len(df), dtype=bool)
+    filtered = False
+    for column, (low, high) in ranges.items():
+        values = df[column]
+        if values.dropna().between(low, high).all():
+            continue
+        mask &= values.between(low, high).to_numpy()
+        filtered = True
+    for column, selected in categories.items():
+        values = df[column]
+        if set(values.dropna()) <= set(selected):
+            continue
+        mask &= values.isin(selected).to_numpy()
+        filtered = True
+    return np.flatnonzero(mask) if filtered else None
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_select_matches_boolean_masks(seed):
+    rng = np.random.default_rng(seed)
+    df = random_table(rng, int(rng.integers(0, 400)))
+    index = TableIndex(df, ranges=("surface", "valeur_fonciere"), categories=("code_departement", "classe"))
+
+    for _ in range(20):
+        ranges = {column: random_bounds(rng, df[column].to_numpy())
+                  for column in ("surface", "valeur_fonciere") if rng.random() < 0.7}
+        categories = {column: random_selection(rng, df[column])
+                      for column in ("code_departement", "classe") if rng.random() < 0.7}
+        rows = index.select(ranges, categories)
+        expected = reference_rows(df, ranges, categories)
+
+        if expected is None:
+            assert rows is None
+        else:
+            np.testing.assert_array_equal(rows, expected)
+            assert len(take(df, rows)) == len(expected)
+
+
+def test_select_empty_and_all_missing_columns():
+    df = pd.DataFrame({"surface": [np.nan, np.nan], "classe": [None, None]})
+    index = TableIndex(df, ranges=("surface",), categories=("classe",))
+
+    # Colonnes sans valeur : tout intervalle et toute sélection les couvrent
+    assert index.select({"surface": (0, 1)}, {"classe": []}) is None
+
+    empty = TableIndex(df.iloc[:0], ranges=("surface",), categories=("classe",))
+    assert empty.select({"surface": (0, 1)}, {"classe": ["Fort"]}) is None
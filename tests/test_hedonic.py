@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sykinet.features import FEATURE_SPECS
+from sykinet.hedonic import fit, identified_columns
+
+SPEC = FEATURE_SPECS["base_sech_final"]
+EFFECTS = {1.0: -0.05, 2.0: -0.10, 3.0: -0.20}
+
+
+def sales(rng, n=20_000, n_communes=200):
+    """
+    Ventes dont le prix au m² suit exactement le modèle de la régression :
+    effet de commune, effet de classe (`EFFECTS`, référence 0), élasticité
+    -0.2 à la surface.
+    """
+    commune = rng.integers(n_communes, size=n)
+    # Classes plus fréquentes dans les communes chères : biais sans effets fixes
+    location = rng.normal(8, 0.5, n_communes)[commune]
+    niveau = np.clip(np.round(rng.normal(1.5 + (location - 8), 1.0)), 0, 3)
+    surface = rng.lognormal(4.2, 0.4, n)
+    log_price = location + pd.Series(niveau).map(EFFECTS).fillna(0).to_numpy() \
+        - 0.2 * np.log(surface) + rng.normal(0, 0.1, n)
+    return pd.DataFrame({
+        "zone_niveau": niveau,
+        "surface_reelle_bati": surface,
+        "valeur_fonciere": np.exp(log_price) * surface,
+        "code_departement": (commune // 50).astype(str),
+        "code_commune": commune.astype(str),
+    })
+
+
+def coefficients(result):
+    return result.table.set_index("Variable")["Coefficient"]
+
+
+def test_recovers_effects_with_commune_fixed_effects():
+    result = fit(sales(np.random.default_rng(0)), SPEC, "commune")
+    beta = coefficients(result)
+    assert result.reference == "0.0"
+    for niveau, effect in EFFECTS.items():
+        assert beta[f"zone_niveau : {niveau}"] == pytest.approx(effect, abs=0.01)
+    assert beta["log(surface)"] == pytest.approx(-0.2, abs=0.01)
+    assert (result.table["Écart-type"] > 0).all()
+    assert result.n_groups == 200
+
+
+def test_collinear_regressor_is_dropped():
+    df = sales(np.random.default_rng(1))
+    # Surface fixée par la classe : log(surface) colinéaire aux indicatrices
+    df["surface_reelle_bati"] = 40.0 + 20 * df["zone_niveau"]
+    result = fit(df, SPEC, "commune")
+    assert list(result.table["Variable"]) == [f"zone_niveau : {niveau}" for niveau in EFFECTS]
+    assert np.isfinite(result.table[["Coefficient", "Écart-type"]].to_numpy()).all()
+
+
+def test_class_constant_within_groups_is_dropped():
+    df = sales(np.random.default_rng(2))
+    # Classe 3 présente dans une seule commune, pour toutes ses ventes
+    df.loc[df["zone_niveau"] == 3, "zone_niveau"] = 2.0
+    df.loc[df["code_commune"] == "7", "zone_niveau"] = 3.0
+    names = list(fit(df, SPEC, "commune").table["Variable"])
+    assert "zone_niveau : 3.0" not in names
+    assert "zone_niveau : 2.0" in names
+
+
+def test_single_group_has_no_robust_errors():
+    df = sales(np.random.default_rng(3), n=500)
+    df["code_departement"] = "33"
+    result = fit(df, SPEC, "departement")
+    assert result.n_groups == 1
+    assert np.isfinite(result.table["Coefficient"]).all()
+    assert result.table["Écart-type"].isna().all()
+
+
+def test_too_few_observations():
+    df = sales(np.random.default_rng(4), n=50)
+    # Une vente par commune : tous les groupes sont des singletons
+    df["code_commune"] = np.arange(len(df)).astype(str)
+    with pytest.raises(ValueError):
+        fit(df, SPEC, "commune")
+    with pytest.raises(ValueError):
+        fit(df.iloc[:0], SPEC, "departement")
+
+
+def test_identified_columns():
+    rng = np.random.default_rng(5)
+    a, b = rng.normal(size=100), rng.normal(size=100)
+    X = np.column_stack([a, np.zeros(100), b, 2 * a - b, rng.normal(size=100)])
+    assert identified_columns(X).tolist() == [True, False, True, False, True]
+    assert identified_columns(X[:2]).tolist() == [True, False, True, False, False]
+    assert identified_columns(X[:0]).tolist() == [False] * 5
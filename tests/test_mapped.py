@@ -0,0 +1,120 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+
+from sykinet.bench import dept_box, voronoi_layer, write_geo
+from sykinet.geoparquet import CRS
+from sykinet.lookup import LayerIndex, index_frame
+from sykinet.mapped import NODE_SIZE, build_mapped, open_mapped, pack_rtree, polygon_parts
+from sykinet.raster import NODATA, rasterize_layer
+
+
+def hazard_layer(rng, n_polygons=2_000):
+    """
+    Couche d'inondation synthétique : pavage de Voronoï, plus des polygones
+    troués, des multipolygones et des disques qui recouvrent le pavage (le
+    rang dans la couche départage les recouvrements) ; une partie des
+    polygones porte une classe hors légende.
+    """
+    box = dept_box(0)
+    cells = voronoi_layer(rng, box, n_polygons)
+    centres = shapely.points(rng.uniform(*box.bounds[::2], 40), rng.uniform(*box.bounds[1::2], 40))
+    discs = shapely.buffer(centres, rng.uniform(1_000, 5_000, 40))
+    holed = shapely.difference(discs[:20], shapely.buffer(centres[:20], 500))
+    multi = shapely.multipolygons([[disc, shapely.buffer(disc, -200).envelope] for disc in discs[20:30]])
+    geoms = np.concatenate([holed, cells[: n_polygons // 2], multi, discs[30:], cells[n_polygons // 2:]])
+    classes = rng.choice([0, 1, 2, 9], len(geoms), p=[0.4, 0.3, 0.25, 0.05])
+    return gpd.GeoDataFrame({"gridcode": classes, "dep": "33"}, geometry=geoms, crs=CRS)
+
+
+def build(gdf, tmp_path, memory_fs, dept="33"):
+    fs, base_path = memory_fs
+    write_geo(fs, gdf, "inondation", dept, base_path)
+    return open_mapped(build_mapped(fs, "inondation", dept, base_path, str(tmp_path), force=True))
+
+
+@pytest.fixture(scope="module")
+def layer_gdf():
+    return hazard_layer(np.random.default_rng(0))
+
+
+@pytest.fixture
+def mapped(layer_gdf, tmp_path, memory_fs):
+    return build(layer_gdf, tmp_path, memory_fs)
+
+
+def test_locate_matches_strtree_index(mapped, layer_gdf):
+    rng = np.random.default_rng(1)
+    minx, miny, maxx, maxy = dept_box(0).buffer(2_000).bounds
+    x, y = rng.uniform(minx, maxx, 200_000), rng.uniform(miny, maxy, 200_000)
+    expected = LayerIndex.from_frame(index_frame(layer_gdf, "gridcode"), "inondation").locate(shapely.points(x, y))
+    result = mapped.locate_xy(x, y)
+    assert (result == expected).all()
+    # Toutes les situations sont représentées : hors couche, hors légende, classes
+    assert set(np.unique(result)) == {-1, 0, 1, 2}
+
+
+def test_query_bbox_matches_brute_force(mapped):
+    bounds = shapely.bounds(mapped.geometries(np.arange(len(mapped))))
+    rng = np.random.default_rng(2)
+    minx, miny, maxx, maxy = dept_box(0).bounds
+    for _ in range(50):
+        x0, y0 = rng.uniform(minx - 5_000, maxx), rng.uniform(miny - 5_000, maxy)
+        bbox = (x0, y0, x0 + rng.uniform(0, 20_000), y0 + rng.uniform(0, 20_000))
+        expected = np.flatnonzero((bounds[:, 0] <= bbox[2]) & (bounds[:, 2] >= bbox[0])
+                                  & (bounds[:, 1] <= bbox[3]) & (bounds[:, 3] >= bbox[1]))
+        np.testing.assert_array_equal(mapped.query_bbox(bbox), expected)
+    assert len(mapped.query_bbox((0, 0, 1, 1))) == 0
+
+
+def test_rasterize_matches_rasterize_layer(mapped, layer_gdf):
+    for width_px in (97, 400):
+        expected = rasterize_layer(layer_gdf, "gridcode", [0, 1, 2], width_px)
+        result = mapped.rasterize(width_px)
+        assert result.resolution == expected.resolution
+        np.testing.assert_array_equal(result.grid, expected.grid)
+
+
+def test_geometries_roundtrip(mapped, layer_gdf):
+    parts, ordre = polygon_parts(layer_gdf)
+    np.testing.assert_array_equal(mapped.ordre, ordre)
+    assert shapely.equals_exact(mapped.geometries(np.arange(len(mapped))), parts).all()
+
+
+def test_empty_layer(tmp_path, memory_fs):
+    gdf = gpd.GeoDataFrame({"gridcode": np.array([], dtype=np.int64), "dep": []},
+                           geometry=gpd.GeoSeries([], crs=CRS), crs=CRS)
+    parts, ordre = polygon_parts(gdf)
+    assert len(parts) == 0 and ordre.dtype.kind == "i"
+
+    mapped = build(gdf, tmp_path, memory_fs)
+    assert len(mapped) == 0
+    assert (mapped.locate_xy(np.array([4e5, 5e5]), np.array([6.4e6, 6.5e6])) == -1).all()
+    assert len(mapped.query_bbox((0, 0, 1e7, 1e7))) == 0
+    assert len(mapped.geometries([])) == 0
+    raster = mapped.rasterize(50)
+    assert (raster.grid == NODATA).all()
+    np.testing.assert_array_equal(raster.grid, rasterize_layer(gdf, "gridcode", [0, 1, 2], 50).grid)
+
+
+def test_single_polygon_layer(tmp_path, memory_fs):
+    gdf = gpd.GeoDataFrame({"gridcode": [1], "dep": "33"}, geometry=[dept_box(0)], crs=CRS)
+    mapped = build(gdf, tmp_path, memory_fs)
+    minx, miny, maxx, maxy = dept_box(0).bounds
+    result = mapped.locate_xy(np.array([minx + 1, maxx + 1]), np.array([miny + 1, maxy - 1]))
+    assert result.tolist() == [1, -1]
+    assert (mapped.rasterize(20).grid == 1).all()
+
+
+@pytest.mark.parametrize("n", [0, 1, NODE_SIZE, NODE_SIZE + 1, NODE_SIZE ** 2 + 3])
+def test_pack_rtree_levels(n):
+    bounds = np.random.default_rng(n).uniform(0, 1, (n, 4))
+    tree, offsets = pack_rtree(bounds)
+    assert tree.shape == (4, offsets[-1])
+    np.testing.assert_array_equal(tree[:, :n].T, bounds)
+    # Niveau supérieur : au plus NODE_SIZE nœuds, qui couvrent toutes les feuilles
+    top = tree[:, offsets[-2]:offsets[-1]]
+    assert top.shape[1] <= NODE_SIZE
+    if n:
+        assert top[0].min() == bounds[:, 0].min() and top[2].max() == bounds[:, 2].max()
@@ -0,0 +1,34 @@
+import threading
+from functools import partial
+
+from sykinet.prefetch import Prefetcher, neighbours, warm_department
+
+
+def test_rebuilt_warmup_joins_the_call_in_flight():
+    release = threading.Event()
+    calls = []
+
+    def load(layer, dept_code, columns=None, **kwargs):
+        release.wait(5)
+        calls.append((layer, dept_code, columns, kwargs))
+
+    layers = (("inondation", ("gridcode",)), ("secheresse", ("ALEA",)))
+    prefetcher = Prefetcher(max_workers=2)
+    # Même appel reconstruit à chaque exécution du script : une seule tâche
+    first = prefetcher.submit(partial(warm_department, load, "33", layers, shared=True))
+    second = prefetcher.submit(partial(warm_department, load, "33", tuple(layers), shared=True))
+    other = prefetcher.submit(partial(warm_department, load, "34", layers[:1], shared=True))
+    release.set()
+
+    assert second is first
+    first.result(5), other.result(5)
+    assert sorted(calls) == [
+        ("inondation", "33", ("gridcode",), {"shared": True}),
+        ("inondation", "34", ("gridcode",), {"shared": True}),
+        ("secheresse", "33", ("ALEA",), {"shared": True}),
+    ]
+
+
+def test_neighbours_stay_in_selector():
+    assert neighbours("01") == ["02"]
+    assert neighbours("02", distance=2) == ["01", "03", "04"]
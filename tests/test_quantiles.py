@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from matplotlib.cbook import boxplot_stats
+
+from sykinet.quantiles import CAPACITY, QuantileSketch, box_stats
+
+BOX_QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+def rank_error(sorted_values, estimates, q):
+    n = len(sorted_values)
+    ranks = (np.searchsorted(sorted_values, estimates, side="left")
+             + np.searchsorted(sorted_values, estimates, side="right")) / (2 * n)
+    return np.abs(ranks - q)
+
+
+@pytest.fixture(scope="module")
+def lognormal_parts():
+    rng = np.random.default_rng(0)
+    return [rng.lognormal(8, 0.5, rng.integers(1_000, 20_000)) for _ in range(50)]
+
+
+def test_merged_sketch_rank_error(lognormal_parts):
+    sketch = QuantileSketch.from_values(lognormal_parts[0])
+    for part in lognormal_parts[1:]:
+        sketch = sketch.merge(QuantileSketch.from_values(part))
+    values = np.sort(np.concatenate(lognormal_parts))
+
+    assert len(sketch.values) <= CAPACITY
+    assert sketch.count == len(values)
+    assert (sketch.min, sketch.max) == (values[0], values[-1])
+    # Environ 2e-5 sur les quantiles des box plots
+    assert rank_error(values, sketch.quantile(BOX_QUANTILES), BOX_QUANTILES).max() < 1e-4
+    grid = np.linspace(0.001, 0.999, 999)
+    assert rank_error(values, sketch.quantile(grid), grid).max() < 1e-3
+
+
+def test_merge_order_does_not_matter(lognormal_parts):
+    sketches = [QuantileSketch.from_values(part) for part in lognormal_parts[:10]]
+    forward, backward = sketches[0], sketches[-1]
+    for sketch in sketches[1:]:
+        forward = forward.merge(sketch)
+    for sketch in sketches[-2::-1]:
+        backward = backward.merge(sketch)
+    values = np.sort(np.concatenate(lognormal_parts[:10]))
+    # Les centroïdes dépendent de l'ordre des fusions, pas la précision
+    for merged in (forward, backward):
+        assert rank_error(values, merged.quantile(BOX_QUANTILES), BOX_QUANTILES).max() < 5e-4
+
+
+def test_exact_below_capacity():
+    values = np.random.default_rng(1).lognormal(8, 0.5, 500)
+    sketch = QuantileSketch.from_values(values[:200]).merge(QuantileSketch.from_values(values[200:]))
+    assert sketch.exact
+    np.testing.assert_allclose(sketch.quantile(BOX_QUANTILES), np.quantile(values, BOX_QUANTILES))
+
+    # Mêmes statistiques que Matplotlib tant que l'esquisse est exacte
+    expected = boxplot_stats(values)[0]
+    stats = sketch.box_stats("classe")
+    for key in ("med", "q1", "q3", "iqr", "whislo", "whishi", "mean"):
+        assert stats[key] == pytest.approx(expected[key])
+    np.testing.assert_allclose(stats["fliers"], np.unique(expected["fliers"]))
+
+
+def test_non_finite_values_are_ignored():
+    sketch = QuantileSketch.from_values([1.0, np.nan, 3.0, np.inf, -np.inf])
+    assert sketch.count == 2
+    assert sketch.quantile(0.5) == 2.0
+
+
+def test_empty_sketch():
+    empty = QuantileSketch.from_values([])
+    assert empty.count == 0
+    assert np.isnan(empty.quantile(0.5))
+    assert np.isnan(empty.quantile([0.25, 0.75])).all()
+
+    stats = empty.box_stats("vide")
+    assert all(np.isnan(stats[key]) for key in ("med", "q1", "q3", "whislo", "whishi", "mean"))
+    assert len(stats["fliers"]) == 0
+
+    sketch = QuantileSketch.from_values([1.0, 2.0, 3.0])
+    for merged in (empty.merge(sketch), sketch.merge(empty)):
+        assert (merged.count, merged.min, merged.max) == (3, 1.0, 3.0)
+        assert merged.quantile(0.5) == 2.0
+
+
+def test_box_stats_skips_empty_classes():
+    sketches = {
+        ("Faible", "33"): QuantileSketch.from_values([1.0, 2.0, 3.0]),
+        ("Fort", "33"): QuantileSketch.from_values([]),
+        ("Fort", "34"): QuantileSketch.from_values([np.nan]),
+        ("Moyen", "34"): QuantileSketch.from_values([4.0, 5.0]),
+    }
+    positions, stats = box_stats(sketches, order=["Faible", "Moyen", "Fort"])
+    assert positions == [0, 1]
+    assert [s["label"] for s in stats] == ["Faible", "Moyen"]
+
+    positions, stats = box_stats(sketches, depts=["33"])
+    assert [s["label"] for s in stats] == ["Faible"]
+    assert box_stats(sketches, classes=["Fort"]) == ([], [])
@@ -0,0 +1,78 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+
+from sykinet.bench import dept_box, voronoi_layer
+from sykinet.geoparquet import CRS
+from sykinet.raster import NODATA, rasterize, rasterize_layer
+
+
+def pixel_centres(raster):
+    height, width = raster.grid.shape
+    minx, _, _, maxy = raster.bounds
+    x = minx + (np.arange(width) + 0.5) * raster.resolution
+    y = maxy - (np.arange(height) + 0.5) * raster.resolution
+    return np.meshgrid(x, y)
+
+
+def expected_grid(geoms, codes, raster):
+    """
+    Vérité terrain : code du dernier polygone contenant le centre de chaque
+    pixel (`shapely.contains_xy`), NODATA hors de tout polygone.
+    """
+    xx, yy = pixel_centres(raster)
+    grid = np.full(xx.shape, NODATA, dtype=raster.grid.dtype)
+    for geom, code in zip(geoms, codes):
+        minx, miny, maxx, maxy = shapely.bounds(geom)
+        window = (xx >= minx) & (xx <= maxx) & (yy >= miny) & (yy <= maxy)
+        rows, cols = np.nonzero(window)
+        inside = shapely.contains_xy(geom, xx[rows, cols], yy[rows, cols])
+        grid[rows[inside], cols[inside]] = code
+    return grid
+
+
+@pytest.fixture(scope="module")
+def overlapping_layer():
+    """
+    Pavage de Voronoï recouvert de disques troués, de multipolygones et de
+    disques qui se chevauchent (géométries valides : la règle pair-impair ne
+    s'applique qu'à des parties disjointes) ; une partie des polygones est
+    hors légende.
+    """
+    rng = np.random.default_rng(6)
+    box = dept_box(0)
+    cells = voronoi_layer(rng, box, 300)
+    centres = shapely.points(rng.uniform(*box.bounds[::2], 30), rng.uniform(*box.bounds[1::2], 30))
+    radii = rng.uniform(2_000, 8_000, 30)
+    discs = shapely.buffer(centres, radii)
+    holed = shapely.difference(discs[:15], shapely.buffer(centres[:15], rng.uniform(300, 1_500, 15)))
+    # Parties disjointes : un disque et son satellite à trois rayons
+    satellites = shapely.buffer(shapely.points(shapely.get_x(centres) + 3 * radii, shapely.get_y(centres)), radii / 2)
+    multi = shapely.multipolygons([[disc, satellite] for disc, satellite in zip(discs[15:22], satellites[15:22])])
+    geoms = np.concatenate([cells[:150], holed, multi, cells[150:], discs[22:]])
+    assert shapely.is_valid(geoms).all()
+    classes = rng.choice([0, 1, 2, 9], len(geoms), p=[0.4, 0.3, 0.25, 0.05])
+    return gpd.GeoDataFrame({"gridcode": classes}, geometry=geoms, crs=CRS)
+
+
+@pytest.mark.parametrize("width_px", [37, 200])
+def test_rasterize_layer_matches_contains_xy(overlapping_layer, width_px):
+    raster = rasterize_layer(overlapping_layer, "gridcode", [0, 1, 2], width_px)
+    codes = np.where(overlapping_layer["gridcode"] == 9, 3, overlapping_layer["gridcode"])
+    expected = expected_grid(overlapping_layer.geometry.array, codes, raster)
+
+    assert raster.grid.shape == expected.shape
+    assert (raster.grid != expected).sum() == 0
+
+
+def test_rasterize_holes_and_overlap_order():
+    outer = shapely.box(0, 0, 10, 10)
+    holed = shapely.difference(outer, shapely.box(3, 3, 7, 7))
+    cover = shapely.box(5, 0, 10, 10)
+    raster = rasterize([holed, cover], [0, 1], (0, 0, 10, 10), 10)
+
+    # Trou laissé vide à gauche, dernier polygone prioritaire à droite
+    np.testing.assert_array_equal(raster.grid[5, :5], [0, 0, 0, NODATA, NODATA])
+    assert (raster.grid[:, 5:] == 1).all()
+    np.testing.assert_array_equal(raster.grid, expected_grid([holed, cover], [0, 1], raster))
@@ -0,0 +1,34 @@
+import json
+import os
+
+import geopandas as gpd
+import numpy as np
+
+from sykinet.bench import dept_box, voronoi_layer, write_geo
+from sykinet.geoparquet import CRS, parquet_path
+from sykinet.report import MANIFEST, build_report
+from sykinet.schemas import get_schema
+from sykinet.storage import data_path, filesystem_from_url
+
+
+def test_failed_department_does_not_abort_report(tmp_path):
+    base_url = str(tmp_path / "base")
+    fs, base_path = filesystem_from_url(base_url)
+    fs.makedirs(base_path, exist_ok=True)
+    rng = np.random.default_rng(24)
+    for i, dept in enumerate(["33", "34"]):
+        cells = voronoi_layer(rng, dept_box(i), 30)
+        write_geo(fs, gpd.GeoDataFrame({"gridcode": rng.integers(0, 3, len(cells)), "dep": dept},
+                                       geometry=cells, crs=CRS), "inondation", dept, base_path)
+    # Couche illisible pour le 34
+    with fs.open(parquet_path(data_path(get_schema("inondation").filename_for("34"), base_path)), "wb") as f:
+        f.write(b"pas un parquet")
+
+    out_dir = str(tmp_path / "rapport")
+    rendered, failed = build_report(base_url, out_dir, ["33", "34"], formats=("png",), workers=2)
+
+    assert (rendered, failed) == (["33"], ["34"])
+    with open(os.path.join(out_dir, MANIFEST)) as f:
+        assert set(json.load(f)) == {"33"}
+    assert os.path.exists(os.path.join(out_dir, "index.html"))
+    assert os.path.exists(os.path.join(out_dir, "33", "inondation_carte.png"))
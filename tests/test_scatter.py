@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from sykinet.scatter import COUNT_COLUMN, binned_density, scatter_figure
+
+
+def transactions(rng, n):
+    return pd.DataFrame({
+        "surface": rng.lognormal(4.2, 0.5, n),
+        "prix": rng.lognormal(12, 0.6, n),
+        "classe": rng.choice(["Faible", "Moyen", "Fort"], n),
+    })
+
+
+def test_binned_density_counts_every_valid_row():
+    df = transactions(np.random.default_rng(0), 10_000)
+    df.loc[:99, "prix"] = np.nan
+    df.loc[100:199, "classe"] = None
+    density = binned_density(df, "surface", "prix", "classe", bins=20)
+    assert density[COUNT_COLUMN].sum() == 9_800
+    assert density.groupby("classe", observed=True)[COUNT_COLUMN].sum().to_dict() == \
+        df.dropna().groupby("classe")["prix"].size().to_dict()
+
+
+def test_binned_density_without_valid_rows():
+    df = transactions(np.random.default_rng(0), 10)
+    df["prix"] = np.nan
+    density = binned_density(df, "surface", "prix", "classe")
+    assert density.empty
+    assert list(density.columns) == ["surface", "prix", "classe", COUNT_COLUMN]
+
+
+def test_scatter_figure_bounds_points():
+    df = transactions(np.random.default_rng(1), 5_000)
+    fig, note = scatter_figure(df, "surface", "prix", "classe", aggregation="densite", max_points=300)
+    assert note is not None
+    assert sum(len(trace.x) for trace in fig.data) <= 300
+    fig, note = scatter_figure(df, "surface", "prix", "classe", max_points=300)
+    assert sum(len(trace.x) for trace in fig.data) <= 300
+
+
+def test_scatter_figure_density_without_valid_rows():
+    df = transactions(np.random.default_rng(2), 500)
+    df["surface"] = np.inf
+    fig, _ = scatter_figure(df, "surface", "prix", "classe", aggregation="densite", max_points=100)
+    assert sum(len(trace.x) for trace in fig.data) == 0
@@ -0,0 +1,44 @@
+import json
+import os
+
+from sykinet.spans import MetricsSink, Rerun
+
+
+def rerun_with_spans(page, n_spans):
+    rerun = Rerun(page, dept="33")
+    for i in range(n_spans):
+        with rerun.span(f"etape{i}", cache=None):
+            pass
+    rerun.close()
+    return rerun
+
+
+def test_sink_writes_per_process_files(tmp_path):
+    sink = MetricsSink(str(tmp_path))
+    sink.write(rerun_with_spans("page1", 2))
+    sink.write(rerun_with_spans("page1", 1))
+
+    pid = os.getpid()
+    assert sorted(os.listdir(tmp_path)) == [f"spans_{pid}.jsonl", f"sykinet_{pid}.prom"]
+    with open(sink.spans_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["span"] for r in records] == ["etape0", "etape1", "etape0"]
+    with open(sink.prom_path, encoding="utf-8") as f:
+        prom = f.read()
+    assert f'sykinet_span_seconds_count{{page="page1",span="etape0",dept="33",cache="hit",pid="{pid}"}} 2' in prom
+
+    sink.close()
+    assert not os.path.exists(sink.prom_path)
+
+
+def test_span_log_is_rotated_past_max_bytes(tmp_path):
+    sink = MetricsSink(str(tmp_path), max_bytes=1000)
+    for _ in range(20):
+        sink.write(rerun_with_spans("page2", 3))
+
+    # Une archive au plus, chaque fichier borné par une exécution de dépassement
+    archive = sink.spans_path + ".1"
+    assert os.path.exists(archive)
+    assert os.path.getsize(sink.spans_path) <= 1000
+    assert os.path.getsize(archive) <= 1000 + 3 * 200
+    assert not any(name.endswith(".2") for name in os.listdir(tmp_path))
@@ -0,0 +1,74 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+
+from sykinet import spatial_join
+from sykinet.bench import dept_box, synthetic_transactions, voronoi_layer, write_geo
+from sykinet.dvf_summary import summarise
+from sykinet.geoparquet import CRS
+from sykinet.schemas import get_schema
+from sykinet.storage import data_path, filesystem_from_url
+
+DEPTS = ["33", "75"]
+
+
+@pytest.fixture
+def dvf_base(tmp_path):
+    """
+    Dossier local avec les couches d'aléa de deux départements et un DVF
+    synthétique dont une mutation porte deux locaux.
+    """
+    base_url = str(tmp_path / "base")
+    fs, base_path = filesystem_from_url(base_url)
+    fs.makedirs(base_path, exist_ok=True)
+    rng = np.random.default_rng(9)
+    for i, dept in enumerate(DEPTS):
+        cells = voronoi_layer(rng, dept_box(i), 50)
+        write_geo(fs, gpd.GeoDataFrame({"CLASSE": rng.choice(["Caves", "Nappes"], len(cells)), "dep": dept},
+                                       geometry=cells, crs=CRS), "inondation", dept, base_path)
+        write_geo(fs, gpd.GeoDataFrame({"ALEA": rng.choice(["Faible", "Fort"], len(cells)), "dep": dept},
+                                       geometry=cells, crs=CRS), "secheresse", dept, base_path)
+
+    sales = synthetic_transactions(rng, DEPTS, 200).drop(columns=["Risque_innond", "zone_niveau"])
+    sales.loc[1, "id_mutation"] = sales.loc[0, "id_mutation"]
+    source = tmp_path / "dvf.csv.gz"
+    sales.to_csv(source, index=False)
+    return base_url, str(source), sales
+
+
+def read_final(base_url, name):
+    fs, base_path = filesystem_from_url(base_url)
+    with fs.open(data_path(get_schema(name).filename, base_path)) as f:
+        return pd.read_csv(f, index_col=0)
+
+
+def test_run_reads_single_local_sales_by_default(dvf_base):
+    base_url, source, sales = dvf_base
+    summarise(source, base_url, workers=1, chunksize=64)
+    counts = spatial_join.run(base_url=base_url, workers=2, chunksize=64)
+
+    expected = sales.iloc[2:]
+    assert sum(counts.values()) == 2 * len(expected)
+    for (type_local, _), name in spatial_join.OUTPUTS.items():
+        final = read_final(base_url, name)
+        assert final["id_mutation"].is_unique
+        assert set(final["id_mutation"]) == set(expected.loc[expected["type_local"] == type_local, "id_mutation"])
+
+
+def test_run_keeps_previous_outputs_on_failure(dvf_base, monkeypatch):
+    base_url, source, _ = dvf_base
+    spatial_join.run(source, base_url, workers=1, chunksize=64)
+    before = read_final(base_url, "base_innond_final")
+
+    def failing_chunks(*args, **kwargs):
+        raise RuntimeError("lecture interrompue")
+        yield
+
+    monkeypatch.setattr(spatial_join, "read_dvf_chunks", failing_chunks)
+    with pytest.raises(RuntimeError):
+        spatial_join.run(source, base_url, workers=1, chunksize=64)
+
+    fs, base_path = filesystem_from_url(base_url)
+    assert not fs.glob(base_path + "*.tmp")
+    pd.testing.assert_frame_equal(read_final(base_url, "base_innond_final"), before)
@@ -0,0 +1,84 @@
+import pytest
+
+from sykinet.disk_cache import DiskCache
+from sykinet.storage import CachedFilesystem, data_path, object_version
+
+
+def read(fs, path):
+    with fs.open(path, "rb") as f:
+        return f.read()
+
+
+def test_hit_does_not_download_again(cached_fs, versioned_fs, object_cache):
+    versioned_fs.pipe_file("/bucket/base.csv", b"a,b\n1,2\n")
+    assert read(cached_fs, "/bucket/base.csv") == b"a,b\n1,2\n"
+    assert read(cached_fs, "/bucket/base.csv") == b"a,b\n1,2\n"
+    assert versioned_fs.downloads == ["/bucket/base.csv"]
+    assert object_cache.stats()["hits"] == 1
+
+
+def test_new_generation_is_fetched_again(cached_fs, versioned_fs):
+    versioned_fs.pipe_file("/bucket/base.csv", b"v1")
+    assert read(cached_fs, "/bucket/base.csv") == b"v1"
+    versioned_fs.pipe_file("/bucket/base.csv", b"v2")
+    assert object_version(versioned_fs, "/bucket/base.csv") == "2"
+    assert read(cached_fs, "/bucket/base.csv") == b"v2"
+    assert read(cached_fs, "/bucket/base.csv") == b"v2"
+    assert versioned_fs.downloads == ["/bucket/base.csv"] * 2
+
+
+def test_cache_survives_restart(versioned_fs, tmp_path):
+    versioned_fs.pipe_file("/bucket/base.csv", b"contenu")
+    read(CachedFilesystem(versioned_fs, DiskCache(str(tmp_path), 1024)), "/bucket/base.csv")
+    restarted = CachedFilesystem(versioned_fs, DiskCache(str(tmp_path), 1024))
+    assert read(restarted, "/bucket/base.csv") == b"contenu"
+    assert versioned_fs.downloads == ["/bucket/base.csv"]
+
+
+def test_size_cap_evicts_least_recently_read(cached_fs, versioned_fs, object_cache):
+    # Borne de 1024 octets : trois objets de 400 octets ne tiennent pas ensemble
+    for name in "abc":
+        versioned_fs.pipe_file(f"/bucket/{name}.bin", name.encode() * 400)
+    read(cached_fs, "/bucket/a.bin")
+    read(cached_fs, "/bucket/b.bin")
+    read(cached_fs, "/bucket/a.bin")
+    read(cached_fs, "/bucket/c.bin")  # évince b, la moins récemment lue
+    assert object_cache.stats()["evictions"] == 1
+    read(cached_fs, "/bucket/a.bin")
+    read(cached_fs, "/bucket/b.bin")
+    assert versioned_fs.downloads == ["/bucket/a.bin", "/bucket/b.bin", "/bucket/c.bin", "/bucket/b.bin"]
+
+
+def test_object_larger_than_cache_bypasses_it(cached_fs, versioned_fs, object_cache):
+    versioned_fs.pipe_file("/bucket/gros.bin", b"x" * 2048)
+    assert read(cached_fs, "/bucket/gros.bin") == b"x" * 2048
+    assert versioned_fs.downloads == []
+    assert object_cache.stats()["entries"] == 0
+
+
+def test_writes_are_delegated(cached_fs, versioned_fs):
+    with cached_fs.open("/bucket/sortie.csv", "wb") as f:
+        f.write(b"ok")
+    assert versioned_fs.cat_file("/bucket/sortie.csv") == b"ok"
+    assert cached_fs.exists("/bucket/sortie.csv")
+
+
+def test_memory_url_through_cache(memory_fs, tmp_path):
+    fs, base_path = memory_fs
+    path = data_path("base.csv", base_path)
+    fs.pipe_file(path, b"v1")
+    cached = CachedFilesystem(fs, DiskCache(str(tmp_path), 1024))
+    assert read(cached, path) == b"v1"
+    assert read(cached, path) == b"v1"
+    assert cached.cache.stats()["hits"] == 1
+
+    fs.pipe_file(path, b"v2")
+    assert read(cached, path) == b"v2"
+    assert cached.cache.stats()["misses"] == 2
+
+
+def test_missing_object_raises(memory_fs, tmp_path):
+    fs, base_path = memory_fs
+    cached = CachedFilesystem(fs, DiskCache(str(tmp_path), 1024))
+    with pytest.raises(FileNotFoundError):
+        read(cached, data_path("absent.csv", base_path))